@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from app.core.api_service import provider_campground_service
+from app.core.auth import require_admin
+from app.core.database import async_engine, async_pool_stats, engine, pool_stats
+from app.core.friend_suggestions import friend_suggestion_cache
+from app.core.query_stats import query_stats
+from app.core.search_cache import search_result_cache
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/pool-stats")
+def get_pool_stats():
+    """Get connection pool counters for the sync and async engines."""
+    return {
+        "sync": pool_stats.snapshot(engine.pool),
+        "async": async_pool_stats.snapshot(async_engine.sync_engine.pool),
+    }
+
+
+@router.get("/search-cache-stats")
+def get_search_cache_stats():
+    """Get this worker's campground search cache counters."""
+    return search_result_cache.stats()
+
+
+@router.get("/provider-stats")
+def get_provider_stats():
+    """Get this worker's campground provider client counters and circuit breaker state."""
+    return provider_campground_service.stats()
+
+
+@router.get("/query-stats")
+def get_query_stats():
+    """Get this worker's SQL statement counters for sampled requests, and recent probable N+1 queries."""
+    return query_stats.stats()
+
+
+@router.get("/friend-suggestion-stats")
+def get_friend_suggestion_stats():
+    """Get this worker's friend suggestion cache counters."""
+    return friend_suggestion_cache.stats()
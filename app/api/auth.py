@@ -1,11 +1,13 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import create_access_token, get_password_hash
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.security import create_access_token
 from app.core.config import settings
-from app.crud.user import create_user, get_user_by_email, get_user_by_username, authenticate_user
+from app.crud.user import (
+    authenticate_user_async, create_user_async, get_user_by_email_async, get_user_by_username_async
+)
 from app.schemas.user import User, UserCreate
 from app.schemas.token import Token
 
@@ -13,17 +15,17 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=User)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
     # Check if user already exists
-    db_user = get_user_by_email(db, email=user.email)
+    db_user = await get_user_by_email_async(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    db_user = get_user_by_username(db, username=user.username)
+    db_user = await get_user_by_username_async(db, username=user.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,13 +33,13 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    return create_user(db=db, user=user)
+    return await create_user_async(db=db, user=user)
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
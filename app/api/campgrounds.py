@@ -1,10 +1,18 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.core.auth import get_current_active_user
-from app.core.api_service import mock_campground_service
-from app.crud.campground import create_campground_if_not_exists, get_campground, search_campgrounds
+from app.core.api_service import ProviderUnavailable, campground_service
+from app.core.etag import etag_matches, make_etag, make_list_etag, not_modified
+from app.core.fast_json import CAMPGROUND_LIST, FastJSONResponse, dump_list
+from app.core.search_cache import search_result_cache
+from app.core.tiles import CAMPGROUND_LAYER, TILE_MEDIA_TYPE, encode_tile, is_valid_tile, tile_bounds, tile_cache
+from app.crud.campground import (
+    get_campground, get_campground_page_versions, get_campground_points, get_campground_version,
+    search_campgrounds_async, store_campgrounds_async
+)
 from app.schemas.campground import Campground, CampgroundCreate, CampgroundSearch
 from app.schemas.user import User
 
@@ -15,46 +23,109 @@ router = APIRouter()
 async def search_campgrounds_api(
     q: str = Query(..., description="Search query for campgrounds"),
     limit: int = Query(10, description="Maximum number of results"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Search for campgrounds using the external API."""
+    """Search for campgrounds using the external API.
+    
+    Results, including empty ones, are cached per (query, limit); see
+    app/core/search_cache.py. If the provider can't answer within
+    PROVIDER_BUDGET_SECONDS, only database results are returned.
+    """
+    cached = search_result_cache.get(q, limit)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    
     # First search in our database
-    db_results = search_campgrounds(db, q, limit=limit)
+    db_results = await search_campgrounds_async(db, q, limit=limit)
     
     # If we don't have enough results, search external API
     if len(db_results) < limit:
-        api_results = await mock_campground_service.search_campgrounds(q, limit - len(db_results))
+        try:
+            api_results = await campground_service.search_campgrounds(q, limit)
+        except ProviderUnavailable:
+            # Degrade to database results, uncached so the next search asks the provider again
+            return FastJSONResponse(dump_list(CAMPGROUND_LIST, db_results))
         
-        # Save new campgrounds to database
-        for api_campground in api_results:
-            campground_create = CampgroundCreate(**api_campground)
-            create_campground_if_not_exists(db, campground_create)
+        # Save new campgrounds to database in one batch, getting the stored row of every provider result
+        provider_campgrounds, inserted = await store_campgrounds_async(
+            db, [CampgroundCreate(**api_campground) for api_campground in api_results]
+        )
+        if inserted:
+            # Rank the new rows among the database matches, as the next search for this query will
+            db_results = await search_campgrounds_async(db, q, limit=limit)
         
-        # Get updated database results
-        db_results = search_campgrounds(db, q, limit=limit)
+        # The provider matches some queries the database search doesn't (e.g. a state code), so
+        # provider results not among the database matches follow them, in provider order
+        matched_ids = {campground.id for campground in db_results}
+        db_results = (db_results + [
+            campground for campground in provider_campgrounds if campground.id not in matched_ids
+        ])[:limit]
     
-    return db_results
+    results = CAMPGROUND_LIST.validate_python(db_results, from_attributes=True)
+    search_result_cache.put(q, limit, results)
+    return FastJSONResponse(results)
 
 
 @router.get("/", response_model=List[Campground])
 def get_campgrounds(
     skip: int = 0,
     limit: int = 100,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get all campgrounds with pagination."""
+    """Get all campgrounds with pagination.
+    
+    The ETag covers the IDs and versions of the page, so a matching
+    If-None-Match gets a 304 after reading only those two columns.
+    """
     from app.crud.campground import get_campgrounds
-    return get_campgrounds(db, skip=skip, limit=limit)
+    if if_none_match:
+        etag = make_list_etag("campgrounds", get_campground_page_versions(db, skip=skip, limit=limit))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    
+    campgrounds = get_campgrounds(db, skip=skip, limit=limit)
+    etag = make_list_etag("campgrounds", [(campground.id, campground.version) for campground in campgrounds])
+    return FastJSONResponse(dump_list(CAMPGROUND_LIST, campgrounds), headers={"ETag": etag})
+
+
+@router.get("/tiles/{z}/{x}/{y}", response_class=Response)
+def get_campground_tile(
+    z: int,
+    x: int,
+    y: int,
+    db: Session = Depends(get_db)
+):
+    """Get a map tile of campground points (see app/core/tiles.py for the format)."""
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    
+    tile = tile_cache.get(CAMPGROUND_LAYER, None, z, x, y)
+    if tile is None:
+        tile = encode_tile(z, x, y, get_campground_points(db, *tile_bounds(z, x, y)))
+        tile_cache.put(CAMPGROUND_LAYER, None, z, x, y, tile)
+    return Response(content=tile, media_type=TILE_MEDIA_TYPE)
 
 
 @router.get("/{campground_id}", response_model=Campground)
 def get_campground_by_id(
     campground_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get a specific campground by ID."""
+    """Get a specific campground by ID, or 304 if the If-None-Match ETag is current."""
+    if if_none_match:
+        version = get_campground_version(db, campground_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Campground not found")
+        etag = make_etag("campground", campground_id, version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    
     campground = get_campground(db, campground_id)
     if campground is None:
         raise HTTPException(status_code=404, detail="Campground not found")
+    response.headers["ETag"] = make_etag("campground", campground.id, campground.version)
     return campground
@@ -1,12 +1,21 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.auth import get_current_active_user
+from sqlalchemy.orm.exc import StaleDataError
+from app.core.database import get_async_db, get_db
+from app.core.auth import get_current_active_user, get_current_active_user_async
+from app.core.config import settings
+from app.core.etag import etag_matches, make_etag, not_modified
+from app.core.fast_json import CAMPING_TRIP_LIST, FastJSONResponse, dump_list
+from app.core.ndjson import ndjson_response, stream_with_async_session, stream_with_session, wants_ndjson
+from app.core.pagination import decode_cursor, next_cursor
+from app.core.tiles import TILE_MEDIA_TYPE, TRIP_LAYER, encode_tile, is_valid_tile, tile_bounds, tile_cache
 from app.crud.camping_trip import (
-    create_camping_trip, get_camping_trips_by_user, get_friend_camping_feed,
-    get_camping_trip, update_camping_trip, delete_camping_trip,
-    get_camping_trips_for_map
+    create_camping_trip, get_camping_trips_by_user, get_friend_camping_feed_async,
+    get_camping_trip, get_camping_trip_version, update_camping_trip, delete_camping_trip,
+    get_camping_trips_for_map_async, get_camping_trips_in_viewport_async, get_trip_points,
+    stream_camping_trips_by_user, stream_camping_trips_for_map_async, stream_friend_camping_feed_async
 )
 from app.schemas.camping_trip import CampingTrip, CampingTripCreate, CampingTripUpdate, CampingTripWithCampground
 from app.schemas.user import User
@@ -14,6 +23,33 @@ from app.schemas.user import User
 router = APIRouter()
 
 
+def _conflict() -> HTTPException:
+    return HTTPException(
+        status_code=409, detail="Camping trip was changed by another request; reload it and try again"
+    )
+
+
+def _parse_cursor(cursor: Optional[str]):
+    """Decode a pagination cursor from the query string, rejecting malformed ones."""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _trip_json(trip) -> str:
+    return CampingTrip.model_validate(trip).model_dump_json()
+
+
+def _trip_page(trips, limit: int) -> FastJSONResponse:
+    """Encode a page of trips, with the X-Next-Cursor header when there may be more."""
+    cursor_out = next_cursor(trips, limit)
+    headers = {"X-Next-Cursor": cursor_out} if cursor_out else None
+    return FastJSONResponse(dump_list(CAMPING_TRIP_LIST, trips), headers=headers)
+
+
 @router.post("/", response_model=CampingTrip)
 def log_camping_trip(
     camping_trip: CampingTripCreate,
@@ -28,51 +64,145 @@ def log_camping_trip(
 def get_my_camping_trips(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    accept: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get current user's camping trips."""
-    return get_camping_trips_by_user(db=db, user_id=current_user.id, skip=skip, limit=limit)
+    """Get current user's camping trips, newest first.
+    
+    With `Accept: application/x-ndjson` the page is streamed one trip per
+    line, so a large `limit` doesn't have to fit in memory. Streamed pages
+    have no X-Next-Cursor header.
+    """
+    if wants_ndjson(accept):
+        return ndjson_response(stream_with_session(
+            stream_camping_trips_by_user, user_id=current_user.id, skip=skip, limit=limit, cursor=_parse_cursor(cursor)
+        ), encode=_trip_json)
+    
+    trips = get_camping_trips_by_user(
+        db=db, user_id=current_user.id, skip=skip, limit=limit, cursor=_parse_cursor(cursor)
+    )
+    return _trip_page(trips, limit)
 
 
 @router.get("/feed", response_model=List[CampingTrip])
-def get_friend_camping_feed_trips(
+async def get_friend_camping_feed_trips(
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    accept: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get friend camping feed (camping trips from other users)."""
-    return get_friend_camping_feed(db=db, user_id=current_user.id, skip=skip, limit=limit)
+    """Get friend camping feed (camping trips from other users), newest first.
+    
+    With `Accept: application/x-ndjson` the page is streamed one trip per
+    line, without an X-Next-Cursor header.
+    """
+    if wants_ndjson(accept):
+        return ndjson_response(stream_with_async_session(
+            stream_friend_camping_feed_async,
+            user_id=current_user.id, skip=skip, limit=limit, cursor=_parse_cursor(cursor)
+        ), encode=_trip_json)
+    
+    trips = await get_friend_camping_feed_async(
+        db=db, user_id=current_user.id, skip=skip, limit=limit, cursor=_parse_cursor(cursor)
+    )
+    return _trip_page(trips, limit)
 
 
 @router.get("/map", response_model=List[dict])
-def get_camping_trips_for_map_view(
+async def get_camping_trips_for_map_view(
     include_own: bool = Query(True, description="Include user's own trips"),
     include_friends: bool = Query(True, description="Include friends' trips"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    min_lat: Optional[float] = Query(None, ge=-90, le=90, description="South edge of the viewport"),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180, description="West edge of the viewport"),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90, description="North edge of the viewport"),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180, description="East edge of the viewport"),
+    zoom: int = Query(settings.map_cluster_max_zoom, ge=0, le=22, description="Map zoom level"),
+    accept: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get camping trips for interactive map display with filtering options."""
-    trips = get_camping_trips_for_map(
+    """Get camping trips for interactive map display with filtering options.
+    
+    With a viewport (all four bounds), only points inside it are returned:
+    clusters below the clustering zoom level, individual trips above it.
+    Without one, `Accept: application/x-ndjson` streams every trip, one per
+    line, instead of building the whole list.
+    """
+    bounds = (min_lat, min_lng, max_lat, max_lng)
+    if any(bound is not None for bound in bounds):
+        if any(bound is None for bound in bounds):
+            raise HTTPException(status_code=400, detail="Viewport requires min_lat, min_lng, max_lat and max_lng")
+        if min_lat > max_lat:
+            raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+        return FastJSONResponse(await get_camping_trips_in_viewport_async(
+            db,
+            current_user.id,
+            min_lat, min_lng, max_lat, max_lng,
+            zoom,
+            include_own=include_own,
+            include_friends=include_friends
+        ))
+    
+    if wants_ndjson(accept):
+        return ndjson_response(stream_with_async_session(
+            stream_camping_trips_for_map_async,
+            current_user.id, include_own=include_own, include_friends=include_friends
+        ))
+    
+    trips = await get_camping_trips_for_map_async(
         db, 
         current_user.id, 
         include_own=include_own, 
         include_friends=include_friends
     )
-    return trips
+    return FastJSONResponse(trips)
+
+
+@router.get("/tiles/{z}/{x}/{y}", response_class=Response)
+def get_camping_trip_tile(
+    z: int,
+    x: int,
+    y: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get a map tile of the current user's and friends' trip points (see app/core/tiles.py for the format)."""
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    
+    tile = tile_cache.get(TRIP_LAYER, current_user.id, z, x, y)
+    if tile is None:
+        tile = encode_tile(z, x, y, get_trip_points(db, current_user.id, *tile_bounds(z, x, y)))
+        tile_cache.put(TRIP_LAYER, current_user.id, z, x, y, tile)
+    return Response(content=tile, media_type=TILE_MEDIA_TYPE, headers={"Cache-Control": "private"})
 
 
 @router.get("/{trip_id}", response_model=CampingTrip)
 def get_camping_trip_by_id(
     trip_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get a specific camping trip by ID."""
+    """Get a specific camping trip by ID, or 304 if the If-None-Match ETag is current."""
+    if if_none_match:
+        version = get_camping_trip_version(db=db, trip_id=trip_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Camping trip not found")
+        etag = make_etag("camping-trip", trip_id, version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, cache_control="private")
+    
     camping_trip = get_camping_trip(db=db, trip_id=trip_id)
     if camping_trip is None:
         raise HTTPException(status_code=404, detail="Camping trip not found")
+    response.headers["ETag"] = make_etag("camping-trip", camping_trip.id, camping_trip.version)
+    response.headers["Cache-Control"] = "private"
     return camping_trip
 
 
@@ -83,7 +213,10 @@ def update_camping_trip_by_id(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Update a camping trip (only if it belongs to the current user)."""
+    """Update a camping trip (only if it belongs to the current user).
+    
+    Returns 409 if another request changed or deleted the trip meanwhile.
+    """
     camping_trip = get_camping_trip(db=db, trip_id=trip_id)
     if camping_trip is None:
         raise HTTPException(status_code=404, detail="Camping trip not found")
@@ -91,7 +224,10 @@ def update_camping_trip_by_id(
     if camping_trip.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this camping trip")
     
-    return update_camping_trip(db=db, trip_id=trip_id, camping_trip_update=camping_trip_update)
+    try:
+        return update_camping_trip(db=db, trip_id=trip_id, camping_trip_update=camping_trip_update)
+    except StaleDataError:
+        raise _conflict()
 
 
 @router.delete("/{trip_id}")
@@ -100,7 +236,10 @@ def delete_camping_trip_by_id(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a camping trip (only if it belongs to the current user)."""
+    """Delete a camping trip (only if it belongs to the current user).
+    
+    Returns 409 if another request changed or deleted the trip meanwhile.
+    """
     camping_trip = get_camping_trip(db=db, trip_id=trip_id)
     if camping_trip is None:
         raise HTTPException(status_code=404, detail="Camping trip not found")
@@ -108,7 +247,10 @@ def delete_camping_trip_by_id(
     if camping_trip.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this camping trip")
     
-    success = delete_camping_trip(db=db, trip_id=trip_id)
+    try:
+        success = delete_camping_trip(db=db, trip_id=trip_id)
+    except StaleDataError:
+        raise _conflict()
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete camping trip")
     
@@ -1,23 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.auth import get_current_active_user
 from app.models.user import User
 from app.crud.friend import (
     create_friend_request,
     get_friend_request,
-    get_pending_friend_requests,
-    get_friends,
     accept_friend_request,
     reject_friend_request,
     remove_friend,
     get_friends_with_user_info,
-    get_pending_requests_with_user_info
+    get_pending_requests_with_user_info,
+    get_friend_suggestions,
+    search_users_with_relationship_status
 )
 from app.crud.user import get_user_by_username
 from app.schemas.friend import FriendRequest, FriendResponse, FriendWithUser
-from app.models.friend import Friend
 
 router = APIRouter()
 
@@ -37,17 +37,15 @@ def send_friend_request(
     if target_user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot send friend request to yourself")
     
-    # Check if friend request already exists
-    existing_request = get_friend_request(db, current_user.id, target_user.id)
-    if existing_request:
-        if existing_request.is_accepted:
+    # Create the friend request; the database rejects a second one between the same users
+    new_request = create_friend_request(db, current_user.id, target_user.id)
+    if new_request is None:
+        existing_request = get_friend_request(db, current_user.id, target_user.id)
+        if existing_request and existing_request.is_accepted:
             raise HTTPException(status_code=400, detail="Already friends")
         else:
             raise HTTPException(status_code=400, detail="Friend request already sent")
     
-    # Create the friend request
-    new_request = create_friend_request(db, current_user.id, target_user.id)
-    
     return {
         "message": f"Friend request sent to {target_user.username}",
         "friend_request_id": new_request.id
@@ -91,6 +89,16 @@ def get_my_friends(
     return get_friends_with_user_info(db, current_user.id)
 
 
+@router.get("/suggestions", response_model=List[dict])
+def get_my_friend_suggestions(
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get people the current user may know, ranked by mutual friends and shared campgrounds"""
+    return get_friend_suggestions(db, current_user.id, limit)
+
+
 @router.delete("/remove/{friend_id}")
 def remove_friend_relationship(
     friend_id: int,
@@ -107,51 +115,18 @@ def remove_friend_relationship(
 
 @router.get("/search", response_model=List[dict])
 def search_users(
-    q: str = Query(..., description="Search query for usernames"),
+    q: str = Query(..., min_length=1, description="Start of a username or full name"),
+    limit: int = Query(10, ge=1, le=50),
+    typeahead: bool = Query(False, description="Called on every keystroke; returns at most USER_SEARCH_TYPEAHEAD_LIMIT users"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Search for users to add as friends"""
-    # Simple search by username (case insensitive)
-    users = db.query(User).filter(
-        User.username.ilike(f"%{q}%"),
-        User.id != current_user.id
-    ).limit(10).all()
-    
-    # Get current user's friends to show relationship status
-    friends = get_friends(db, current_user.id)
-    friend_ids = set()
-    for friend in friends:
-        if friend.user_id == current_user.id:
-            friend_ids.add(friend.friend_id)
-        else:
-            friend_ids.add(friend.user_id)
-    
-    # Get pending requests
-    pending_requests = get_pending_friend_requests(db, current_user.id)
-    pending_sent_ids = {req.user_id for req in pending_requests}
-    
-    pending_received = db.query(Friend).filter(
-        Friend.user_id == current_user.id,
-        Friend.is_accepted == False
-    ).all()
-    pending_received_ids = {req.friend_id for req in pending_received}
-    
-    results = []
-    for user in users:
-        relationship_status = "none"
-        if user.id in friend_ids:
-            relationship_status = "friends"
-        elif user.id in pending_sent_ids:
-            relationship_status = "request_sent"
-        elif user.id in pending_received_ids:
-            relationship_status = "request_received"
-        
-        results.append({
-            "id": user.id,
-            "username": user.username,
-            "full_name": user.full_name,
-            "relationship_status": relationship_status
-        })
-    
-    return results
+    """Search for users to add as friends, with the current user's relationship to each
+
+    Matches ignore case. On PostgreSQL a full name also matches from the
+    start of any word (e.g. a last name); on other databases only from the
+    start of the name.
+    """
+    if typeahead:
+        limit = min(limit, settings.user_search_typeahead_limit)
+    return search_users_with_relationship_status(db, current_user.id, q, limit)
@@ -1,158 +1,392 @@
+import asyncio
+import csv
+import heapq
 import json
-from typing import List, Dict, Optional
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from app.core.config import settings
+from app.core.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "mock_campgrounds.json")
+
+
+class CampgroundCatalog:
+    """Read-only campground catalog with prebuilt state, token and prefix indexes.
+
+    Entries are stored ready to be returned, with amenities already encoded as
+    a JSON string, and are shared between callers, so they must not be mutated.
+    """
+
+    def __init__(self, entries: List[Dict]):
+        self.entries: Tuple[Dict, ...] = tuple(entries)
+        by_state: Dict[str, List[Dict]] = {}
+        by_token: Dict[str, List[int]] = {}
+        for position, entry in enumerate(self.entries):
+            if entry.get("state"):
+                by_state.setdefault(entry["state"].lower(), []).append(entry)
+            tokens = set()
+            for field in ("name", "location", "description"):
+                tokens.update(tokenize(entry.get(field)))
+            for token in tokens:
+                by_token.setdefault(token, []).append(position)
+        self._by_state = {state: tuple(matches) for state, matches in by_state.items()}
+        self._by_token = {token: tuple(positions) for token, positions in by_token.items()}
+        # Sorted vocabulary doubles as the prefix index
+        self._vocabulary = sorted(self._by_token)
+
+    @classmethod
+    def from_file(cls, path: str) -> "CampgroundCatalog":
+        """Load a catalog from a JSON array, JSON-lines or CSV file."""
+        with open(path, newline="", encoding="utf-8") as catalog_file:
+            if path.endswith(".csv"):
+                rows = list(csv.DictReader(catalog_file))
+            elif path.endswith(".jsonl"):
+                rows = [json.loads(line) for line in catalog_file if line.strip()]
+            else:
+                rows = json.load(catalog_file)
+        return cls([cls._prepare(row) for row in rows])
+
+    @staticmethod
+    def _prepare(row: Dict) -> Dict:
+        """Normalize a raw catalog row into the shape search results are returned in."""
+        entry = {key: value for key, value in row.items() if value not in ("", None)}
+        for key in ("latitude", "longitude"):
+            if key in entry:
+                entry[key] = float(entry[key])
+        amenities = entry.get("amenities")
+        if isinstance(amenities, str) and not amenities.startswith("["):
+            amenities = [amenity.strip() for amenity in amenities.split(";") if amenity.strip()]
+        if isinstance(amenities, list):
+            entry["amenities"] = json.dumps(amenities)
+        entry.setdefault("source_api", "mock_data")
+        return entry
+
+    def _postings(self, token: str) -> List[Tuple[int, ...]]:
+        """Get the sorted entry positions for a whole word, or for every word it is a prefix of."""
+        exact = self._by_token.get(token)
+        if exact is not None:
+            return [exact]
+        start = bisect_left(self._vocabulary, token)
+        postings = []
+        for word in self._vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            postings.append(self._by_token[word])
+        return postings
+
+    @staticmethod
+    def _contains(postings: List[Tuple[int, ...]], position: int) -> bool:
+        for positions in postings:
+            index = bisect_left(positions, position)
+            if index < len(positions) and positions[index] == position:
+                return True
+        return False
+
+    def search(self, query: str, limit: int) -> List[Dict]:
+        """Search the catalog in catalog order.
+
+        A two-character query is treated as a state abbreviation. Otherwise
+        every word of the query must match a word (or word prefix) of the
+        name, location or description.
+        """
+        if not query:
+            return list(self.entries[:limit])
+        if len(query) == 2:
+            return list(self._by_state.get(query.lower(), ())[:limit])
+
+        groups = [self._postings(token) for token in set(tokenize(query))]
+        if not groups or not all(groups):
+            return []
+        if len(groups) == 1 and len(groups[0]) == 1:
+            return [self.entries[position] for position in groups[0][0][:limit]]
+
+        # Walk the rarest word's matches in catalog order, stopping once the page is full
+        groups.sort(key=lambda postings: sum(len(positions) for positions in postings))
+        results = []
+        previous = None
+        for position in heapq.merge(*groups[0]):
+            if position == previous:
+                continue
+            previous = position
+            if all(self._contains(postings, position) for postings in groups[1:]):
+                results.append(self.entries[position])
+                if len(results) == limit:
+                    break
+        return results
 
 
 class MockCampgroundService:
     """Service to provide mock campground data."""
-    
-    def __init__(self):
-        pass
-    
+
+    def __init__(self, catalog_path: Optional[str] = None):
+        self.catalog_path = catalog_path
+        self._catalog: Optional[CampgroundCatalog] = None
+        self._lock = threading.Lock()
+
+    @property
+    def catalog(self) -> CampgroundCatalog:
+        """The campground catalog, loaded from its data file on first use."""
+        if self._catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    path = self.catalog_path or settings.mock_catalog_path or DEFAULT_CATALOG_PATH
+                    self._catalog = CampgroundCatalog.from_file(path)
+        return self._catalog
+
     async def search_campgrounds(self, query: str, limit: int = 10) -> List[Dict]:
         """Search for campgrounds using mock data only."""
         return self._get_mock_campgrounds(query, limit)
 
     def _get_mock_campgrounds(self, query: str, limit: int) -> List[Dict]:
         """Return mock campground data for development/testing."""
-        mock_campgrounds = [
-            # California
-            {
-                'name': 'Yosemite Valley Campground',
-                'location': 'Yosemite National Park, CA',
-                'state': 'CA',
-                'description': 'Beautiful campground in the heart of Yosemite Valley with stunning granite cliffs',
-                'latitude': 37.7489,
-                'longitude': -119.5870,
-                'amenities': json.dumps(['tent_sites', 'rv_sites', 'showers', 'water', 'fire_pits', 'bathrooms']),
-                'external_id': 'mock_001',
-                'source_api': 'mock_data'
-            },
-            {
-                'name': 'Big Sur Campground',
-                'location': 'Big Sur, CA',
-                'state': 'CA',
-                'description': 'Scenic coastal camping with ocean views and redwood forests',
-                'latitude': 36.2704,
-                'longitude': -121.8081,
-                'amenities': json.dumps(['tent_sites', 'water', 'fire_pits', 'hiking_trails']),
-                'external_id': 'mock_002',
-                'source_api': 'mock_data'
-            },
-            {
-                'name': 'Lake Tahoe Campground',
-                'location': 'Lake Tahoe, CA',
-                'state': 'CA',
-                'description': 'Lakeside camping with mountain views and water activities',
-                'latitude': 39.0968,
-                'longitude': -120.0324,
-                'amenities': json.dumps(['tent_sites', 'rv_sites', 'showers', 'wifi', 'boat_ramp']),
-                'external_id': 'mock_003',
-                'source_api': 'mock_data'
-            },
-            # Wyoming
-            {
-                'name': 'Yellowstone Valley Campground',
-                'location': 'Yellowstone National Park, WY',
-                'state': 'WY',
-                'description': 'Historic campground near Old Faithful with geothermal features',
-                'latitude': 44.4605,
-                'longitude': -110.8281,
-                'amenities': json.dumps(['tent_sites', 'rv_sites', 'showers', 'water', 'geyser_views']),
-                'external_id': 'mock_004',
-                'source_api': 'mock_data'
-            },
-            {
-                'name': 'Grand Teton Campground',
-                'location': 'Grand Teton National Park, WY',
-                'state': 'WY',
-                'description': 'Mountain camping with spectacular Teton Range views',
-                'latitude': 43.7904,
-                'longitude': -110.6818,
-                'amenities': json.dumps(['tent_sites', 'hiking_trails', 'wildlife_viewing']),
-                'external_id': 'mock_005',
-                'source_api': 'mock_data'
-            },
-            # Colorado
-            {
-                'name': 'Rocky Mountain Campground',
-                'location': 'Rocky Mountain National Park, CO',
-                'state': 'CO',
-                'description': 'Alpine camping with mountain lakes and wildlife',
-                'latitude': 40.3556,
-                'longitude': -105.6977,
-                'amenities': json.dumps(['tent_sites', 'mountain_views', 'hiking_trails']),
-                'external_id': 'mock_006',
-                'source_api': 'mock_data'
-            },
-            # Utah
-            {
-                'name': 'Arches Campground',
-                'location': 'Arches National Park, UT',
-                'state': 'UT',
-                'description': 'Desert camping among stunning red rock formations',
-                'latitude': 38.7331,
-                'longitude': -109.5925,
-                'amenities': json.dumps(['tent_sites', 'desert_views', 'stargazing']),
-                'external_id': 'mock_007',
-                'source_api': 'mock_data'
-            },
-            # Arizona
-            {
-                'name': 'Grand Canyon Campground',
-                'location': 'Grand Canyon National Park, AZ',
-                'state': 'AZ',
-                'description': 'Canyon rim camping with spectacular views',
-                'latitude': 36.1069,
-                'longitude': -112.1129,
-                'amenities': json.dumps(['tent_sites', 'canyon_views', 'visitor_center']),
-                'external_id': 'mock_008',
-                'source_api': 'mock_data'
-            },
-            # Montana
-            {
-                'name': 'Glacier Peak Campground',
-                'location': 'Glacier National Park, MT',
-                'state': 'MT',
-                'description': 'Alpine camping with glacier views and mountain goats',
-                'latitude': 48.7596,
-                'longitude': -113.7870,
-                'amenities': json.dumps(['tent_sites', 'glacier_views', 'wildlife']),
-                'external_id': 'mock_009',
-                'source_api': 'mock_data'
-            },
-            # Oregon
-            {
-                'name': 'Crater Lake Campground',
-                'location': 'Crater Lake National Park, OR',
-                'state': 'OR',
-                'description': 'Lakeside camping at the deepest lake in the US',
-                'latitude': 42.9445,
-                'longitude': -122.1090,
-                'amenities': json.dumps(['tent_sites', 'lake_views', 'hiking_trails']),
-                'external_id': 'mock_010',
-                'source_api': 'mock_data'
-            }
-        ]
-        
-        # Filter by query if provided
-        if query:
-            query_lower = query.lower()
-            
-            # If query is exactly 2 characters, treat it as a state abbreviation
-            if len(query) == 2:
-                filtered = [cg for cg in mock_campgrounds 
-                           if cg['state'].lower() == query_lower]
-            else:
-                # Regular text search on name, location, and description
-                filtered = [cg for cg in mock_campgrounds 
-                           if query_lower in cg['name'].lower() 
-                           or query_lower in cg['location'].lower()
-                           or query_lower in cg['description'].lower()]
-            
-            return filtered[:limit]
-        
-        return mock_campgrounds[:limit]
-
-
-# Global instance
+        return self.catalog.search(query, limit)
+
+
+class ProviderUnavailable(Exception):
+    """Raised when the campground provider can't answer within the search budget."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    are refused for `reset_seconds`. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning("Campground provider circuit opened after %d failures", self.failures)
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        """Forget a call that ended without an outcome (e.g. it was cancelled)."""
+        self._trial_in_flight = False
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class ProviderCampgroundService:
+    """Client for the real campground provider, with the same interface as MockCampgroundService.
+
+    All searches share one pooled httpx.AsyncClient (keep-alive, HTTP/2).
+    A search gets `settings.provider_budget_seconds` in total: that covers
+    waiting for one of `settings.provider_max_concurrency` slots, each
+    attempt (at most `settings.provider_timeout_seconds`) and the jittered
+    backoff between retries. Timeouts, connection errors, 429s and 5xxs are
+    retried up to `settings.provider_max_retries` times. When the budget runs
+    out, the provider fails otherwise or the circuit breaker is open,
+    ProviderUnavailable is raised so the caller can serve database results.
+
+    Pass `transport` (e.g. `httpx.ASGITransport(app=stub)`) to talk to a stub
+    provider instead of the network.
+    """
+
+    def __init__(
+        self,
+        search_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.search_url = search_url or settings.provider_search_url
+        self.api_key = api_key or settings.rapidapi_key
+        self.transport = transport
+        self.breaker = CircuitBreaker(settings.provider_breaker_failures, settings.provider_breaker_reset_seconds)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.searches = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared HTTP client, created on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=settings.provider_http2,
+                transport=self.transport,
+                timeout=settings.provider_timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=settings.provider_max_concurrency,
+                    max_keepalive_connections=settings.provider_max_concurrency,
+                    keepalive_expiry=settings.provider_keepalive_seconds,
+                ),
+                headers={
+                    "X-RapidAPI-Key": self.api_key or "",
+                    "X-RapidAPI-Host": urlparse(self.search_url).hostname or "",
+                },
+            )
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.provider_max_concurrency)
+        return self._semaphore
+
+    async def aclose(self) -> None:
+        """Close the shared client; the next search opens a new one."""
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+
+    async def search_campgrounds(self, query: str, limit: int = 10) -> List[Dict]:
+        """Search the provider, raising ProviderUnavailable if it can't answer within the budget."""
+        self.searches += 1
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise ProviderUnavailable("Circuit breaker is open")
+        try:
+            payload = await self._get_with_retries(query, limit, time.monotonic() + settings.provider_budget_seconds)
+            results = [self._to_campground(item) for item in self._items(payload)][:limit]
+        except (ProviderUnavailable, ValueError, KeyError, TypeError, AttributeError) as error:
+            self.failures += 1
+            self.breaker.record_failure()
+            if isinstance(error, ProviderUnavailable):
+                raise
+            raise ProviderUnavailable(f"Unexpected provider response: {error!r}") from error
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        self.breaker.record_success()
+        return results
+
+    async def _get_with_retries(self, query: str, limit: int, deadline: float):
+        attempt = 0
+        while True:
+            try:
+                return await self._get(query, limit, deadline)
+            except (_RetryableError, httpx.TransportError, asyncio.TimeoutError) as error:
+                if attempt >= settings.provider_max_retries:
+                    raise ProviderUnavailable(f"Gave up after {attempt + 1} attempts: {error!r}") from error
+                # Exponential backoff with full jitter, so retries from many requests don't line up
+                backoff = random.uniform(0, settings.provider_retry_backoff_seconds * 2 ** attempt)
+                if time.monotonic() + backoff >= deadline:
+                    raise ProviderUnavailable(f"Search budget spent after {attempt + 1} attempts") from error
+                await asyncio.sleep(backoff)
+                attempt += 1
+                self.retries += 1
+
+    async def _get(self, query: str, limit: int, deadline: float):
+        """Make one request, waiting for a concurrency slot first; both count against the deadline."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ProviderUnavailable("Search budget spent")
+        acquired = False
+        try:
+            # Awaited in this task rather than through wait_for: a timeout or cancellation either
+            # leaves the slot untaken or lands after acquired is set, and the finally gives it back
+            async with asyncio.timeout(remaining):
+                await self.semaphore.acquire()
+                acquired = True
+            timeout = min(settings.provider_timeout_seconds, deadline - time.monotonic())
+            response = await asyncio.wait_for(
+                self.client.get(self.search_url, params={"query": query, "limit": limit}), max(timeout, 0)
+            )
+        finally:
+            if acquired:
+                self.semaphore.release()
+        if response.status_code == 429 or response.status_code >= 500:
+            raise _RetryableError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise ProviderUnavailable(f"HTTP {response.status_code}")
+        return response.json()
+
+    @staticmethod
+    def _items(payload) -> List[Dict]:
+        """Get the result list from a bare list or a {"results": [...]} / {"data": [...]} envelope."""
+        if isinstance(payload, dict):
+            payload = payload.get("results", payload.get("data", []))
+        return [item for item in payload if item.get("name") and (item.get("location") or item.get("address"))]
+
+    @staticmethod
+    def _to_campground(item: Dict) -> Dict:
+        """Map a provider result onto CampgroundCreate fields."""
+        campground = {
+            "name": item["name"],
+            "location": item.get("location") or item["address"],
+            "description": item.get("description"),
+            "latitude": item.get("latitude", item.get("lat")),
+            "longitude": item.get("longitude", item.get("lng", item.get("lon"))),
+            "external_id": str(item["id"]) if item.get("id") is not None else None,
+        }
+        amenities = item.get("amenities")
+        campground["amenities"] = json.dumps(amenities) if isinstance(amenities, list) else amenities
+        for key in ("max_capacity", "has_electricity", "has_water", "has_showers", "has_wifi",
+                    "pet_friendly", "rv_friendly", "tent_friendly"):
+            if item.get(key) is not None:
+                campground[key] = item[key]
+        return campground
+
+    def stats(self) -> Dict:
+        return {
+            "configured": bool(self.search_url),
+            "searches": self.searches,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected_by_breaker": self.rejected,
+            "breaker_state": self.breaker.state,
+            "breaker_times_opened": self.breaker.times_opened,
+        }
+
+
+# Global instances
 mock_campground_service = MockCampgroundService()
+provider_campground_service = ProviderCampgroundService()
+# The real provider when it's configured, the offline catalog otherwise
+campground_service = (
+    provider_campground_service if settings.rapidapi_key and settings.provider_search_url
+    else mock_campground_service
+)
@@ -1,18 +1,19 @@
-from fastapi import Depends, HTTPException, status
+import secrets
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db, get_db
 from app.core.security import verify_token
-from app.crud.user import get_user_by_username
+from app.crud.user import get_user_by_username, get_user_by_username_async
 
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """Get the current authenticated user."""
+def _token_username(credentials: HTTPAuthorizationCredentials) -> str:
+    """Get the username a bearer token was issued to, rejecting invalid tokens."""
     token = credentials.credentials
     username = verify_token(token)
     if username is None:
@@ -21,20 +22,56 @@ def get_current_user(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = get_user_by_username(db, username=username)
+    return username
+
+
+def _require_user(user):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
     return user
 
 
+def _require_active(user):
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Get the current authenticated user."""
+    username = _token_username(credentials)
+    return _require_user(get_user_by_username(db, username=username))
+
+
 def get_current_active_user(current_user = Depends(get_current_user)):
     """Get the current active user."""
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return _require_active(current_user)
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the current authenticated user, for `async def` routes."""
+    username = _token_username(credentials)
+    return _require_user(await get_user_by_username_async(db, username=username))
+
+
+async def get_current_active_user_async(current_user = Depends(get_current_user_async)):
+    """Get the current active user, for `async def` routes."""
+    return _require_active(current_user)
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Allow the request only if it carries the configured admin key in X-Admin-Key."""
+    if not settings.admin_api_key or not x_admin_key or not secrets.compare_digest(
+        x_admin_key, settings.admin_api_key
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
@@ -5,14 +5,120 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     database_url: str = "postgresql://Uri@localhost/hiking_app"
+    # URL for async routes; defaults to database_url with asyncpg/aiosqlite as the driver
+    async_database_url: Optional[str] = None
+    
+    # Connection Pool Settings (each engine gets its own pool; ignored by SQLite file databases)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # Seconds to wait for a connection before failing
+    db_pool_recycle: int = 1800  # Replace connections older than this many seconds (-1 = never)
+    db_pool_pre_ping: bool = True  # Test connections on checkout and replace dead ones
+    db_pool_slow_checkout_ms: float = 100.0  # Log checkouts that wait at least this long
+    
+    # Query Stats Settings
+    # Share of requests whose SQL statements are counted and timed (Server-Timing header, N+1 warnings)
+    query_stats_sample_rate: float = 1.0
+    # A request running one statement shape this many times is logged as a probable N+1 query
+    query_stats_n_plus_one_threshold: int = 10
+    # Log statements running at least this long with their query plan (0 = off)
+    query_stats_slow_ms: float = 200.0
+    # File the slow query log is also written to
+    query_stats_slow_log_path: Optional[str] = None
+    
+    # Admin Settings
+    # Key required in the X-Admin-Key header by /admin endpoints; they are disabled when unset
+    admin_api_key: Optional[str] = None
     
     # JWT Settings
     secret_key: str = "your-secret-key-here-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Password Hashing Settings
+    # bcrypt cost; stored hashes with another cost are rehashed on the next login
+    bcrypt_rounds: int = 12
+    # Threads hashing passwords, separate from the request threadpool
+    password_hash_workers: int = 4
+    # Hashes running or queued before logins and sign-ups get 503 with Retry-After
+    password_hash_max_pending: int = 64
+    password_hash_retry_after_seconds: int = 1
+    
+    # Feed Settings
+    # Materialize friends' trips into a per-user timeline on write (fan-out-on-write)
+    feed_timeline_enabled: bool = False
+    # Authors with more friends than this are not fanned out; readers pull their trips instead
+    feed_fanout_max_friends: int = 1000
+    
+    # Friend Graph Settings
+    # Each worker keeps its own copy of the friend graph and picks up friendships other
+    # workers accepted or ended from the friendship_changes table at most this often (0 = never)
+    friend_graph_poll_seconds: float = 1.0
+    # Changes committed up to this late (long transactions, clock skew between hosts) are still seen
+    friend_graph_poll_overlap_seconds: int = 30
+    # Changes are kept this long; a worker that hasn't polled for longer reloads its graph
+    friend_graph_change_retention_seconds: int = 3600
+    # Also reload the whole graph after this many seconds (0 = never)
+    friend_graph_reload_seconds: int = 0
+    
+    # Friend Suggestion Settings (cache is per worker)
+    # Friends with more friends than this don't count as mutual friends
+    friend_suggestions_max_hub_degree: int = 1000
+    # Most of a user's friends expanded into friends of friends, least connected first
+    friend_suggestions_max_expanded: int = 1000
+    # Candidates with the most mutual friends kept, and scored on shared campgrounds, per user
+    friend_suggestions_candidates: int = 500
+    friend_suggestions_mutual_weight: float = 1.0
+    friend_suggestions_campground_weight: float = 0.5  # Per campground both users have a trip at
+    friend_suggestions_cache_max_entries: int = 10000
+    friend_suggestions_ttl_seconds: int = 600
+    
+    # User Search Settings
+    # Most users /friends/search returns in typeahead mode (a request per keystroke)
+    user_search_typeahead_limit: int = 5
+    
+    # Streaming Settings
+    # Rows fetched per round trip when a listing is streamed as NDJSON (Accept: application/x-ndjson)
+    stream_yield_per: int = 1000
+    
+    # Map Settings
+    # Below this zoom level the map returns clusters instead of individual trips
+    map_cluster_max_zoom: int = 10
+    # Most individual trips returned for one viewport
+    map_max_trips: int = 500
+    
+    # Tile Settings
+    tile_max_zoom: int = 16
+    tile_max_points: int = 10000  # Points encoded into one tile
+    tile_cache_max_entries: int = 10000
+    tile_cache_ttl_seconds: int = 300
+    
+    # Search Cache Settings (per worker)
+    search_cache_max_entries: int = 10000
+    search_cache_ttl_seconds: int = 300
+    search_cache_negative_ttl_seconds: int = 60  # For queries with no results
+    
     # API Settings
+    # The real campground provider is used when both the key and the search URL are set
     rapidapi_key: Optional[str] = None
+    provider_search_url: Optional[str] = None
+    provider_http2: bool = True
+    # Longest /campgrounds/search waits on the provider, across queueing, attempts and backoff;
+    # past it the search returns database results only
+    provider_budget_seconds: float = 0.8
+    provider_timeout_seconds: float = 0.5  # Per attempt
+    provider_max_retries: int = 2
+    provider_retry_backoff_seconds: float = 0.05  # Base of the jittered exponential backoff
+    provider_max_concurrency: int = 20  # Requests in flight to the provider, per worker
+    provider_keepalive_seconds: float = 30.0
+    provider_breaker_failures: int = 5  # Failed searches in a row that open the circuit
+    provider_breaker_reset_seconds: float = 30.0  # How long the circuit stays open before a trial call
+    # Offline provider catalog (JSON, JSON-lines or CSV); defaults to app/data/mock_campgrounds.json
+    mock_catalog_path: Optional[str] = None
+    
+    # Metrics Settings
+    # Longest pool, cache and provider counters may lag in /metrics
+    metrics_publish_seconds: float = 1.0
     
     # App Settings
     app_name: str = "Hiking App"
@@ -1,14 +1,73 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from .config import settings
+from .pool_stats import PoolStats, instrumented_pool_class
+from .query_stats import instrument_engine
+
+# asyncio drivers for the synchronous drivers database_url may name
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url() -> str:
+    """Get the URL of the async engine: `async_database_url`, or `database_url` with its asyncio driver."""
+    if settings.async_database_url:
+        return settings.async_database_url
+    url = make_url(settings.database_url)
+    return str(url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)))
+
+
+def get_pool_options(database_url: str, stats: PoolStats) -> dict:
+    """Build the pool arguments for an engine from the pool settings.
+
+    The dialect's default pool class is kept and instrumented. Sizing only
+    applies to queue pools; SQLite file databases use a NullPool.
+    """
+    url = make_url(database_url)
+    pool_class = url.get_dialect().get_pool_class(url)
+    options = {
+        "poolclass": instrumented_pool_class(pool_class, stats),
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if issubclass(pool_class, QueuePool):
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    return options
+
+
+# Pool counters, reported by /admin/pool-stats
+pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
 
 # Create database engine
-engine = create_engine(settings.database_url)
+engine = create_engine(settings.database_url, **get_pool_options(settings.database_url, pool_stats))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and sessions for `async def` routes. Objects stay loaded after
+# commit, since lazy loading isn't available on an AsyncSession.
+async_engine = create_async_engine(
+    get_async_database_url(), **get_pool_options(get_async_database_url(), async_pool_stats)
+)
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Per-request statement counts and timings, and the slow query log
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -20,3 +79,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,36 @@
+"""Strong ETags and If-None-Match handling for conditional GETs.
+
+ETags are built from row versions (see the `version` columns), so a route
+can answer an unchanged read with a version lookup and a 304, without
+loading or serializing the row.
+"""
+import hashlib
+from typing import Iterable, Optional, Tuple
+from fastapi import Response
+
+
+def make_etag(kind: str, row_id: int, version: int) -> str:
+    """Get the strong ETag of one row's representation."""
+    return f'"{kind}-{row_id}-v{version}"'
+
+
+def make_list_etag(kind: str, versions: Iterable[Tuple[int, int]]) -> str:
+    """Get the strong ETag of a list of rows from their (id, version) pairs, in order."""
+    digest = hashlib.sha1(",".join(f"{row_id}:{version}" for row_id, version in versions).encode())
+    return f'"{kind}-list-{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 7232 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,67 @@
+"""Fast JSON encoding for hot list endpoints.
+
+By default FastAPI validates a route's return value against its
+`response_model`, converts the result to JSON-compatible Python objects and
+then encodes it with the stdlib json module. Routes opt into the fast path
+by returning a `FastJSONResponse` themselves, which FastAPI sends as is:
+
+- plain rows (dicts, lists, pydantic models) are encoded directly by
+  pydantic-core's `to_json`, with no validation pass;
+- ORM objects are read into the schema and encoded in one go by a
+  precompiled `TypeAdapter` (see `dump_list`).
+
+The `response_model` stays on the route for the OpenAPI schema.
+"""
+from functools import lru_cache
+from typing import Any, FrozenSet, List
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from sqlalchemy import inspect
+from sqlalchemy.orm import Mapper
+from app.schemas.campground import Campground
+from app.schemas.camping_trip import CampingTrip
+
+# Precompiled serializers for the hot schemas
+CAMPGROUND_LIST = TypeAdapter(List[Campground])
+CAMPING_TRIP_LIST = TypeAdapter(List[CampingTrip])
+
+
+@lru_cache(maxsize=None)
+def _column_keys(mapper: Mapper) -> FrozenSet[str]:
+    return frozenset(column_property.key for column_property in mapper.column_attrs)
+
+
+def _fully_loaded(row: Any) -> bool:
+    """Whether every column of an ORM object is loaded, i.e. none is expired or deferred."""
+    state = inspect(row)
+    return state.dict.keys() >= _column_keys(state.mapper)
+
+
+def dump_list(adapter: TypeAdapter, rows: List[Any]) -> bytes:
+    """Encode ORM objects as a JSON array.
+
+    When every column of every row is loaded, values are read straight from
+    each object's `__dict__`, which skips SQLAlchemy's attribute descriptors.
+    Otherwise, e.g. when a commit or flush expired updated_at, every row is
+    read through its attributes, loading what is missing; reading `__dict__`
+    would send a missing optional column as null.
+    """
+    if all(_fully_loaded(row) for row in rows):
+        models = adapter.validate_python([row.__dict__ for row in rows])
+    else:
+        models = adapter.validate_python(rows, from_attributes=True)
+    return adapter.dump_json(models)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by pydantic-core instead of the stdlib json module.
+
+    Content is anything `to_json` handles, or bytes already encoded, e.g. by
+    `dump_list`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
@@ -0,0 +1,219 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.friend import Friend
+from app.models.friendship_change import FriendshipChange
+
+EMPTY = array("i")
+
+
+class FriendGraph:
+    """In-memory adjacency of accepted friendships, shared by the feed, map and search.
+
+    Each user's friends are kept in a sorted `array('i')` (4 bytes per edge end).
+    The graph is loaded from the `friends` table on first use and then updated
+    incrementally by the friend CRUD functions. Arrays are replaced rather than
+    mutated, so a caller can keep using the array it was handed.
+
+    Each worker has its own graph. The CRUD functions also log every accepted
+    or ended friendship to `friendship_changes`, and each worker polls that
+    table every `settings.friend_graph_poll_seconds` for the pairs other
+    workers changed, setting them to what their `friends` row says now.
+    """
+
+    def __init__(self):
+        self._adjacency: Dict[int, array] = {}
+        self._loaded_at: Optional[float] = None
+        # Guards the adjacency swap and incremental updates; never held across a query
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by invalidate(), so a load started before it is discarded
+        self._loads_in_flight = 0
+        # Friendship changes recorded while a load runs, replayed onto what it read
+        self._changes: List[Tuple[int, int, bool]] = []
+        # Polling of friendship_changes: where the next poll reads from, and when it is due
+        self._changes_since: Optional[datetime] = None
+        self._polled_at = 0.0
+        self._next_poll = 0.0
+        self._polling = False
+        self._listeners: List[Callable[[int, int], None]] = []
+
+    def _is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        now = time.monotonic()
+        reload_seconds = settings.friend_graph_reload_seconds
+        if reload_seconds > 0 and now - self._loaded_at > reload_seconds:
+            return True
+        # Changes older than the retention may be gone from the log, so catch up by reloading
+        retention_seconds = settings.friend_graph_change_retention_seconds - settings.friend_graph_poll_overlap_seconds
+        return settings.friend_graph_poll_seconds > 0 and now - self._polled_at > retention_seconds
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if self._is_stale():
+            self._load(db)
+        elif settings.friend_graph_poll_seconds > 0 and time.monotonic() >= self._next_poll:
+            self._poll(db)
+
+    def _load(self, db: Session) -> None:
+        """Load the graph.
+
+        The query runs without the lock held: on an async session it yields to
+        the event loop, and another caller on the loop's thread would block on
+        the lock, deadlocking the worker. While no graph is loaded each caller
+        loads one; a stale graph is reloaded by one caller while the others
+        keep using it.
+        """
+        if not self._is_stale():
+            return
+        with self._lock:
+            if not self._is_stale() or (self._loaded_at is not None and self._loads_in_flight):
+                return
+            self._loads_in_flight += 1
+            generation = self._generation
+            first_change = len(self._changes)
+        started_at = time.monotonic()
+        # Re-read changes from a little before the load, in case the load missed them
+        changes_since = datetime.utcnow() - timedelta(seconds=settings.friend_graph_poll_overlap_seconds)
+        adjacency = None
+        try:
+            rows = db.query(Friend.user_id, Friend.friend_id).filter(
+                Friend.is_accepted == True
+            ).yield_per(10000)
+            adjacency = self.build_adjacency(rows)
+        finally:
+            with self._lock:
+                if adjacency is not None and generation == self._generation:
+                    for user_id, friend_id, is_friend in self._changes[first_change:]:
+                        self._apply(adjacency, user_id, friend_id, is_friend)
+                    self._adjacency = adjacency
+                    self._loaded_at = self._polled_at = started_at
+                    self._next_poll = started_at + settings.friend_graph_poll_seconds
+                    self._changes_since = changes_since
+                self._loads_in_flight -= 1
+                if not self._loads_in_flight:
+                    self._changes = []
+
+    def _poll(self, db: Session) -> None:
+        """Apply the friendships other workers accepted or ended since the last poll.
+
+        Like a load, the query runs without the lock held, and one caller polls
+        while the others go on with the graph as it is.
+        """
+        with self._lock:
+            if self._polling or self._loaded_at is None or time.monotonic() < self._next_poll:
+                return
+            self._polling = True
+            self._next_poll = time.monotonic() + settings.friend_graph_poll_seconds
+            since = self._changes_since
+            generation = self._generation
+        polled_at = time.monotonic()
+        # Overlapping polls see changes committed late, or stamped by a host whose clock lags
+        changes_since = datetime.utcnow() - timedelta(seconds=settings.friend_graph_poll_overlap_seconds)
+        rows = None
+        changed = []
+        try:
+            rows = db.query(FriendshipChange.user_low_id, FriendshipChange.user_high_id, Friend.is_accepted).outerjoin(
+                Friend, and_(
+                    Friend.user_low_id == FriendshipChange.user_low_id,
+                    Friend.user_high_id == FriendshipChange.user_high_id
+                )
+            ).filter(FriendshipChange.changed_at >= since).distinct().all()
+        finally:
+            with self._lock:
+                self._polling = False
+                if rows is not None and generation == self._generation:
+                    for user_low_id, user_high_id, is_accepted in rows:
+                        if self._record_locked(user_low_id, user_high_id, bool(is_accepted)):
+                            changed.append((user_low_id, user_high_id))
+                    self._changes_since = changes_since
+                    self._polled_at = polled_at
+        for user_id, friend_id in changed:
+            for listener in self._listeners:
+                listener(user_id, friend_id)
+
+    def add_listener(self, listener: Callable[[int, int], None]) -> None:
+        """Call `listener(user_id, friend_id)` for each friendship another worker accepted or ended."""
+        self._listeners.append(listener)
+
+    @staticmethod
+    def build_adjacency(edges: Iterable[Tuple[int, int]]) -> Dict[int, array]:
+        """Build sorted per-user friend arrays from (user_id, friend_id) pairs."""
+        adjacency: Dict[int, array] = {}
+        for user_id, friend_id in edges:
+            adjacency.setdefault(user_id, array("i")).append(friend_id)
+            adjacency.setdefault(friend_id, array("i")).append(user_id)
+        for user_id, friends in adjacency.items():
+            adjacency[user_id] = array("i", sorted(set(friends)))
+        return adjacency
+
+    def friend_ids(self, db: Session, user_id: int) -> array:
+        """Get a user's accepted friend IDs as a sorted array. Do not mutate it."""
+        self._ensure_loaded(db)
+        return self._adjacency.get(user_id, EMPTY)
+
+    def degree(self, db: Session, user_id: int) -> int:
+        """Get how many accepted friends a user has."""
+        return len(self.friend_ids(db, user_id))
+
+    def are_friends(self, db: Session, user_id: int, other_id: int) -> bool:
+        """Check whether two users are accepted friends."""
+        friends = self.friend_ids(db, user_id)
+        index = bisect_left(friends, other_id)
+        return index < len(friends) and friends[index] == other_id
+
+    @staticmethod
+    def _apply(adjacency: Dict[int, array], user_id: int, friend_id: int, is_friend: bool) -> bool:
+        """Add or remove a friendship; return whether the graph changed."""
+        changed = False
+        for owner_id, other_id in ((user_id, friend_id), (friend_id, user_id)):
+            friends = array("i", adjacency.get(owner_id, EMPTY))
+            index = bisect_left(friends, other_id)
+            present = index < len(friends) and friends[index] == other_id
+            if present == is_friend:
+                continue
+            if is_friend:
+                friends.insert(index, other_id)
+            else:
+                del friends[index]
+            if friends:
+                adjacency[owner_id] = friends
+            else:
+                adjacency.pop(owner_id, None)
+            changed = True
+        return changed
+
+    def _record(self, user_id: int, friend_id: int, is_friend: bool) -> None:
+        with self._lock:
+            self._record_locked(user_id, friend_id, is_friend)
+
+    def _record_locked(self, user_id: int, friend_id: int, is_friend: bool) -> bool:
+        if self._loads_in_flight:
+            self._changes.append((user_id, friend_id, is_friend))
+        if self._loaded_at is None:
+            return False
+        return self._apply(self._adjacency, user_id, friend_id, is_friend)
+
+    def add_friendship(self, user_id: int, friend_id: int) -> None:
+        """Record a newly accepted friendship."""
+        self._record(user_id, friend_id, True)
+
+    def remove_friendship(self, user_id: int, friend_id: int) -> None:
+        """Record a friendship that no longer exists."""
+        self._record(user_id, friend_id, False)
+
+    def invalidate(self) -> None:
+        """Drop the graph so it is reloaded on next use."""
+        with self._lock:
+            self._adjacency = {}
+            self._loaded_at = None
+            self._generation += 1
+
+
+# Global instance
+friend_graph = FriendGraph()
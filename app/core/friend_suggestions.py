@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from heapq import nlargest
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.friend_graph import friend_graph
+
+# candidate_id -> [mutual friends, shared campgrounds]
+Candidates = Dict[int, List[int]]
+
+
+def mutual_friend_counts(db: Session, user_id: int) -> Counter:
+    """Count the mutual friends of a user and each friend of a friend who isn't their friend.
+
+    Friends with more than `settings.friend_suggestions_max_hub_degree` friends
+    don't count as mutual friends: knowing the same popular user says little,
+    and expanding them would dominate the cost. Of the rest, at most
+    `settings.friend_suggestions_max_expanded` are expanded, least connected first.
+    """
+    friends = friend_graph.friend_ids(db, user_id)
+    expanded = []
+    for friend_id in friends:
+        friends_of_friend = friend_graph.friend_ids(db, friend_id)
+        if len(friends_of_friend) <= settings.friend_suggestions_max_hub_degree:
+            expanded.append(friends_of_friend)
+    if len(expanded) > settings.friend_suggestions_max_expanded:
+        expanded = sorted(expanded, key=len)[:settings.friend_suggestions_max_expanded]
+
+    counts: Counter = Counter()
+    for friends_of_friend in expanded:
+        counts.update(friends_of_friend)  # Counted in C, a few ns per friend
+    counts.pop(user_id, None)
+    for friend_id in friends:
+        counts.pop(friend_id, None)
+    return counts
+
+
+def top_candidates(counts: Counter, limit: int) -> List[Tuple[int, int]]:
+    """Get the (candidate_id, mutual friends) pairs with the most mutual friends."""
+    if len(counts) > limit:
+        return nlargest(limit, counts.items(), key=itemgetter(1))
+    return list(counts.items())
+
+
+def rank(candidates: Candidates, limit: int) -> List[Tuple[int, int, int]]:
+    """Order candidates by score, then mutual friends, then ID; get (candidate_id, mutual, shared) triples."""
+    mutual_weight = settings.friend_suggestions_mutual_weight
+    campground_weight = settings.friend_suggestions_campground_weight
+    ranked = nlargest(
+        limit, candidates.items(),
+        key=lambda item: (item[1][0] * mutual_weight + item[1][1] * campground_weight, item[1][0], -item[0]),
+    )
+    return [(candidate_id, mutual, shared) for candidate_id, (mutual, shared) in ranked]
+
+
+class FriendSuggestionCache:
+    """Size-bounded LRU cache of each user's suggestion candidates and their scores.
+
+    When a friendship is accepted or removed, the users who gain or lose a
+    two-hop path through it have their mutual friend counts adjusted in
+    place; the two users themselves are dropped, since their own friends
+    changed. Shared campground counts only change on expiry, after
+    `settings.friend_suggestions_ttl_seconds`, which also bounds the drift
+    of the adjusted counts from a fresh expansion. A friendship another
+    worker changed only drops the two users' entries.
+    """
+
+    def __init__(self):
+        # user_id -> (stored_at, candidates)
+        self._entries: "OrderedDict[int, Tuple[float, Candidates]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.adjustments = 0
+
+    def get(self, user_id: int, limit: int) -> Optional[List[Tuple[int, int, int]]]:
+        """Get a user's top ranked (candidate_id, mutual, shared) triples, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                stored_at, candidates = entry
+                if time.monotonic() - stored_at <= settings.friend_suggestions_ttl_seconds:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return rank(candidates, limit)
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user_id: int, candidates: Candidates) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), candidates)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.friend_suggestions_cache_max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def add_friendship(self, db: Session, user_id: int, friend_id: int) -> None:
+        """Adjust the cached candidates for a newly accepted friendship (after the friend graph has it)."""
+        self._adjust(db, user_id, friend_id, 1)
+
+    def remove_friendship(self, db: Session, user_id: int, friend_id: int) -> None:
+        """Adjust the cached candidates for a friendship that no longer exists (after the friend graph drops it)."""
+        self._adjust(db, user_id, friend_id, -1)
+
+    def _adjust(self, db: Session, user_id: int, friend_id: int, change: int) -> None:
+        # Each friend of one side gains (or loses) a path to the other side through it
+        paths = []
+        for via_id, other_id in ((user_id, friend_id), (friend_id, user_id)):
+            friends = friend_graph.friend_ids(db, via_id)
+            if len(friends) <= settings.friend_suggestions_max_hub_degree:
+                paths.append((friends, other_id))
+
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries.pop(friend_id, None)
+            if not self._entries:
+                return
+            for friends, other_id in paths:
+                for owner_id in friends:
+                    entry = self._entries.get(owner_id)
+                    if entry is None or owner_id == other_id:
+                        continue
+                    candidates = entry[1]
+                    scores = candidates.get(other_id)
+                    if scores is not None:
+                        scores[0] += change
+                        if scores[0] <= 0:
+                            del candidates[other_id]
+                    elif change > 0 and len(candidates) < settings.friend_suggestions_candidates:
+                        # The owner's friends never appear among their candidates, so check this one isn't
+                        if not friend_graph.are_friends(db, owner_id, other_id):
+                            candidates[other_id] = [1, 0]
+                    else:
+                        continue
+                    self.adjustments += 1
+
+    def discard(self, *user_ids: int) -> None:
+        """Drop users' entries, so their candidates are recomputed on next use."""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def exclude(self, user_id: int, other_id: int) -> None:
+        """Stop suggesting two users to each other, e.g. once one sent the other a request."""
+        with self._lock:
+            for owner_id, candidate_id in ((user_id, other_id), (other_id, user_id)):
+                entry = self._entries.get(owner_id)
+                if entry is not None:
+                    entry[1].pop(candidate_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "adjustments": self.adjustments,
+            }
+
+
+# Global instance
+friend_suggestion_cache = FriendSuggestionCache()
+# Friendships changed by another worker: recompute both users' suggestions
+friend_graph.add_listener(friend_suggestion_cache.discard)
@@ -0,0 +1,190 @@
+"""Prometheus metrics, served at /metrics.
+
+`MetricsMiddleware` counts requests per method, route template and status,
+records their latency in a histogram and tracks the requests in progress.
+The counters other modules already keep (connection pools, search, tile and
+friend suggestion caches, campground provider, query stats) are copied into
+Prometheus metrics on the request path at most every
+`settings.metrics_publish_seconds`, so a sample costs a few microseconds and
+scrapes don't touch those modules' locks.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to a directory
+all workers can write to, emptied before every start. Each worker then
+writes its samples to memory-mapped files there, and /metrics, whichever
+worker answers it, adds them up. Without it, /metrics reports only the
+worker that answers.
+
+Cache hit rates are derived at query time, e.g.
+`rate(cache_hits_total[5m]) / (rate(cache_hits_total[5m]) + rate(cache_misses_total[5m]))`.
+"""
+import os
+import threading
+import time
+from typing import Dict, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from app.core.api_service import provider_campground_service
+from app.core.config import settings
+from app.core.database import async_engine, async_pool_stats, engine, pool_stats
+from app.core.friend_suggestions import friend_suggestion_cache
+from app.core.query_stats import query_stats
+from app.core.search_cache import search_result_cache
+from app.core.tiles import tile_cache
+
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Route label of requests that matched no route, so unknown paths can't grow the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, including streaming its body",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being handled", multiprocess_mode="livesum")
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Connections each pool keeps open, summed over workers", ["engine"], multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", ["engine"], multiprocess_mode="livesum")
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections checked out", ["engine"])
+DB_POOL_WAIT = Counter("db_pool_wait_seconds_total", "Time spent waiting for a connection", ["engine"])
+DB_POOL_OVERFLOWS = Counter("db_pool_overflows_total", "Overflow connections opened", ["engine"])
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that timed out", ["engine"])
+DB_STATEMENTS = Counter("db_statements_total", "SQL statements run by sampled requests (see QUERY_STATS_SAMPLE_RATE)")
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "SQL statements slower than QUERY_STATS_SLOW_MS")
+
+CACHE_HITS = Counter("cache_hits_total", "Cache lookups that found an entry", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache lookups that found no entry", ["cache"])
+CACHE_ENTRIES = Gauge("cache_entries", "Entries cached, summed over workers", ["cache"], multiprocess_mode="livesum")
+
+PROVIDER_SEARCHES = Counter("campground_provider_searches_total", "Searches sent to the campground provider")
+PROVIDER_RETRIES = Counter("campground_provider_retries_total", "Retried provider requests")
+PROVIDER_FAILURES = Counter("campground_provider_failures_total", "Searches the provider couldn't answer in time")
+PROVIDER_REJECTED = Counter("campground_provider_rejected_total", "Searches not sent because the circuit was open")
+PROVIDER_CIRCUIT_OPEN = Gauge("campground_provider_circuit_open", "Workers whose provider circuit is open", multiprocess_mode="livesum")
+
+
+class CounterPublisher:
+    """Copy counters kept by other modules into Prometheus metrics.
+
+    Those counters are per-worker totals, so each publish adds what they
+    grew by since the last one. A total that went down (its module was
+    reset) is taken as the new baseline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._published: Dict[Tuple, float] = {}
+        self._next_publish = 0.0
+
+    def _add(self, counter: Counter, total: float, *labels: str) -> None:
+        key = (counter, labels)
+        growth = total - self._published.get(key, 0)
+        if growth > 0:
+            (counter.labels(*labels) if labels else counter).inc(growth)
+        self._published[key] = total
+
+    def maybe_publish(self) -> None:
+        """Publish unless it was done less than `settings.metrics_publish_seconds` ago or is in progress."""
+        if time.monotonic() < self._next_publish or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_publish = time.monotonic() + settings.metrics_publish_seconds
+            self._publish()
+        finally:
+            self._lock.release()
+
+    def publish(self) -> None:
+        with self._lock:
+            self._publish()
+
+    def _publish(self) -> None:
+        for name, stats, pool in (("sync", pool_stats, engine.pool), ("async", async_pool_stats, async_engine.sync_engine.pool)):
+            snapshot = stats.snapshot(pool)
+            DB_POOL_SIZE.labels(name).set(snapshot["size"] or 0)
+            DB_POOL_CHECKED_OUT.labels(name).set(snapshot["checked_out"])
+            self._add(DB_POOL_CHECKOUTS, snapshot["checkouts"], name)
+            self._add(DB_POOL_WAIT, snapshot["average_wait_ms"] * snapshot["checkouts"] / 1000, name)
+            self._add(DB_POOL_OVERFLOWS, snapshot["overflow_events"], name)
+            self._add(DB_POOL_TIMEOUTS, snapshot["timeouts"], name)
+
+        statements = query_stats.stats()
+        self._add(DB_STATEMENTS, statements["statements"])
+        self._add(DB_SLOW_QUERIES, statements["slow_queries"])
+
+        caches = (("campground_search", search_result_cache), ("tiles", tile_cache), ("friend_suggestions", friend_suggestion_cache))
+        for name, cache in caches:
+            snapshot = cache.stats()
+            CACHE_ENTRIES.labels(name).set(snapshot["entries"])
+            self._add(CACHE_HITS, snapshot["hits"], name)
+            self._add(CACHE_MISSES, snapshot["misses"], name)
+
+        provider = provider_campground_service.stats()
+        self._add(PROVIDER_SEARCHES, provider["searches"])
+        self._add(PROVIDER_RETRIES, provider["retries"])
+        self._add(PROVIDER_FAILURES, provider["failures"])
+        self._add(PROVIDER_REJECTED, provider["rejected_by_breaker"])
+        PROVIDER_CIRCUIT_OPEN.set(provider["breaker_state"] == "open")
+
+
+# Global instance
+counter_publisher = CounterPublisher()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Get the metrics of all workers in the Prometheus text format, and its content type."""
+    counter_publisher.publish()
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges (in progress, pool, cache sizes) from the multiprocess totals."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request per route template."""
+
+    def __init__(self, app):
+        self.app = app
+        # Label children, so a sample skips the labels() lookup
+        self._requests: Dict[Tuple[str, str, int], Counter] = {}
+        self._durations: Dict[Tuple[str, str], Histogram] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else UNMATCHED_ROUTE)
+            duration = self._durations.get(key)
+            if duration is None:
+                duration = self._durations[key] = REQUEST_DURATION.labels(*key)
+            duration.observe(elapsed)
+            requests = self._requests.get(key + (status,))
+            if requests is None:
+                requests = self._requests[key + (status,)] = REQUESTS.labels(*key, str(status))
+            requests.inc()
+            counter_publisher.maybe_publish()
@@ -0,0 +1,98 @@
+"""Newline-delimited JSON responses for large listings.
+
+A listing route returns `ndjson_response(rows, ...)` when the request's
+Accept header asks for `application/x-ndjson` (see `wants_ndjson`). Rows come
+from a sync or async iterator, typically over a server-side cursor, and are
+encoded one JSON document per line and sent in chunks of about
+`CHUNK_BYTES`. The whole result is never held in memory, and the first rows
+go out before the last ones are fetched.
+
+The request's own session is closed as soon as the route returns, before the
+body is streamed, so rows must be read on a session of their own: see
+`stream_with_session` and `stream_with_async_session`.
+"""
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from app.core.database import AsyncSessionLocal, SessionLocal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Encoded rows are buffered up to this size before being sent
+CHUNK_BYTES = 64 * 1024
+
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for newline-delimited JSON."""
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept.lower()
+
+
+def stream_with_session(stream: Callable[..., Iterable], *args, **kwargs) -> Iterator:
+    """Iterate over `stream(db, *args, **kwargs)` on a new session that stays open until the iteration ends."""
+    db = SessionLocal()
+    try:
+        yield from stream(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+async def stream_with_async_session(stream: Callable[..., AsyncIterable], *args, **kwargs) -> AsyncIterator:
+    """Iterate over `stream(db, *args, **kwargs)` on a new async session that stays open until the iteration ends."""
+    async with AsyncSessionLocal() as db:
+        async for row in stream(db, *args, **kwargs):
+            yield row
+
+
+def dumps_row(row: dict) -> str:
+    """Encode a plain dict row the way FastJSONResponse encodes it in a list."""
+    return to_json(row).decode()
+
+
+class _ChunkBuffer:
+    """Collects encoded lines until there are about CHUNK_BYTES of them."""
+
+    def __init__(self):
+        self.lines = []
+        self.size = 0
+
+    def add(self, line: str) -> Optional[str]:
+        """Add a line; returns a chunk to send once the buffer is full."""
+        self.lines.append(line)
+        self.size += len(line)
+        return self.take() if self.size >= CHUNK_BYTES else None
+
+    def take(self) -> str:
+        chunk = "".join(self.lines)
+        self.lines = []
+        self.size = 0
+        return chunk
+
+
+def ndjson_response(
+    rows: Union[Iterable, AsyncIterable],
+    encode: Callable[..., str] = dumps_row,
+    headers: Optional[dict] = None
+) -> StreamingResponse:
+    """Stream rows as NDJSON, encoding each one with `encode`.
+
+    A sync iterator is consumed on the threadpool, so it may do blocking
+    database work.
+    """
+    buffer = _ChunkBuffer()
+    if hasattr(rows, "__aiter__"):
+        async def chunks():
+            async for row in rows:
+                chunk = buffer.add(encode(row) + "\n")
+                if chunk:
+                    yield chunk
+            if buffer.lines:
+                yield buffer.take()
+    else:
+        def chunks():
+            for row in rows:
+                chunk = buffer.add(encode(row) + "\n")
+                if chunk:
+                    yield chunk
+            if buffer.lines:
+                yield buffer.take()
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,28 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Build an opaque keyset cursor from a (sort value, id) pair."""
+    payload = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a keyset cursor. Raises ValueError if the cursor is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def next_cursor(trips: List, limit: int) -> Optional[str]:
+    """Return the cursor for the page after `trips`, or None on the last page."""
+    if not trips or len(trips) < limit:
+        return None
+    last = trips[-1]
+    return encode_cursor(last.start_date, last.id)
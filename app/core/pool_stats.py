@@ -0,0 +1,150 @@
+"""Connection pool instrumentation.
+
+`instrumented_pool_class` wraps a SQLAlchemy pool class so that every
+checkout records how long it waited for a connection, whether it had to open
+an overflow connection and whether it timed out. Checkouts that wait longer
+than `settings.db_pool_slow_checkout_ms` are logged with the pool's state.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Set, Type
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Counters for one engine's connection pool.
+
+    Wait times are in milliseconds and cover successful checkouts only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        # Connections currently open and currently checked out, which a reset doesn't change
+        self.open_connections = 0
+        self.checked_out = 0
+        # Connection records of the checkouts recorded and not yet checked in
+        self._checked_out_records: Set[Any] = set()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.peak_checked_out = self.checked_out
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.slow_checkouts = 0
+            self.overflow_events = 0
+            self.timeouts = 0
+
+    def record_checkout(self, connection_record: Any, wait_ms: float) -> bool:
+        """Record a successful checkout; returns whether it counts as slow."""
+        slow = wait_ms >= settings.db_pool_slow_checkout_ms
+        with self._lock:
+            self.checkouts += 1
+            self._checked_out_records.add(connection_record)
+            self.checked_out = len(self._checked_out_records)
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.slow_checkouts += slow
+        return slow
+
+    def record_checkin(self, connection_record: Any) -> None:
+        """Record a checkin; ignored for connections whose checkout wasn't recorded.
+
+        The pool also checks in a connection whose checkout failed, e.g. when
+        the pre-ping's reconnect fails, and counting that would take
+        `checked_out` below zero.
+        """
+        with self._lock:
+            self._checked_out_records.discard(connection_record)
+            self.checked_out = len(self._checked_out_records)
+
+    def record_connect(self, pool_size: int) -> None:
+        """Record a new database connection; it is an overflow connection if it takes the count past `pool_size`."""
+        with self._lock:
+            self.open_connections += 1
+            self.overflow_events += self.open_connections > pool_size
+
+    def record_close(self) -> None:
+        with self._lock:
+            self.open_connections -= 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool: Pool) -> Dict:
+        """Get the counters together with the pool's configured size."""
+        with self._lock:
+            stats = {
+                "pool": type(pool).__name__,
+                "size": pool.size() if callable(getattr(pool, "size", None)) else None,
+                "max_overflow": getattr(pool, "_max_overflow", None),
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "average_wait_ms": self.total_wait_ms / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait_ms,
+                "slow_checkouts": self.slow_checkouts,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+            }
+        return stats
+
+
+class _InstrumentedPool:
+    """Mixin recording checkouts, checkins and overflow connections into `stats`."""
+
+    stats: PoolStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        event.listen(self, "connect", self._on_connect)
+        event.listen(self, "close", self._on_close)
+        event.listen(self, "checkin", self._on_checkin)
+        # A detached connection is checked in without its record, so it stops counting here
+        event.listen(self, "detach", self._on_checkin)
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            wait_ms = (time.perf_counter() - started) * 1000
+            self.stats.record_timeout()
+            logger.warning("%s pool checkout timed out after %.0f ms: %s", self.stats.name, wait_ms, self.status())
+            raise
+        wait_ms = (time.perf_counter() - started) * 1000
+        if self.stats.record_checkout(connection._connection_record, wait_ms):
+            logger.warning("%s pool checkout waited %.0f ms: %s", self.stats.name, wait_ms, self.status())
+        return connection
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        # Counted here rather than from overflow(), which also counts connections other
+        # threads are still opening. Pools without a size() (NullPool) never overflow.
+        size = getattr(self, "size", None)
+        if callable(size):
+            self.stats.record_connect(size())
+
+    def _on_close(self, dbapi_connection, connection_record):
+        if callable(getattr(self, "size", None)):
+            self.stats.record_close()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.stats.record_checkin(connection_record)
+
+
+def instrumented_pool_class(pool_class: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    """Subclass a pool class so it reports into `stats`.
+
+    `stats` is a class attribute, so it survives the pool being recreated
+    by `engine.dispose()`.
+    """
+    return type(f"Instrumented{pool_class.__name__}", (_InstrumentedPool, pool_class), {"stats": stats})
@@ -0,0 +1,203 @@
+"""Per-request SQL statement counting and timing.
+
+`instrument_engine` hooks an engine's cursor events. Statements executed while
+a sampled request is handled (see `QueryStatsMiddleware` and
+`settings.query_stats_sample_rate`) are counted and timed against that
+request. The middleware reports the totals in a Server-Timing header
+(`db;dur=<ms>;count=<statements>`), and it logs statement shapes a request
+ran `settings.query_stats_n_plus_one_threshold` times or more as probable
+N+1 queries. Statements running longer than `settings.query_stats_slow_ms`
+are logged with their query plan whether or not the request was sampled;
+set QUERY_STATS_SLOW_LOG_PATH to also write them to a file.
+
+Statements are timed until the driver returns from execute, so the time
+spent fetching rows is not included. Streamed responses only report the
+statements run before the first byte.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(__name__ + ".slow")
+if settings.query_stats_slow_log_path:
+    slow_query_logger.addHandler(logging.FileHandler(settings.query_stats_slow_log_path))
+
+# Bind parameter placeholders of the supported drivers: ?, %(name)s, $1
+_PLACEHOLDER = re.compile(r"\?|%\(\w+\)s|\$\d+")
+# A parenthesized list of placeholders, as in an expanded IN clause
+_PLACEHOLDER_LIST = re.compile(r"\(\?(?:, \?)+\)")
+
+# Plan query per dialect; EXPLAIN QUERY PLAN rows end with the plan text, EXPLAIN rows are only that
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+
+# Probable N+1 queries kept for /admin/query-stats
+RECENT_N_PLUS_ONE = 20
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so executions differing only in IN-list length compare equal."""
+    return _PLACEHOLDER_LIST.sub("(?)", _PLACEHOLDER.sub("?", " ".join(statement.split())))
+
+
+class RequestQueries:
+    """Statements executed while handling one request."""
+
+    __slots__ = ("count", "total_ms", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        # statement -> executions
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated_shapes(self, threshold: int) -> Dict[str, int]:
+        """Get the statement shapes executed at least `threshold` times."""
+        shapes: Dict[str, int] = {}
+        for statement, executions in self.statements.items():
+            shape = statement_shape(statement)
+            shapes[shape] = shapes.get(shape, 0) + executions
+        return {shape: executions for shape, executions in shapes.items() if executions >= threshold}
+
+    def server_timing(self) -> str:
+        return f"db;dur={self.total_ms:.2f};count={self.count}"
+
+
+_current_request: ContextVar[Optional[RequestQueries]] = ContextVar("current_request_queries", default=None)
+
+
+class QueryStats:
+    """Worker-wide totals of the sampled requests' statements, N+1 warnings and slow queries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sampled_requests = 0
+        self.statements = 0
+        self.total_ms = 0.0
+        self.max_statements = 0
+        self.n_plus_one_requests = 0
+        self.slow_queries = 0
+        self.recent_n_plus_one = deque(maxlen=RECENT_N_PLUS_ONE)
+
+    def record_request(self, route: str, queries: RequestQueries) -> None:
+        repeated = queries.repeated_shapes(settings.query_stats_n_plus_one_threshold)
+        for shape, executions in repeated.items():
+            logger.warning("Probable N+1 query in %s: %d executions of %s", route, executions, shape)
+        with self._lock:
+            self.sampled_requests += 1
+            self.statements += queries.count
+            self.total_ms += queries.total_ms
+            self.max_statements = max(self.max_statements, queries.count)
+            if repeated:
+                self.n_plus_one_requests += 1
+                self.recent_n_plus_one.extend(
+                    {"route": route, "executions": executions, "statement": shape}
+                    for shape, executions in repeated.items()
+                )
+
+    def record_slow_query(self) -> None:
+        with self._lock:
+            self.slow_queries += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sample_rate": settings.query_stats_sample_rate,
+                "sampled_requests": self.sampled_requests,
+                "statements": self.statements,
+                "average_statements": self.statements / self.sampled_requests if self.sampled_requests else 0.0,
+                "max_statements": self.max_statements,
+                "average_db_ms": self.total_ms / self.sampled_requests if self.sampled_requests else 0.0,
+                "n_plus_one_requests": self.n_plus_one_requests,
+                "recent_n_plus_one": list(self.recent_n_plus_one),
+                "slow_queries": self.slow_queries,
+            }
+
+
+# Global instance
+query_stats = QueryStats()
+
+
+def explain(connection, statement: str, parameters) -> Optional[str]:
+    """Get the query plan of a SELECT, on the same DBAPI connection; None when it can't be explained."""
+    prefix = EXPLAIN_PREFIXES.get(connection.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as error:  # The plan is a diagnostic; never fail the query over it
+        return f"(EXPLAIN failed: {error})"
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    connection.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - connection.info["query_started"]) * 1000
+    queries = _current_request.get()
+    if queries is not None:
+        queries.record(statement, elapsed_ms)
+    if elapsed_ms >= settings.query_stats_slow_ms > 0:
+        query_stats.record_slow_query()
+        # A streamed result still holds the connection's cursor open
+        streaming = context is not None and context.execution_options.get("stream_results")
+        plan = None if executemany or streaming else explain(connection, statement, parameters)
+        slow_query_logger.warning(
+            "Slow query (%.1f ms): %s\nParameters: %r%s",
+            elapsed_ms, " ".join(statement.split()), parameters, f"\nPlan:\n{plan}" if plan else ""
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time the statements of a (sync) engine; pass `sync_engine` for an async one."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Collect the SQL statements of a sample of requests and report them in a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= settings.query_stats_sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current_request.set(queries)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", []))
+                MutableHeaders(raw=message["headers"]).append("Server-Timing", queries.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            route = scope.get("route")
+            query_stats.record_request(
+                f"{scope['method']} {route.path if route is not None else scope['path']}", queries
+            )
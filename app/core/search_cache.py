@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.search_index import tokenize
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a search query, used as the cache key."""
+    return " ".join(query.lower().split())
+
+
+def _index_token(query_tokens: List[str]) -> str:
+    """The query token an entry is indexed under: the longest, as it prefixes the fewest words."""
+    return max(query_tokens, key=len) if query_tokens else ""
+
+
+class SearchResultCache:
+    """Size-bounded LRU cache of campground search results keyed by (normalized query, limit).
+
+    Empty results are cached too (negative caching), with their own, usually
+    shorter, TTL. When a campground is added, `invalidate_campground` drops
+    every entry whose query could match it, so new rows show up immediately
+    in this worker; other workers pick them up when their entries expire, as
+    does this one for queries that match only through Postgres stemming.
+    Entries are indexed by the longest word of their query, so invalidation
+    only checks the entries whose longest word prefixes one of the
+    campground's words, however many entries are cached.
+    """
+
+    def __init__(self):
+        # key -> (stored_at, results, query tokens)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, list, List[str]]]" = OrderedDict()
+        # Longest query token ("" for queries without any) -> keys of the entries with it
+        self._keys_by_token: Dict[str, Set[Tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, query: str, limit: int) -> Optional[list]:
+        """Get cached results, or None on a miss. Do not mutate the returned list."""
+        key = (normalize_query(query), limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, results, _ = entry
+                ttl = settings.search_cache_ttl_seconds if results else settings.search_cache_negative_ttl_seconds
+                if time.monotonic() - stored_at <= ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.negative_hits += not results
+                    return results
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, query: str, limit: int, results: list) -> None:
+        key = (normalize_query(query), limit)
+        query_tokens = tokenize(query)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), results, query_tokens)
+            self._keys_by_token.setdefault(_index_token(query_tokens), set()).add(key)
+            while len(self._entries) > settings.search_cache_max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_campground(self, name: Optional[str], location: Optional[str], description: Optional[str]) -> None:
+        """Drop every entry whose query could match a new campground.
+
+        A query could match when each of its words is a prefix of a word in
+        the campground's name, location or description, which is how the
+        in-process search index matches. Postgres full-text search matches
+        English stems instead, and stemming isn't reproduced here, so an
+        entry matching only through a stem stays cached until its TTL: e.g.
+        "campgrounds" (stem "campground") is kept when a "Pine Campground" is
+        added, as "campgrounds" doesn't prefix "campground".
+        """
+        words = set(tokenize(name)) | set(tokenize(location)) | set(tokenize(description))
+        # Every token some query matching the campground could be indexed under
+        prefixes = {word[:end] for word in words for end in range(1, len(word) + 1)}
+        prefixes.add("")
+        with self._lock:
+            stale = []
+            for prefix in prefixes:
+                for key in self._keys_by_token.get(prefix, ()):
+                    query_tokens = self._entries[key][2]
+                    if all(token in prefixes for token in query_tokens):
+                        stale.append(key)
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_token.clear()
+
+    def _remove(self, key: Tuple[str, int]) -> None:
+        """Drop an entry and its index entry; call with the lock held."""
+        index_token = _index_token(self._entries.pop(key)[2])
+        keys = self._keys_by_token[index_token]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_token[index_token]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Global instance
+search_result_cache = SearchResultCache()
@@ -0,0 +1,176 @@
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from itertools import product
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.models.campground import Campground
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Name matches outrank location (which carries the state) and description matches
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+
+# Most vocabulary terms a trailing prefix may expand to
+MAX_PREFIX_EXPANSIONS = 32
+
+# Query words beyond this many are ignored
+MAX_QUERY_TERMS = 6
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class CampgroundSearchIndex:
+    """In-process inverted index over campground name, location and description.
+
+    Used for ranked search when the database has no full-text search. Each
+    term maps to one sorted `array('i')` of campground IDs per field. A
+    campground is only listed under the highest-weighted field the term
+    appears in, so the best single-term matches are a slice of the postings.
+    Rows are loaded incrementally by ID, so campgrounds inserted by any worker
+    are picked up on the next search.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Tuple[array, array, array]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self._documents = 0
+        self._max_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, campground_id: int, name: Optional[str], location: Optional[str], description: Optional[str]) -> None:
+        """Index one campground. IDs must be added in increasing order."""
+        best_field: Dict[str, int] = {}
+        for field, text in enumerate((name, location, description)):
+            for token in tokenize(text):
+                best_field.setdefault(token, field)
+        for token, field in best_field.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = (array("i"), array("i"), array("i"))
+                self._vocabulary_dirty = True
+            postings[field].append(campground_id)
+        self._documents += 1
+        self._max_id = max(self._max_id, campground_id)
+
+    def refresh(self, db: Session) -> None:
+        """Index campgrounds inserted since the last refresh.
+
+        The rows are read without the lock held: on async sessions the query
+        yields to the event loop mid-read, and a second refresh on the loop's
+        thread would block on the lock and deadlock the worker. Only adding
+        them is locked, and rows a concurrent refresh already added are
+        skipped. So when this returns, the index holds every campground
+        committed before the call, never a partly loaded set.
+        """
+        rows = db.query(
+            Campground.id, Campground.name, Campground.location, Campground.description
+        ).filter(Campground.id > self._max_id).order_by(Campground.id).yield_per(10000)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == 10000:
+                self._add_new(batch)
+                batch = []
+        self._add_new(batch)
+
+    def _add_new(self, rows: List[Tuple[int, Optional[str], Optional[str], Optional[str]]]) -> None:
+        with self._lock:
+            for row in rows:
+                if row[0] > self._max_id:
+                    self.add(*row)
+
+    def _expand(self, token: str) -> List[str]:
+        """Get the vocabulary terms starting with `token`."""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect_left(self._vocabulary, token)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def _idf(self, matches: int) -> float:
+        return math.log(1 + (self._documents - matches + 0.5) / (matches + 0.5))
+
+    def _field_sets(self, terms: List[str]) -> Tuple[Set[int], Set[int], Set[int]]:
+        """Merge the postings of one or more terms into per-field ID sets.
+
+        An ID is only kept in the highest-weighted field any of the terms hits.
+        """
+        if len(terms) == 1:
+            postings = self._postings[terms[0]]
+            return set(postings[0]), set(postings[1]), set(postings[2])
+        merged: List[Set[int]] = []
+        seen: Set[int] = set()
+        for field in range(len(FIELD_WEIGHTS)):
+            ids = set().union(*(self._postings[term][field] for term in terms)) - seen
+            seen |= ids
+            merged.append(ids)
+        return merged[0], merged[1], merged[2]
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """Get the IDs of the best `limit` campgrounds matching every query term, best first.
+
+        A trailing term that isn't a whole indexed word matches as a prefix,
+        so partially typed words work. Ties are broken by lowest ID.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not tokens or limit <= 0:
+            return []
+        if any(token not in self._postings for token in tokens[:-1]):
+            return []
+
+        if len(tokens) == 1 and tokens[0] in self._postings:
+            # A single term: postings are already ordered by field weight
+            results: List[int] = []
+            for ids in self._postings[tokens[0]]:
+                results.extend(ids[:limit - len(results)])
+                if len(results) == limit:
+                    break
+            return results
+
+        term_groups = [[token] for token in tokens[:-1]]
+        if tokens[-1] in self._postings:
+            term_groups.append([tokens[-1]])
+        else:
+            prefix_terms = self._expand(tokens[-1])
+            if not prefix_terms:
+                return []
+            term_groups.append(prefix_terms)
+
+        fields = [self._field_sets(terms) for terms in term_groups]
+        idfs = [self._idf(sum(len(ids) for ids in term_fields)) for term_fields in fields]
+
+        # Every campground's score is fixed by which field each term hit, so walk
+        # the field combinations from best to worst and intersect their ID sets
+        combinations = sorted(
+            product(range(len(FIELD_WEIGHTS)), repeat=len(fields)),
+            key=lambda combination: -sum(
+                FIELD_WEIGHTS[field] * idf for field, idf in zip(combination, idfs)
+            )
+        )
+        results = []
+        for combination in combinations:
+            sets = sorted((fields[term][field] for term, field in enumerate(combination)), key=len)
+            if not sets[0]:
+                continue
+            matches = sets[0].intersection(*sets[1:])
+            if matches:
+                results.extend(heapq.nsmallest(limit - len(results), matches))
+                if len(results) == limit:
+                    break
+        return results
+
+
+# Global instance
+campground_search_index = CampgroundSearchIndex()
@@ -1,11 +1,14 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Hashes made with another cost are flagged for rehashing.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -13,11 +16,66 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a new hash if the stored one uses outdated settings."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued; the caller should retry later."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, fixed-size thread pool.
+
+    bcrypt releases the GIL, so a few threads hash in parallel without
+    occupying the request threadpool or the event loop. At most
+    `settings.password_hash_max_pending` hashes may be running or queued;
+    beyond that, calls fail fast with PasswordHasherBusy.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run(self, function, *args):
+        with self._lock:
+            if self._pending >= settings.password_hash_max_pending:
+                raise PasswordHasherBusy()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+                )
+        try:
+            return await asyncio.wrap_future(self._executor.submit(function, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password off the event loop (see `verify_and_update_password`)."""
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password off the event loop."""
+        return await self._run(get_password_hash, password)
+
+
+# Global instance
+password_hasher = PasswordHasher()
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
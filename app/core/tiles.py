@@ -0,0 +1,146 @@
+"""Map tiles of campground and trip points.
+
+Tiles use XYZ (slippy map) addressing in Web Mercator and are encoded in a
+compact packed format. All integers are little-endian:
+
+    header  magic b"CSPT", version u8 (=1), z u8, reserved u16, x u32, y u32, count u32
+    points  count x (id u32, px u16, py u16)
+
+`px`/`py` are the point's position inside the tile on a TILE_EXTENT grid,
+with the origin at the tile's north-west corner. `id` is the campground ID or
+the trip ID, depending on the layer.
+"""
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from app.core.config import settings
+
+TILE_MEDIA_TYPE = "application/x-campshare-tile"
+TILE_EXTENT = 4096
+MAX_LATITUDE = 85.0511287798
+
+_HEADER = struct.Struct("<4sBBHIII")
+_POINT = struct.Struct("<IHH")
+
+CAMPGROUND_LAYER = "campgrounds"
+TRIP_LAYER = "camping_trips"
+
+
+def _world_xy(latitude: float, longitude: float) -> Tuple[float, float]:
+    """Project a coordinate onto the unit Web Mercator square (0..1, north-west origin)."""
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    sin_lat = math.sin(math.radians(latitude))
+    world_x = (longitude + 180.0) / 360.0
+    world_y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return world_x, world_y
+
+
+def tile_for_point(latitude: float, longitude: float, z: int) -> Tuple[int, int]:
+    """Get the (x, y) of the tile containing a coordinate at zoom `z`."""
+    world_x, world_y = _world_xy(latitude, longitude)
+    tiles = 2 ** z
+    return min(int(world_x * tiles), tiles - 1), min(int(world_y * tiles), tiles - 1)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Get a tile's (min_lat, min_lng, max_lat, max_lng)."""
+    tiles = 2 ** z
+
+    def latitude(tile_y: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / tiles))))
+
+    return latitude(y + 1), x / tiles * 360.0 - 180.0, latitude(y), (x + 1) / tiles * 360.0 - 180.0
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= settings.tile_max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def encode_tile(z: int, x: int, y: int, points: Iterable[Tuple[int, float, float]]) -> bytes:
+    """Pack (id, latitude, longitude) points into a tile."""
+    tiles = 2 ** z
+    body = bytearray()
+    count = 0
+    for point_id, latitude, longitude in points:
+        world_x, world_y = _world_xy(latitude, longitude)
+        px = int((world_x * tiles - x) * TILE_EXTENT)
+        py = int((world_y * tiles - y) * TILE_EXTENT)
+        body += _POINT.pack(point_id, max(0, min(TILE_EXTENT - 1, px)), max(0, min(TILE_EXTENT - 1, py)))
+        count += 1
+    return _HEADER.pack(b"CSPT", 1, z, 0, x, y, count) + bytes(body)
+
+
+class TileCache:
+    """Size-bounded LRU cache of encoded tiles keyed by (layer, owner, z, x, y, version).
+
+    `owner` is None for shared layers and a user ID for per-user layers.
+    Bumping a layer's version invalidates all of its tiles at once, and
+    `invalidate_point` drops only the tiles that contain one coordinate.
+    Entries also expire after `settings.tile_cache_ttl_seconds`, which bounds
+    staleness when several workers each keep their own cache.
+    """
+
+    def __init__(self):
+        self._tiles: "OrderedDict[tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._versions: Dict[Tuple[str, Optional[int]], int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, layer: str, owner: Optional[int], z: int, x: int, y: int) -> tuple:
+        return layer, owner, z, x, y, self._versions.get((layer, owner), 0)
+
+    def get(self, layer: str, owner: Optional[int], z: int, x: int, y: int) -> Optional[bytes]:
+        with self._lock:
+            key = self._key(layer, owner, z, x, y)
+            entry = self._tiles.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, tile = entry
+            if time.monotonic() - stored_at > settings.tile_cache_ttl_seconds:
+                del self._tiles[key]
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def put(self, layer: str, owner: Optional[int], z: int, x: int, y: int, tile: bytes) -> None:
+        with self._lock:
+            key = self._key(layer, owner, z, x, y)
+            self._tiles[key] = (time.monotonic(), tile)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > settings.tile_cache_max_entries:
+                self._tiles.popitem(last=False)
+
+    def invalidate_point(self, layer: str, owner: Optional[int], latitude: Optional[float], longitude: Optional[float]) -> None:
+        """Drop every cached tile of a layer that contains the given coordinate."""
+        if latitude is None or longitude is None:
+            return
+        with self._lock:
+            for z in range(settings.tile_max_zoom + 1):
+                x, y = tile_for_point(latitude, longitude, z)
+                self._tiles.pop(self._key(layer, owner, z, x, y), None)
+
+    def invalidate_layer(self, layer: str, owner: Optional[int] = None) -> None:
+        """Invalidate every tile of a layer by bumping its version."""
+        with self._lock:
+            self._versions[(layer, owner)] = self._versions.get((layer, owner), 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._tiles),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global instance
+tile_cache = TileCache()
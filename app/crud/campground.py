@@ -1,7 +1,14 @@
+from sqlalchemy import func, literal_column, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.campground import Campground
+from app.core.config import settings
+from app.core.search_cache import search_result_cache
+from app.core.search_index import campground_search_index, tokenize
+from app.core.tiles import CAMPGROUND_LAYER, tile_cache
+from app.models.campground import Campground, CAMPGROUND_SEARCH_VECTOR
 from app.schemas.campground import CampgroundCreate
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 
 def get_campground(db: Session, campground_id: int) -> Optional[Campground]:
@@ -9,22 +16,64 @@ def get_campground(db: Session, campground_id: int) -> Optional[Campground]:
     return db.query(Campground).filter(Campground.id == campground_id).first()
 
 
+def get_campground_version(db: Session, campground_id: int) -> Optional[int]:
+    """Get a campground's version without loading the row, or None if it doesn't exist."""
+    return db.query(Campground.version).filter(Campground.id == campground_id).scalar()
+
+
 def get_campground_by_external_id(db: Session, external_id: str) -> Optional[Campground]:
     """Get a campground by external API ID."""
     return db.query(Campground).filter(Campground.external_id == external_id).first()
 
 
 def get_campgrounds(db: Session, skip: int = 0, limit: int = 100) -> List[Campground]:
-    """Get multiple campgrounds with pagination."""
-    return db.query(Campground).offset(skip).limit(limit).all()
+    """Get multiple campgrounds with pagination, in ID order."""
+    return db.query(Campground).order_by(Campground.id).offset(skip).limit(limit).all()
+
+
+def get_campground_page_versions(db: Session, skip: int = 0, limit: int = 100) -> List[Tuple[int, int]]:
+    """Get the (id, version) pairs of the page `get_campgrounds` would return."""
+    return db.query(Campground.id, Campground.version).order_by(Campground.id).offset(skip).limit(limit).all()
 
 
 def search_campgrounds(db: Session, query: str, skip: int = 0, limit: int = 10) -> List[Campground]:
-    """Search campgrounds by name or location."""
-    return db.query(Campground).filter(
-        (Campground.name.ilike(f"%{query}%")) | 
-        (Campground.location.ilike(f"%{query}%"))
-    ).offset(skip).limit(limit).all()
+    """Search campgrounds by name, location (including state) or description, best match first.
+    
+    Uses Postgres full-text search when available and the in-process
+    search index otherwise. The last word matches as a prefix.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    
+    if db.bind.dialect.name == "postgresql":
+        vector = literal_column(CAMPGROUND_SEARCH_VECTOR)
+        ts_query = func.to_tsquery("english", " & ".join(f"{token}:*" for token in tokens))
+        return db.query(Campground).filter(vector.op("@@")(ts_query)).order_by(
+            func.ts_rank(vector, ts_query).desc(), Campground.id
+        ).offset(skip).limit(limit).all()
+    
+    campground_search_index.refresh(db)
+    ids = campground_search_index.search(query, limit=skip + limit)[skip:]
+    if not ids:
+        return []
+    by_id = {campground.id: campground for campground in db.query(Campground).filter(Campground.id.in_(ids))}
+    return [by_id[campground_id] for campground_id in ids if campground_id in by_id]
+
+
+async def search_campgrounds_async(db: AsyncSession, query: str, skip: int = 0, limit: int = 10) -> List[Campground]:
+    """Search campgrounds on an async session (see `search_campgrounds`)."""
+    return await db.run_sync(search_campgrounds, query, skip, limit)
+
+
+def get_campground_points(
+    db: Session, min_lat: float, min_lng: float, max_lat: float, max_lng: float
+) -> List[Tuple[int, float, float]]:
+    """Get (id, latitude, longitude) of campgrounds inside a bounding box, for map tiles."""
+    return db.query(Campground.id, Campground.latitude, Campground.longitude).filter(
+        Campground.latitude.between(min_lat, max_lat),
+        Campground.longitude.between(min_lng, max_lng)
+    ).limit(settings.tile_max_points).all()
 
 
 def create_campground(db: Session, campground: CampgroundCreate) -> Campground:
@@ -33,6 +82,8 @@ def create_campground(db: Session, campground: CampgroundCreate) -> Campground:
     db.add(db_campground)
     db.commit()
     db.refresh(db_campground)
+    tile_cache.invalidate_point(CAMPGROUND_LAYER, None, db_campground.latitude, db_campground.longitude)
+    search_result_cache.invalidate_campground(db_campground.name, db_campground.location, db_campground.description)
     return db_campground
 
 
@@ -44,3 +95,64 @@ def create_campground_if_not_exists(db: Session, campground: CampgroundCreate) -
             return existing
     
     return create_campground(db, campground)
+
+
+def store_campgrounds(db: Session, campgrounds: List[CampgroundCreate]) -> Tuple[List[Campground], int]:
+    """Store the campgrounds not stored yet, by (source_api, external_id), and get the stored row of every one.
+    
+    Returns the stored rows, in the order given and as fully loaded transient
+    objects, with how many of them this call inserted. Campgrounds without an
+    external_id can't be deduplicated and are skipped. The write runs on the
+    session's own connection and commits it once; objects already loaded in
+    `db` stay usable on sessions created with expire_on_commit=False, like
+    the async ones, and are reloaded on next access otherwise.
+    
+    On Postgres the insert is a single INSERT ... ON CONFLICT DO NOTHING
+    RETURNING, so concurrent callers never create duplicates, followed by a
+    SELECT of the rows that were already stored, if any. Other databases have
+    no RETURNING here, so it takes three statements: a SELECT of the stored
+    rows, an INSERT of the rest and a SELECT reading them back.
+    """
+    rows: Dict[Tuple[str, str], dict] = {}
+    for campground in campgrounds:
+        if campground.external_id:
+            rows.setdefault((campground.source_api, campground.external_id), campground.dict())
+    if not rows:
+        return [], 0
+    
+    table = Campground.__table__
+    key = tuple_(table.c.source_api, table.c.external_id)
+    if db.get_bind().dialect.name == "postgresql":
+        inserted = db.execute(
+            postgresql.insert(table).values(list(rows.values())).on_conflict_do_nothing(
+                index_elements=["source_api", "external_id"]
+            ).returning(*table.c)
+        ).all()
+        inserted_keys = {(row.source_api, row.external_id) for row in inserted}
+        stored_keys = [row_key for row_key in rows if row_key not in inserted_keys]
+        existing = db.execute(select(table).where(key.in_(stored_keys))).all() if stored_keys else []
+    else:
+        existing = db.execute(select(table).where(key.in_(list(rows)))).all()
+        stored_keys = {(row.source_api, row.external_id) for row in existing}
+        new_keys = [row_key for row_key in rows if row_key not in stored_keys]
+        inserted = []
+        if new_keys:
+            insert = sqlite.insert(table).on_conflict_do_nothing() if db.get_bind().dialect.name == "sqlite" else table.insert()
+            db.execute(insert, [rows[row_key] for row_key in new_keys])
+            inserted = db.execute(select(table).where(key.in_(new_keys)).order_by(table.c.id)).all()
+    if inserted:
+        db.commit()
+    
+    by_key = {}
+    for row in existing:
+        by_key[(row.source_api, row.external_id)] = Campground(**row._mapping)
+    for row in inserted:
+        campground = by_key[(row.source_api, row.external_id)] = Campground(**row._mapping)
+        tile_cache.invalidate_point(CAMPGROUND_LAYER, None, campground.latitude, campground.longitude)
+        search_result_cache.invalidate_campground(campground.name, campground.location, campground.description)
+    return [by_key[row_key] for row_key in rows if row_key in by_key], len(inserted)
+
+
+async def store_campgrounds_async(db: AsyncSession, campgrounds: List[CampgroundCreate]) -> Tuple[List[Campground], int]:
+    """Store the campgrounds not stored yet, from an async route (see `store_campgrounds`)."""
+    return await db.run_sync(store_campgrounds, campgrounds)
@@ -1,11 +1,37 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, Query
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import Select
+from sqlalchemy import and_, or_, select, tuple_, cast, func, Integer
 from app.models.camping_trip import CampingTrip
 from app.models.campground import Campground
 from app.models.user import User
-from app.crud.friend import get_friends
+from app.core.config import settings
+from app.core.friend_graph import friend_graph
+from app.core.tiles import TRIP_LAYER, tile_cache
+from app.crud.feed import (
+    fan_out_trip, get_timeline_feed, remove_fanned_out_trip, timeline_feed_query, update_fanned_out_trip
+)
 from app.schemas.camping_trip import CampingTripCreate, CampingTripUpdate
-from typing import List, Optional
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
+
+# Cluster grid resolution: cells per map tile width
+CLUSTER_CELLS_PER_TILE = 8
+
+
+def _newest_first(query: Union[Query, Select], cursor: Optional[Tuple[datetime, int]] = None) -> Union[Query, Select]:
+    """Order trips newest-first by (start_date, id), resuming after `cursor` if given."""
+    if cursor is not None:
+        query = query.filter(tuple_(CampingTrip.start_date, CampingTrip.id) < cursor)
+    return query.order_by(CampingTrip.start_date.desc(), CampingTrip.id.desc())
+
+
+def _invalidate_trip_tiles(db: Session, trip: CampingTrip) -> None:
+    """Drop the cached trip tiles showing this trip, for its author and the author's friends."""
+    campground = trip.campground
+    for owner_id in (trip.user_id, *friend_graph.friend_ids(db, trip.user_id)):
+        tile_cache.invalidate_point(TRIP_LAYER, owner_id, campground.latitude, campground.longitude)
 
 
 def get_camping_trip(db: Session, trip_id: int) -> Optional[CampingTrip]:
@@ -13,9 +39,44 @@ def get_camping_trip(db: Session, trip_id: int) -> Optional[CampingTrip]:
     return db.query(CampingTrip).filter(CampingTrip.id == trip_id).first()
 
 
-def get_camping_trips_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[CampingTrip]:
-    """Get camping trips for a specific user."""
-    return db.query(CampingTrip).filter(CampingTrip.user_id == user_id).offset(skip).limit(limit).all()
+def get_camping_trip_version(db: Session, trip_id: int) -> Optional[int]:
+    """Get a camping trip's version without loading the row, or None if it doesn't exist."""
+    return db.query(CampingTrip.version).filter(CampingTrip.id == trip_id).scalar()
+
+
+def get_camping_trips_by_user(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> List[CampingTrip]:
+    """Get camping trips for a specific user, newest first.
+
+    Pass the decoded `cursor` of the previous page for keyset pagination;
+    `skip` is only applied when no cursor is given.
+    """
+    return _camping_trips_by_user_query(db, user_id, skip, limit, cursor).all()
+
+
+def stream_camping_trips_by_user(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> Iterator[CampingTrip]:
+    """Iterate over the same trips as `get_camping_trips_by_user`, fetching `settings.stream_yield_per` rows at a time."""
+    return iter(_camping_trips_by_user_query(db, user_id, skip, limit, cursor).yield_per(settings.stream_yield_per))
+
+
+def _camping_trips_by_user_query(
+    db: Session, user_id: int, skip: int, limit: int, cursor: Optional[Tuple[datetime, int]]
+) -> Query:
+    query = _newest_first(db.query(CampingTrip).filter(CampingTrip.user_id == user_id), cursor)
+    if cursor is None:
+        query = query.offset(skip)
+    return query.limit(limit)
 
 
 def get_all_camping_trips(db: Session, skip: int = 0, limit: int = 100) -> List[CampingTrip]:
@@ -27,13 +88,29 @@ def create_camping_trip(db: Session, camping_trip: CampingTripCreate, user_id: i
     """Create a new camping trip."""
     db_camping_trip = CampingTrip(**camping_trip.dict(), user_id=user_id)
     db.add(db_camping_trip)
+    db.flush()
+    fan_out_trip(db, db_camping_trip)
     db.commit()
     db.refresh(db_camping_trip)
+    _invalidate_trip_tiles(db, db_camping_trip)
     return db_camping_trip
 
 
+def _commit_versioned(db: Session) -> None:
+    """Commit a write to versioned rows, rolling back if one of them was changed concurrently."""
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise
+
+
 def update_camping_trip(db: Session, trip_id: int, camping_trip_update: CampingTripUpdate) -> Optional[CampingTrip]:
-    """Update a camping trip."""
+    """Update a camping trip.
+    
+    Raises StaleDataError, after rolling back, if another request changed or
+    deleted the trip since it was loaded.
+    """
     db_camping_trip = get_camping_trip(db, trip_id)
     if not db_camping_trip:
         return None
@@ -42,108 +119,310 @@ def update_camping_trip(db: Session, trip_id: int, camping_trip_update: CampingT
     for field, value in update_data.items():
         setattr(db_camping_trip, field, value)
     
-    db.commit()
+    if "start_date" in update_data:
+        update_fanned_out_trip(db, db_camping_trip)
+    _commit_versioned(db)
     db.refresh(db_camping_trip)
     return db_camping_trip
 
 
 def delete_camping_trip(db: Session, trip_id: int) -> bool:
-    """Delete a camping trip."""
+    """Delete a camping trip.
+    
+    Raises StaleDataError, after rolling back, if another request changed or
+    deleted the trip since it was loaded.
+    """
     db_camping_trip = get_camping_trip(db, trip_id)
     if not db_camping_trip:
         return False
     
+    remove_fanned_out_trip(db, trip_id)
+    _invalidate_trip_tiles(db, db_camping_trip)
     db.delete(db_camping_trip)
-    db.commit()
+    _commit_versioned(db)
     return True
 
 
-def get_friend_camping_feed(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[CampingTrip]:
-    """Get camping trips from friends for the social feed"""
-    # Get user's friends
-    friends = get_friends(db, user_id)
-    friend_ids = []
-    for friend in friends:
-        if friend.user_id == user_id:
-            friend_ids.append(friend.friend_id)
-        else:
-            friend_ids.append(friend.user_id)
+def get_friend_camping_feed(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> List[CampingTrip]:
+    """Get camping trips from friends for the social feed, newest first.
+
+    Pass the decoded `cursor` of the previous page for keyset pagination;
+    `skip` is only applied when no cursor is given.
+    """
+    if settings.feed_timeline_enabled:
+        return get_timeline_feed(db, user_id, skip=skip, limit=limit, cursor=cursor)
     
+    friend_ids = list(friend_graph.friend_ids(db, user_id))
     if not friend_ids:
         return []
     
     # Get camping trips from friends
-    return db.query(CampingTrip).filter(
-        CampingTrip.user_id.in_(friend_ids)
-    ).offset(skip).limit(limit).all()
+    query = _newest_first(db.query(CampingTrip).filter(CampingTrip.user_id.in_(friend_ids)), cursor)
+    if cursor is None:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 
-def get_camping_trips_for_map(db: Session, user_id: int, include_own: bool = True, include_friends: bool = True) -> List[dict]:
-    """Get camping trips for map display with user and campground info"""
-    trips = []
-    
-    # Get user's friends
-    friends = get_friends(db, user_id)
-    friend_ids = []
-    for friend in friends:
-        if friend.user_id == user_id:
-            friend_ids.append(friend.friend_id)
-        else:
-            friend_ids.append(friend.user_id)
+async def get_friend_camping_feed_async(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> List[CampingTrip]:
+    """Get camping trips from friends for the social feed, newest first, on an async session."""
+    statement = await db.run_sync(_friend_feed_statement, user_id, skip, limit, cursor)
+    if statement is None:
+        return []
+    result = await db.execute(statement)
+    return result.scalars().all()
+
+
+async def stream_friend_camping_feed_async(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> AsyncIterator[CampingTrip]:
+    """Iterate over the same trips as `get_friend_camping_feed_async` from a server-side cursor."""
+    statement = await db.run_sync(_friend_feed_statement, user_id, skip, limit, cursor)
+    if statement is None:
+        return
+    result = await db.stream_scalars(statement.execution_options(yield_per=settings.stream_yield_per))
+    async for trip in result:
+        yield trip
+
+
+def _friend_feed_statement(
+    db: Session, user_id: int, skip: int, limit: int, cursor: Optional[Tuple[datetime, int]]
+) -> Optional[Select]:
+    """Build the friend feed select for an async session, or None when the user has no friends."""
+    if settings.feed_timeline_enabled:
+        return timeline_feed_query(db, user_id, skip, limit, cursor).statement
     
-    # Build query based on filters
-    query = db.query(CampingTrip).join(Campground).join(User)
+    friend_ids = list(friend_graph.friend_ids(db, user_id))
+    if not friend_ids:
+        return None
     
+    statement = _newest_first(select(CampingTrip).where(CampingTrip.user_id.in_(friend_ids)), cursor)
+    if cursor is None:
+        statement = statement.offset(skip)
+    return statement.limit(limit)
+
+
+def _map_owner_filter(db: Session, user_id: int, include_own: bool, include_friends: bool):
+    """Build the filter selecting whose trips appear on the map, or None for no trips."""
     if include_own and include_friends:
         # Include own trips and friends' trips
-        query = query.filter(
-            or_(
-                CampingTrip.user_id == user_id,
-                CampingTrip.user_id.in_(friend_ids)
-            )
+        return or_(
+            CampingTrip.user_id == user_id,
+            CampingTrip.user_id.in_(list(friend_graph.friend_ids(db, user_id)))
         )
     elif include_own:
         # Only own trips
-        query = query.filter(CampingTrip.user_id == user_id)
+        return CampingTrip.user_id == user_id
     elif include_friends:
         # Only friends' trips
-        query = query.filter(CampingTrip.user_id.in_(friend_ids))
-    else:
-        # No trips (shouldn't happen, but handle gracefully)
+        return CampingTrip.user_id.in_(list(friend_graph.friend_ids(db, user_id)))
+    # No trips (shouldn't happen, but handle gracefully)
+    return None
+
+
+def _map_trips_statement(owner_filter) -> Select:
+    """Select the columns of the map's trip entries; see `_map_trip`."""
+    return select(
+        CampingTrip.id, CampingTrip.title, CampingTrip.description, CampingTrip.start_date, CampingTrip.end_date,
+        CampingTrip.trip_notes, CampingTrip.weather_conditions, CampingTrip.group_size,
+        CampingTrip.created_at, CampingTrip.updated_at, CampingTrip.user_id,
+        User.username, User.full_name,
+        Campground.id.label("campground_id"), Campground.name.label("campground_name"), Campground.location,
+        Campground.description.label("campground_description"), Campground.latitude, Campground.longitude,
+        Campground.amenities
+    ).join_from(CampingTrip, Campground).join(User, CampingTrip.user_id == User.id).where(owner_filter)
+
+
+def _map_trip(row, user_id: int) -> dict:
+    """Build one map entry, with user and campground info, from a `_map_trips_statement` row."""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "start_date": row.start_date,
+        "end_date": row.end_date,
+        "trip_notes": row.trip_notes,
+        "weather_conditions": row.weather_conditions,
+        "group_size": row.group_size,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        # Determine if this is the user's own trip or a friend's trip
+        "is_own_trip": row.user_id == user_id,
+        "user": {
+            "id": row.user_id,
+            "username": row.username,
+            "full_name": row.full_name
+        },
+        "campground": {
+            "id": row.campground_id,
+            "name": row.campground_name,
+            "location": row.location,
+            "description": row.campground_description,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "amenities": row.amenities
+        }
+    }
+
+
+def get_camping_trips_for_map(db: Session, user_id: int, include_own: bool = True, include_friends: bool = True) -> List[dict]:
+    """Get camping trips for map display with user and campground info"""
+    owner_filter = _map_owner_filter(db, user_id, include_own, include_friends)
+    if owner_filter is None:
         return []
     
-    camping_trips = query.all()
+    # Plain column rows: no ORM objects to build for trips, users and campgrounds
+    return [_map_trip(row, user_id) for row in db.execute(_map_trips_statement(owner_filter))]
+
+
+def _viewport_filter(min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """Build the bounding-box filter on campground coordinates.
+
+    A box whose west edge is east of its east edge crosses the antimeridian.
+    """
+    latitude_filter = Campground.latitude.between(min_lat, max_lat)
+    if min_lng <= max_lng:
+        return and_(latitude_filter, Campground.longitude.between(min_lng, max_lng))
+    return and_(latitude_filter, or_(Campground.longitude >= min_lng, Campground.longitude <= max_lng))
+
+
+def get_trip_points(
+    db: Session, user_id: int, min_lat: float, min_lng: float, max_lat: float, max_lng: float
+) -> List[Tuple[int, float, float]]:
+    """Get (trip id, latitude, longitude) of own and friends' trips inside a bounding box, for map tiles."""
+    owner_filter = _map_owner_filter(db, user_id, include_own=True, include_friends=True)
+    return db.query(CampingTrip.id, Campground.latitude, Campground.longitude).join(Campground).filter(
+        owner_filter, _viewport_filter(min_lat, min_lng, max_lat, max_lng)
+    ).limit(settings.tile_max_points).all()
+
+
+def get_camping_trips_in_viewport(
+    db: Session,
+    user_id: int,
+    min_lat: float,
+    min_lng: float,
+    max_lat: float,
+    max_lng: float,
+    zoom: int,
+    include_own: bool = True,
+    include_friends: bool = True
+) -> List[dict]:
+    """Get map points inside a bounding box.
+
+    Below `settings.map_cluster_max_zoom` trips are grouped into grid clusters
+    (count, centroid and representative trip IDs). At or above it, individual
+    trips are returned without descriptions or notes, capped at
+    `settings.map_max_trips`.
+    """
+    owner_filter = _map_owner_filter(db, user_id, include_own, include_friends)
+    if owner_filter is None:
+        return []
+    in_viewport = _viewport_filter(min_lat, min_lng, max_lat, max_lng)
     
-    for trip in camping_trips:
-        # Determine if this is the user's own trip or a friend's trip
-        is_own_trip = trip.user_id == user_id
+    if zoom < settings.map_cluster_max_zoom:
+        # Grid cells of roughly 1/8 of a map tile at this zoom level; offsets keep the cell indexes positive
+        cell_size = 360.0 / (2 ** zoom * CLUSTER_CELLS_PER_TILE)
+        cell_x = cast((Campground.longitude + 180) / cell_size, Integer)
+        cell_y = cast((Campground.latitude + 90) / cell_size, Integer)
+        rows = db.query(
+            func.count(CampingTrip.id),
+            func.avg(Campground.latitude),
+            func.avg(Campground.longitude),
+            func.min(CampingTrip.id),
+            func.max(CampingTrip.id)
+        ).join(Campground).filter(owner_filter, in_viewport).group_by(cell_x, cell_y).all()
         
-        trips.append({
-            "id": trip.id,
-            "title": trip.title,
-            "description": trip.description,
-            "start_date": trip.start_date,
-            "end_date": trip.end_date,
-            "trip_notes": trip.trip_notes,
-            "weather_conditions": trip.weather_conditions,
-            "group_size": trip.group_size,
-            "created_at": trip.created_at,
-            "updated_at": trip.updated_at,
-            "is_own_trip": is_own_trip,
+        return [
+            {
+                "type": "cluster",
+                "count": count,
+                "latitude": latitude,
+                "longitude": longitude,
+                "trip_ids": sorted({first_id, last_id})
+            }
+            for count, latitude, longitude, first_id, last_id in rows
+        ]
+    
+    rows = db.query(
+        CampingTrip.id, CampingTrip.title, CampingTrip.start_date, CampingTrip.end_date, CampingTrip.user_id,
+        User.username, User.full_name,
+        Campground.id, Campground.name, Campground.latitude, Campground.longitude
+    ).join(Campground).join(User).filter(owner_filter, in_viewport).order_by(
+        CampingTrip.start_date.desc(), CampingTrip.id.desc()
+    ).limit(settings.map_max_trips).all()
+    
+    return [
+        {
+            "type": "trip",
+            "id": trip_id,
+            "title": title,
+            "start_date": start_date,
+            "end_date": end_date,
+            "is_own_trip": trip_user_id == user_id,
             "user": {
-                "id": trip.user.id,
-                "username": trip.user.username,
-                "full_name": trip.user.full_name
+                "id": trip_user_id,
+                "username": username,
+                "full_name": full_name
             },
             "campground": {
-                "id": trip.campground.id,
-                "name": trip.campground.name,
-                "location": trip.campground.location,
-                "description": trip.campground.description,
-                "latitude": trip.campground.latitude,
-                "longitude": trip.campground.longitude,
-                "amenities": trip.campground.amenities
+                "id": campground_id,
+                "name": campground_name,
+                "latitude": latitude,
+                "longitude": longitude
             }
-        })
-    
-    return trips
+        }
+        for (trip_id, title, start_date, end_date, trip_user_id, username, full_name,
+             campground_id, campground_name, latitude, longitude) in rows
+    ]
+
+
+async def get_camping_trips_for_map_async(
+    db: AsyncSession, user_id: int, include_own: bool = True, include_friends: bool = True
+) -> List[dict]:
+    """Get camping trips for map display on an async session (see `get_camping_trips_for_map`)."""
+    return await db.run_sync(get_camping_trips_for_map, user_id, include_own, include_friends)
+
+
+async def stream_camping_trips_for_map_async(
+    db: AsyncSession, user_id: int, include_own: bool = True, include_friends: bool = True
+) -> AsyncIterator[dict]:
+    """Iterate over the entries of `get_camping_trips_for_map` from a server-side cursor."""
+    owner_filter = await db.run_sync(_map_owner_filter, user_id, include_own, include_friends)
+    if owner_filter is None:
+        return
+    result = await db.stream(_map_trips_statement(owner_filter).execution_options(yield_per=settings.stream_yield_per))
+    async for row in result:
+        yield _map_trip(row, user_id)
+
+
+async def get_camping_trips_in_viewport_async(
+    db: AsyncSession,
+    user_id: int,
+    min_lat: float,
+    min_lng: float,
+    max_lat: float,
+    max_lng: float,
+    zoom: int,
+    include_own: bool = True,
+    include_friends: bool = True
+) -> List[dict]:
+    """Get map points inside a bounding box on an async session (see `get_camping_trips_in_viewport`)."""
+    return await db.run_sync(
+        get_camping_trips_in_viewport,
+        user_id, min_lat, min_lng, max_lat, max_lng, zoom, include_own, include_friends
+    )
@@ -0,0 +1,193 @@
+"""Fan-out-on-write feed timelines.
+
+When `settings.feed_timeline_enabled` is on, every trip is copied into a
+`feed_entries` row for each of its author's friends at write time, so reading
+a feed page is a single range read over `(user_id, start_date, trip_id)`.
+
+Authors with more than `settings.feed_fanout_max_friends` friends are not
+fanned out, which keeps the cost of a write bounded. Their trips are pulled
+at read time instead (fan-out-on-read).
+
+Writes read friendships from the `friends` table in their own transaction:
+the per-worker friend graph can lag behind a friendship another worker just
+accepted, and a timeline entry missed at write time is never written later.
+Reads use the graph.
+"""
+from datetime import datetime
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import and_, or_, select, literal, insert, func, tuple_, union_all
+from app.core.config import settings
+from app.core.friend_graph import friend_graph
+from app.models.camping_trip import CampingTrip
+from app.models.feed_entry import FeedEntry
+from app.models.friend import Friend
+from typing import List, Optional, Tuple
+
+
+def _friend_ids_select(user_id: int):
+    """Select the IDs of a user's accepted friends, one index range per side of the canonical pair."""
+    return union_all(
+        select(Friend.user_high_id.label("friend_id")).where(Friend.user_low_id == user_id, Friend.is_accepted == True),
+        select(Friend.user_low_id.label("friend_id")).where(Friend.user_high_id == user_id, Friend.is_accepted == True),
+    )
+
+
+def _friend_ids(db: Session, user_id: int) -> List[int]:
+    """Get the IDs of a user's accepted friends from the friends table."""
+    return [friend_id for friend_id, in db.execute(_friend_ids_select(user_id))]
+
+
+def _friend_count(db: Session, user_id: int) -> int:
+    """Count a user's accepted friends from the friends table."""
+    return db.execute(select(func.count()).select_from(_friend_ids_select(user_id).subquery())).scalar()
+
+
+def _is_well_connected(friend_count: int) -> bool:
+    return friend_count > settings.feed_fanout_max_friends
+
+
+def _well_connected_among(db: Session, user_ids: List[int]) -> List[int]:
+    """Get which of `user_ids` have too many friends to be fanned out, in one query."""
+    if not user_ids:
+        return []
+    ends = union_all(
+        select(Friend.user_low_id.label("user_id")).where(Friend.user_low_id.in_(user_ids), Friend.is_accepted == True),
+        select(Friend.user_high_id.label("user_id")).where(Friend.user_high_id.in_(user_ids), Friend.is_accepted == True),
+    ).subquery()
+    return [user_id for user_id, in db.execute(
+        select(ends.c.user_id).group_by(ends.c.user_id).having(func.count() > settings.feed_fanout_max_friends)
+    )]
+
+
+def _copy_trips_into_timeline(db: Session, user_id: int, author_id: int) -> None:
+    """Materialize all of `author_id`'s trips into `user_id`'s timeline."""
+    db.query(FeedEntry).filter(
+        FeedEntry.user_id == user_id, FeedEntry.author_id == author_id
+    ).delete(synchronize_session=False)
+    trips = select(
+        literal(user_id), CampingTrip.id, CampingTrip.user_id, CampingTrip.start_date
+    ).where(CampingTrip.user_id == author_id)
+    db.execute(insert(FeedEntry).from_select(
+        ["user_id", "trip_id", "author_id", "start_date"], trips
+    ))
+
+
+def fan_out_trip(db: Session, trip: CampingTrip) -> None:
+    """Copy a newly created trip into its author's friends' timelines. Does not commit."""
+    if not settings.feed_timeline_enabled:
+        return
+    friend_ids = _friend_ids(db, trip.user_id)
+    if not friend_ids or _is_well_connected(len(friend_ids)):
+        return
+    db.bulk_insert_mappings(FeedEntry, [
+        {"user_id": friend_id, "trip_id": trip.id, "author_id": trip.user_id, "start_date": trip.start_date}
+        for friend_id in friend_ids
+    ])
+
+
+def update_fanned_out_trip(db: Session, trip: CampingTrip) -> None:
+    """Keep timeline ordering in sync with an edited trip. Does not commit."""
+    if not settings.feed_timeline_enabled:
+        return
+    db.query(FeedEntry).filter(FeedEntry.trip_id == trip.id).update(
+        {FeedEntry.start_date: trip.start_date}, synchronize_session=False
+    )
+
+
+def remove_fanned_out_trip(db: Session, trip_id: int) -> None:
+    """Drop a trip from every timeline it was copied into. Does not commit."""
+    if not settings.feed_timeline_enabled:
+        return
+    db.query(FeedEntry).filter(FeedEntry.trip_id == trip_id).delete(synchronize_session=False)
+
+
+def backfill_friendship(db: Session, user_id: int, friend_id: int) -> None:
+    """Copy each side's existing trips into the other's timeline after they become friends."""
+    if not settings.feed_timeline_enabled:
+        return
+    for reader_id, author_id in ((user_id, friend_id), (friend_id, user_id)):
+        if not _is_well_connected(_friend_count(db, author_id)):
+            _copy_trips_into_timeline(db, reader_id, author_id)
+    db.commit()
+
+
+def prune_friendship(db: Session, user_id: int, friend_id: int) -> None:
+    """Remove each side's trips from the other's timeline after they stop being friends."""
+    if not settings.feed_timeline_enabled:
+        return
+    db.query(FeedEntry).filter(
+        or_(
+            and_(FeedEntry.user_id == user_id, FeedEntry.author_id == friend_id),
+            and_(FeedEntry.user_id == friend_id, FeedEntry.author_id == user_id)
+        )
+    ).delete(synchronize_session=False)
+
+    # Someone who just dropped back under the fan-out limit was read on demand
+    # until now, so their remaining friends' timelines need their trips
+    for author_id in (user_id, friend_id):
+        friend_ids = _friend_ids(db, author_id)
+        if len(friend_ids) == settings.feed_fanout_max_friends:
+            for reader_id in friend_ids:
+                _copy_trips_into_timeline(db, reader_id, author_id)
+    db.commit()
+
+
+def rebuild_timeline(db: Session, user_id: int) -> None:
+    """Rebuild one user's timeline from scratch, e.g. after enabling timelines."""
+    db.query(FeedEntry).filter(FeedEntry.user_id == user_id).delete(synchronize_session=False)
+    author_ids = _friend_ids(db, user_id)
+    pulled_author_ids = set(_well_connected_among(db, author_ids))
+    for author_id in author_ids:
+        if author_id not in pulled_author_ids:
+            _copy_trips_into_timeline(db, user_id, author_id)
+    db.commit()
+
+
+def timeline_feed_query(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> Query:
+    """Build the query for a page of a user's materialized timeline, newest first.
+
+    Trips by well-connected friends are never fanned out, so they are merged
+    in at read time.
+    """
+    pulled_author_ids = [
+        friend_id for friend_id in friend_graph.friend_ids(db, user_id)
+        if _is_well_connected(friend_graph.degree(db, friend_id))
+    ]
+
+    if not pulled_author_ids:
+        query = db.query(CampingTrip).join(FeedEntry, FeedEntry.trip_id == CampingTrip.id).filter(
+            FeedEntry.user_id == user_id
+        )
+        if cursor is not None:
+            query = query.filter(tuple_(FeedEntry.start_date, FeedEntry.trip_id) < cursor)
+        query = query.order_by(FeedEntry.start_date.desc(), FeedEntry.trip_id.desc())
+    else:
+        materialized = select(FeedEntry.trip_id).where(FeedEntry.user_id == user_id)
+        query = db.query(CampingTrip).filter(or_(
+            CampingTrip.id.in_(materialized),
+            CampingTrip.user_id.in_(pulled_author_ids)
+        ))
+        if cursor is not None:
+            query = query.filter(tuple_(CampingTrip.start_date, CampingTrip.id) < cursor)
+        query = query.order_by(CampingTrip.start_date.desc(), CampingTrip.id.desc())
+
+    if cursor is None:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def get_timeline_feed(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[datetime, int]] = None
+) -> List[CampingTrip]:
+    """Read a page of a user's materialized timeline, newest first (see `timeline_feed_query`)."""
+    return timeline_feed_query(db, user_id, skip, limit, cursor).all()
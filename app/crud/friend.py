@@ -1,29 +1,69 @@
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from app.models.friend import Friend
-from app.models.user import User
+from sqlalchemy import and_, case, distinct, func, literal, or_, select, union_all
+from app.core.config import settings
+from app.core.friend_graph import friend_graph
+from app.core.friend_suggestions import friend_suggestion_cache, mutual_friend_counts, rank, top_candidates
+from app.core.tiles import TRIP_LAYER, tile_cache
+from app.crud.feed import backfill_friendship, prune_friendship
+from app.models.camping_trip import CampingTrip
+from app.models.friend import Friend, canonical_pair
+from app.models.friendship_change import FriendshipChange
+from app.models.user import User, search_key
 from app.schemas.friend import FriendCreate, FriendUpdate
 from typing import List, Optional
 
+# Sorts after every character, so [prefix, prefix + PREFIX_END) holds the strings starting with prefix
+PREFIX_END = "\U0010ffff"
 
-def create_friend_request(db: Session, user_id: int, friend_id: int) -> Friend:
-    """Create a new friend request"""
+
+def _invalidate_trip_layers(user_id: int, friend_id: int) -> None:
+    """A friendship change alters which trips both users see on their trip map tiles."""
+    tile_cache.invalidate_layer(TRIP_LAYER, user_id)
+    tile_cache.invalidate_layer(TRIP_LAYER, friend_id)
+
+
+def _log_friendship_change(db: Session, user_id: int, friend_id: int) -> None:
+    """Log an accepted or ended friendship in the current transaction, for the other workers' friend graphs."""
+    user_low_id, user_high_id = canonical_pair(user_id, friend_id)
+    db.add(FriendshipChange(user_low_id=user_low_id, user_high_id=user_high_id))
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.friend_graph_change_retention_seconds)
+    db.query(FriendshipChange).filter(FriendshipChange.changed_at < cutoff).delete(synchronize_session=False)
+
+
+def _end_friendship(db: Session, user_id: int, friend_id: int) -> None:
+    """Update everything derived from a friendship after its row was deleted."""
+    friend_graph.remove_friendship(user_id, friend_id)
+    friend_suggestion_cache.remove_friendship(db, user_id, friend_id)
+    _invalidate_trip_layers(user_id, friend_id)
+    prune_friendship(db, user_id, friend_id)
+
+
+def create_friend_request(db: Session, user_id: int, friend_id: int) -> Optional[Friend]:
+    """Create a new friend request, or return None if the two users already have a request or friendship.
+
+    The unique (user_low_id, user_high_id) index decides, so of two concurrent
+    requests between the same users only one is stored.
+    """
     db_friend = Friend(user_id=user_id, friend_id=friend_id, is_accepted=False)
     db.add(db_friend)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
     db.refresh(db_friend)
+    friend_suggestion_cache.exclude(user_id, friend_id)
     return db_friend
 
 
 def get_friend_request(db: Session, user_id: int, friend_id: int) -> Optional[Friend]:
-    """Get a specific friend request between two users"""
+    """Get the friend request or friendship between two users, whichever of them sent it"""
+    user_low_id, user_high_id = canonical_pair(user_id, friend_id)
     return db.query(Friend).filter(
-        and_(
-            or_(
-                and_(Friend.user_id == user_id, Friend.friend_id == friend_id),
-                and_(Friend.user_id == friend_id, Friend.friend_id == user_id)
-            )
-        )
+        Friend.user_low_id == user_low_id,
+        Friend.user_high_id == user_high_id
     ).first()
 
 
@@ -36,13 +76,11 @@ def get_pending_friend_requests(db: Session, user_id: int) -> List[Friend]:
 
 def get_friends(db: Session, user_id: int) -> List[Friend]:
     """Get all accepted friends for a user"""
+    # One index range per side of the pair instead of an OR over both
     return db.query(Friend).filter(
-        and_(
-            or_(
-                and_(Friend.user_id == user_id, Friend.is_accepted == True),
-                and_(Friend.friend_id == user_id, Friend.is_accepted == True)
-            )
-        )
+        Friend.user_low_id == user_id, Friend.is_accepted == True
+    ).union_all(
+        db.query(Friend).filter(Friend.user_high_id == user_id, Friend.is_accepted == True)
     ).all()
 
 
@@ -54,8 +92,13 @@ def accept_friend_request(db: Session, friend_request_id: int, user_id: int) ->
     
     if friend_request:
         friend_request.is_accepted = True
+        _log_friendship_change(db, friend_request.user_id, friend_request.friend_id)
         db.commit()
         db.refresh(friend_request)
+        friend_graph.add_friendship(friend_request.user_id, friend_request.friend_id)
+        friend_suggestion_cache.add_friendship(db, friend_request.user_id, friend_request.friend_id)
+        _invalidate_trip_layers(friend_request.user_id, friend_request.friend_id)
+        backfill_friendship(db, friend_request.user_id, friend_request.friend_id)
     
     return friend_request
 
@@ -67,8 +110,14 @@ def reject_friend_request(db: Session, friend_request_id: int, user_id: int) ->
     ).first()
     
     if friend_request:
+        was_accepted = friend_request.is_accepted
+        requester_id = friend_request.user_id
         db.delete(friend_request)
+        if was_accepted:
+            _log_friendship_change(db, requester_id, user_id)
         db.commit()
+        if was_accepted:
+            _end_friendship(db, requester_id, user_id)
         return True
     
     return False
@@ -80,7 +129,9 @@ def remove_friend(db: Session, user_id: int, friend_id: int) -> bool:
     
     if friend_relationship and friend_relationship.is_accepted:
         db.delete(friend_relationship)
+        _log_friendship_change(db, user_id, friend_id)
         db.commit()
+        _end_friendship(db, user_id, friend_id)
         return True
     
     return False
@@ -88,51 +139,174 @@ def remove_friend(db: Session, user_id: int, friend_id: int) -> bool:
 
 def get_friends_with_user_info(db: Session, user_id: int) -> List[dict]:
     """Get friends with user information for display"""
-    friends = get_friends(db, user_id)
-    friends_with_info = []
-    
-    for friend in friends:
-        # Determine which user is the friend (not the current user)
-        if friend.user_id == user_id:
-            friend_user_id = friend.friend_id
-        else:
-            friend_user_id = friend.user_id
-        
-        # Get friend's user info
-        friend_user = db.query(User).filter(User.id == friend_user_id).first()
-        
-        if friend_user:
-            friends_with_info.append({
-                "id": friend.id,
-                "user_id": user_id,
-                "friend_id": friend_user_id,
-                "is_accepted": friend.is_accepted,
-                "created_at": friend.created_at,
-                "friend_username": friend_user.username,
-                "friend_full_name": friend_user.full_name
-            })
+    # The friend is whichever side of the pair isn't the current user; one index range per side
+    def side(own_id, friend_user_id):
+        return db.query(
+            Friend.id, Friend.is_accepted, Friend.created_at, User.id, User.username, User.full_name
+        ).join(User, User.id == friend_user_id).filter(own_id == user_id, Friend.is_accepted == True)
+
+    rows = side(Friend.user_low_id, Friend.user_high_id).union_all(
+        side(Friend.user_high_id, Friend.user_low_id)
+    ).all()
     
-    return friends_with_info
+    return [
+        {
+            "id": friend_request_id,
+            "user_id": user_id,
+            "friend_id": friend_id,
+            "is_accepted": is_accepted,
+            "created_at": created_at,
+            "friend_username": username,
+            "friend_full_name": full_name
+        }
+        for friend_request_id, is_accepted, created_at, friend_id, username, full_name in rows
+    ]
 
 
 def get_pending_requests_with_user_info(db: Session, user_id: int) -> List[dict]:
     """Get pending friend requests with user information"""
-    pending_requests = get_pending_friend_requests(db, user_id)
-    requests_with_info = []
-    
-    for request in pending_requests:
-        # Get the user who sent the request
-        sender_user = db.query(User).filter(User.id == request.user_id).first()
-        
-        if sender_user:
-            requests_with_info.append({
-                "id": request.id,
-                "user_id": request.user_id,
-                "friend_id": request.friend_id,
-                "is_accepted": request.is_accepted,
-                "created_at": request.created_at,
-                "sender_username": sender_user.username,
-                "sender_full_name": sender_user.full_name
-            })
+    rows = db.query(
+        Friend.id, Friend.user_id, Friend.friend_id, Friend.is_accepted, Friend.created_at,
+        User.username, User.full_name
+    ).join(User, User.id == Friend.user_id).filter(
+        and_(Friend.friend_id == user_id, Friend.is_accepted == False)
+    ).all()
     
-    return requests_with_info
+    return [
+        {
+            "id": request_id,
+            "user_id": sender_id,
+            "friend_id": friend_id,
+            "is_accepted": is_accepted,
+            "created_at": created_at,
+            "sender_username": username,
+            "sender_full_name": full_name
+        }
+        for request_id, sender_id, friend_id, is_accepted, created_at, username, full_name in rows
+    ]
+
+
+def _pending_request_user_ids(db: Session, user_id: int) -> List[int]:
+    """Get the users a user has a pending friend request with, in either direction"""
+    rows = db.query(Friend.user_high_id).filter(
+        Friend.user_low_id == user_id, Friend.is_accepted == False
+    ).union_all(
+        db.query(Friend.user_low_id).filter(Friend.user_high_id == user_id, Friend.is_accepted == False)
+    ).all()
+    return [other_id for other_id, in rows]
+
+
+def _shared_campground_counts(db: Session, user_id: int, candidate_ids: List[int]) -> dict:
+    """Count the campgrounds each candidate has a trip at that the user has a trip at too"""
+    if not candidate_ids:
+        return {}
+    own_campgrounds = select(CampingTrip.campground_id).where(CampingTrip.user_id == user_id)
+    rows = db.query(CampingTrip.user_id, func.count(distinct(CampingTrip.campground_id))).filter(
+        CampingTrip.user_id.in_(candidate_ids),
+        CampingTrip.campground_id.in_(own_campgrounds)
+    ).group_by(CampingTrip.user_id).all()
+    return dict(rows)
+
+
+def get_friend_suggestions(db: Session, user_id: int, limit: int = 10) -> List[dict]:
+    """Get non-friends a user may know, ranked by mutual friends and shared campgrounds"""
+    ranked = friend_suggestion_cache.get(user_id, limit)
+    if ranked is None:
+        counts = mutual_friend_counts(db, user_id)
+        for other_id in _pending_request_user_ids(db, user_id):
+            counts.pop(other_id, None)
+        candidates = {
+            candidate_id: [mutual, 0]
+            for candidate_id, mutual in top_candidates(counts, settings.friend_suggestions_candidates)
+        }
+        for candidate_id, shared in _shared_campground_counts(db, user_id, list(candidates)).items():
+            candidates[candidate_id][1] = shared
+        ranked = rank(candidates, limit)
+        friend_suggestion_cache.put(user_id, candidates)
+    if not ranked:
+        return []
+
+    users = {
+        candidate_id: (username, full_name)
+        for candidate_id, username, full_name in db.query(User.id, User.username, User.full_name).filter(
+            User.id.in_([candidate_id for candidate_id, _, _ in ranked])
+        )
+    }
+
+    return [
+        {
+            "id": candidate_id,
+            "username": users[candidate_id][0],
+            "full_name": users[candidate_id][1],
+            "mutual_friends": mutual,
+            "shared_campgrounds": shared
+        }
+        for candidate_id, mutual, shared in ranked
+        if candidate_id in users
+    ]
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _name_matches(db: Session, column, prefix: str, user_id: int, limit: int):
+    """Select the first `limit` other users, in column order, whose search column starts with the normalized prefix"""
+    if db.bind.dialect.name == "postgresql":
+        # Served by the trigram indexes (a range isn't a prefix match under most collations),
+        # which also find a word inside a full name
+        pattern = _escape_like(prefix)
+        condition = column.like(f"{pattern}%", escape="\\")
+        if column is User.full_name_search:
+            condition = or_(condition, column.like(f"% {pattern}%", escape="\\"))
+    else:
+        # A range scan of the column's index, read in order until the limit
+        condition = and_(column >= prefix, column < prefix + PREFIX_END)
+    return select(User.id).where(condition, User.id != user_id).order_by(column).limit(limit)
+
+
+def _relationship_status(user_id: int, requester_id: Optional[int], is_accepted: Optional[bool]) -> str:
+    if requester_id is None:
+        return "none"
+    if is_accepted:
+        return "friends"
+    return "request_sent" if requester_id == user_id else "request_received"
+
+
+def search_users_with_relationship_status(db: Session, user_id: int, query: str, limit: int = 10) -> List[dict]:
+    """Search other users by username or full name prefix, with the user's relationship to each
+
+    Names and query are compared as `search_key`s, so case is ignored the same
+    way on every database. On Postgres a full name also matches from the start
+    of any of its words; elsewhere that would scan the table. Username matches
+    come first. Matches and relationships are read in one query: each match is
+    joined to the friendship row of its canonical pair.
+    """
+    prefix = search_key(query)
+    if not prefix:
+        return []
+
+    username_matches = _name_matches(db, User.username_search, prefix, user_id, limit).subquery()
+    full_name_matches = _name_matches(db, User.full_name_search, prefix, user_id, limit).subquery()
+    matches = union_all(
+        select(username_matches.c.id, literal(0).label("rank")),
+        select(full_name_matches.c.id, literal(1).label("rank"))
+    ).subquery()
+    best_matches = select(matches.c.id, func.min(matches.c.rank).label("rank")).group_by(matches.c.id).subquery()
+
+    rows = db.query(User.id, User.username, User.full_name, Friend.user_id, Friend.is_accepted).join(
+        best_matches, best_matches.c.id == User.id
+    ).outerjoin(Friend, and_(
+        Friend.user_low_id == case((User.id < user_id, User.id), else_=user_id),
+        Friend.user_high_id == case((User.id < user_id, user_id), else_=User.id)
+    )).order_by(best_matches.c.rank, User.username_search).limit(limit).all()
+
+    return [
+        {
+            "id": match_id,
+            "username": username,
+            "full_name": full_name,
+            "relationship_status": _relationship_status(user_id, requester_id, is_accepted)
+        }
+        for match_id, username, full_name, requester_id, is_accepted in rows
+    ]
@@ -1,7 +1,9 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, password_hasher, verify_and_update_password
 from typing import Optional
 
 
@@ -15,11 +17,23 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
 
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    """Get a user by email on an async session."""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get a user by username."""
     return db.query(User).filter(User.username == username).first()
 
 
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    """Get a user by username on an async session."""
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     """Get multiple users with pagination."""
     return db.query(User).offset(skip).limit(limit).all()
@@ -40,6 +54,21 @@ def create_user(db: Session, user: UserCreate) -> User:
     return db_user
 
 
+async def create_user_async(db: AsyncSession, user: UserCreate) -> User:
+    """Create a new user, hashing the password on the password hashing pool."""
+    hashed_password = await password_hasher.hash(user.password)
+    db_user = User(
+        email=user.email,
+        username=user.username,
+        hashed_password=hashed_password,
+        full_name=user.full_name
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
 def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
     """Update a user."""
     db_user = get_user(db, user_id)
@@ -60,6 +89,26 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        # Stored with an outdated bcrypt cost; upgrade while we have the password
+        user.hashed_password = new_hash
+        db.commit()
+    return user
+
+
+async def authenticate_user_async(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """Authenticate a user, verifying the password on the password hashing pool."""
+    user = await get_user_by_username_async(db, username)
+    if not user:
+        return None
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Stored with an outdated bcrypt cost; upgrade while we have the password
+        user.hashed_password = new_hash
+        await db.commit()
     return user
@@ -1,13 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.api import api_router
-from app.core.database import engine
-from app.core.database import Base
-from app.models import User, Friend, Campground, CampingTrip  # Import models to register them
+from app.core.api_service import provider_campground_service
+from app.core.metrics import MetricsMiddleware, mark_process_dead, render_metrics
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.security import PasswordHasherBusy
+from app.models import User, Friend, Campground, CampingTrip, FeedEntry  # Import models to register them
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic (alembic upgrade head); starting a worker does no database work
 
 # Create FastAPI app
 app = FastAPI(
@@ -25,12 +27,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Count and time each request's SQL statements (Server-Timing header)
+app.add_middleware(QueryStatsMiddleware)
+
+# Per-route request counts and latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
 
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    """Shed logins and sign-ups while the password hashing pool is full."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts in progress, please retry"},
+        headers={"Retry-After": str(settings.password_hash_retry_after_seconds)},
+    )
+
+
+@app.on_event("shutdown")
+async def close_provider_client():
+    """Close the pooled campground provider connections."""
+    await provider_campground_service.aclose()
+
+
+@app.on_event("shutdown")
+def remove_worker_metrics():
+    """Drop this worker's live gauges from the multiprocess metrics."""
+    mark_process_dead()
+
+
 @app.get("/")
 def read_root():
     """Root endpoint."""
@@ -41,3 +72,10 @@ def read_root():
 def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics, aggregated over all workers in multiprocess mode."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
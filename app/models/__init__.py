@@ -2,5 +2,7 @@ from .user import User
 from .friend import Friend
 from .campground import Campground
 from .camping_trip import CampingTrip
+from .feed_entry import FeedEntry
+from .friendship_change import FriendshipChange
 
-__all__ = ["User", "Friend", "Campground", "CampingTrip"]
+__all__ = ["User", "Friend", "Campground", "CampingTrip", "FeedEntry", "FriendshipChange"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -6,6 +6,12 @@ from app.core.database import Base
 
 class Campground(Base):
     __tablename__ = "campgrounds"
+    __table_args__ = (
+        # Bounding-box lookups for the map viewport
+        Index("ix_campgrounds_latitude_longitude", "latitude", "longitude"),
+        # One row per provider record; conflict target of the search write-through upsert
+        Index("uq_campgrounds_source_api_external_id", "source_api", "external_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -25,6 +31,28 @@ class Campground(Base):
     external_id = Column(String)  # ID from the API
     source_api = Column(String, default="rapidapi_outdoor")  # Which API this came from
     created_at = Column(DateTime, server_default=func.now())
+    # Bumped by the ORM on every update; the ETag of the campground's representation
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationships
     camping_trips = relationship("CampingTrip", back_populates="campground")
+    
+    __mapper_args__ = {"version_id_col": version}
+
+
+# Document searched by Postgres full-text search. Queries must use this exact
+# expression for the GIN index below to apply.
+CAMPGROUND_SEARCH_VECTOR = (
+    "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(location, '') "
+    "|| ' ' || coalesce(description, ''))"
+)
+
+# Postgres only; other databases search through app.core.search_index.
+# Migrations create it too (migrations/versions/0003_hot_path_indexes.py).
+event.listen(
+    Campground.__table__,
+    "after_create",
+    DDL(
+        f"CREATE INDEX IF NOT EXISTS ix_campgrounds_search ON campgrounds USING gin ({CAMPGROUND_SEARCH_VECTOR})"
+    ).execute_if(dialect="postgresql")
+)
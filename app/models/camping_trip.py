@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -6,6 +6,11 @@ from app.core.database import Base
 
 class CampingTrip(Base):
     __tablename__ = "camping_trips"
+    __table_args__ = (
+        # Serves the newest-first keyset pagination of /my-trips and /feed
+        Index("ix_camping_trips_user_id_start_date_id", "user_id", "start_date", "id"),
+        Index("ix_camping_trips_campground_id", "campground_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -17,6 +22,8 @@ class CampingTrip(Base):
     group_size = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped by the ORM on every update; updated_at is too coarse to tell two quick edits apart
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Foreign keys
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -25,3 +32,5 @@ class CampingTrip(Base):
     # Relationships
     user = relationship("User", back_populates="camping_trips")
     campground = relationship("Campground", back_populates="camping_trips")
+    
+    __mapper_args__ = {"version_id_col": version}
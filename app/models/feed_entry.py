@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from app.core.database import Base
+
+
+class FeedEntry(Base):
+    """A friend's camping trip materialized into one user's feed timeline."""
+    __tablename__ = "feed_entries"
+    __table_args__ = (
+        # One range read per feed page: newest-first by (start_date, trip_id)
+        Index("ix_feed_entries_user_id_start_date_trip_id", "user_id", "start_date", "trip_id"),
+        Index("ix_feed_entries_user_id_author_id", "user_id", "author_id"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)  # Whose feed this is
+    trip_id = Column(Integer, ForeignKey("camping_trips.id"), primary_key=True, index=True)
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Who logged the trip
+    start_date = Column(DateTime, nullable=False)  # Copied from the trip for ordering
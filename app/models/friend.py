@@ -1,18 +1,48 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
+from typing import Tuple
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean, Index, CheckConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 
+def _low_id(context) -> int:
+    parameters = context.get_current_parameters()
+    return min(parameters["user_id"], parameters["friend_id"])
+
+
+def _high_id(context) -> int:
+    parameters = context.get_current_parameters()
+    return max(parameters["user_id"], parameters["friend_id"])
+
+
 class Friend(Base):
+    """A friendship or friend request; one row per pair of users, whichever of them asked."""
     __tablename__ = "friends"
-    
+    __table_args__ = (
+        # One row per pair: a lookup of two users is one seek, and a duplicate or crossed
+        # request fails on insert
+        Index("uq_friends_user_low_id_user_high_id", "user_low_id", "user_high_id", unique=True),
+        # A user's pairs where they are the higher ID; the unique index serves the lower side
+        Index("ix_friends_user_high_id_user_low_id", "user_high_id", "user_low_id"),
+        # Pending requests a user received
+        Index("ix_friends_friend_id_is_accepted", "friend_id", "is_accepted"),
+        CheckConstraint("user_low_id < user_high_id", name="ck_friends_user_low_id_lt_user_high_id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    friend_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Who sent the request
+    friend_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Who received it
+    # The pair in canonical order; filled in from user_id and friend_id on insert
+    user_low_id = Column(Integer, ForeignKey("users.id"), nullable=False, default=_low_id)
+    user_high_id = Column(Integer, ForeignKey("users.id"), nullable=False, default=_high_id)
     is_accepted = Column(Boolean, default=False)  # False = pending, True = accepted
     created_at = Column(DateTime, server_default=func.now())
-    
+
     # Relationships
     user = relationship("User", foreign_keys=[user_id], back_populates="sent_friend_requests")
     friend = relationship("User", foreign_keys=[friend_id], back_populates="received_friend_requests")
+
+
+def canonical_pair(user_id: int, other_id: int) -> Tuple[int, int]:
+    """Get the (user_low_id, user_high_id) of two users."""
+    return (user_id, other_id) if user_id < other_id else (other_id, user_id)
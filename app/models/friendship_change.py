@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime
+from app.core.database import Base
+
+
+class FriendshipChange(Base):
+    """A friendship accepted or ended, so every worker can update its in-memory friend graph."""
+    __tablename__ = "friendship_changes"
+
+    id = Column(Integer, primary_key=True)
+    # The pair in canonical order; its row in friends says what the friendship is now
+    user_low_id = Column(Integer, nullable=False)
+    user_high_id = Column(Integer, nullable=False)
+    # Set by the app, not the database, so workers compare it against the same (UTC) clock
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -1,9 +1,24 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, DDL, event
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from typing import Optional
 from app.core.database import Base
 
 
+def search_key(text: Optional[str]) -> Optional[str]:
+    """Case- and whitespace-insensitive form of a name, as stored for user search and applied to queries.
+
+    Folded in Python, so every database compares the same strings (SQLite's
+    lower() only folds ASCII).
+    """
+    return " ".join(text.casefold().split()) if text is not None else None
+
+
+def _search_key_default(column: str):
+    # For Core and bulk inserts, which set username and full_name without going through the ORM
+    return lambda context: search_key(context.get_current_parameters().get(column))
+
+
 class User(Base):
     __tablename__ = "users"
     
@@ -12,6 +27,9 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     full_name = Column(String)
+    # search_key() of username and full_name, kept in step by _set_search_key
+    username_search = Column(String, index=True, default=_search_key_default("username"))
+    full_name_search = Column(String, index=True, default=_search_key_default("full_name"))
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -21,3 +39,21 @@ class User(Base):
     # Friend relationships
     sent_friend_requests = relationship("Friend", foreign_keys="Friend.user_id", back_populates="user")
     received_friend_requests = relationship("Friend", foreign_keys="Friend.friend_id", back_populates="friend")
+    
+    @validates("username", "full_name")
+    def _set_search_key(self, key, value):
+        setattr(self, f"{key}_search", search_key(value))
+        return value
+
+
+# Postgres only: trigram indexes, so user search also matches words inside full names.
+# Migrations create them too (migrations/versions/0007_user_search_keys.py).
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL(
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+        "CREATE INDEX IF NOT EXISTS ix_users_username_search_trgm ON users USING gin (username_search gin_trgm_ops); "
+        "CREATE INDEX IF NOT EXISTS ix_users_full_name_search_trgm ON users USING gin (full_name_search gin_trgm_ops)"
+    ).execute_if(dialect="postgresql")
+)
@@ -0,0 +1,286 @@
+"""Bulk import campgrounds from a JSON-lines or CSV catalog file.
+
+The file is streamed one row at a time, so memory stays flat whatever its
+size. Each row is validated against `CampgroundCreate` and written in
+batches: on Postgres a batch is COPYed into a temporary table and moved
+into `campgrounds` with one INSERT ... SELECT; elsewhere it is one
+executemany. Rows whose (source_api, external_id) is already stored, or
+repeated within a batch, are skipped. Rows without an external_id can't be
+deduplicated and are rejected.
+
+After every committed batch the byte offset reached is written to a
+checkpoint file, and a rerun resumes from there. Because duplicates are
+skipped, replaying the batch that was in flight when a run died is
+harmless.
+
+    python -m app.tools.import_campgrounds catalog.jsonl
+    python -m app.tools.import_campgrounds catalog.csv --batch-size 20000 --source-api ridb
+
+Running app workers pick the new rows up in search when their caches
+expire (see SEARCH_CACHE_TTL_SECONDS and TILE_CACHE_TTL_SECONDS).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.models.campground import Campground
+from app.schemas.campground import CampgroundCreate
+
+COLUMNS = list(CampgroundCreate.model_fields)
+STAGING_TABLE = "campground_import"
+
+# Invalid rows reported individually before only being counted
+MAX_REPORTED_ERRORS = 20
+
+
+def read_rows(path: str, offset: int = 0) -> Iterator[Tuple[int, int, Union[str, Dict]]]:
+    """Stream (line number, end offset, record) from a JSON-lines or CSV file, starting at a byte offset.
+
+    Records are dicts for CSV and unparsed lines for JSON lines, so a
+    malformed line can be rejected like any other invalid row. The end offset
+    is where the next record starts, which is what a checkpoint records.
+    Line numbers are relative to `offset` when resuming.
+    """
+    with open(path, "rb") as catalog_file:
+        if path.endswith(".csv"):
+            header = next(csv.reader([catalog_file.readline().decode("utf-8-sig")]))
+            offset = max(offset, catalog_file.tell())
+        catalog_file.seek(offset)
+        position = offset
+
+        def lines() -> Iterator[str]:
+            nonlocal position
+            while True:
+                line = catalog_file.readline()
+                if not line:
+                    return
+                position = catalog_file.tell()
+                yield line.decode("utf-8")
+
+        if path.endswith(".csv"):
+            # csv.reader pulls only the lines of the current record, so `position` is its end
+            for line_number, values in enumerate(csv.reader(lines()), start=1):
+                yield line_number, position, dict(zip(header, values))
+        else:
+            for line_number, line in enumerate(lines(), start=1):
+                if line.strip():
+                    yield line_number, position, line
+
+
+def normalize_row(row: Any, source_api: Optional[str]) -> Dict:
+    """Turn a raw catalog row into `CampgroundCreate` input.
+
+    Empty values are dropped, and amenities given as a list or as a
+    ';'-separated string are stored as a JSON array string. Raises
+    ValueError for a JSON line that isn't an object.
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"expected a JSON object, got {type(row).__name__}")
+    row = {key: value for key, value in row.items() if value not in ("", None)}
+    amenities = row.get("amenities")
+    if isinstance(amenities, str) and not amenities.startswith("["):
+        amenities = [amenity.strip() for amenity in amenities.split(";") if amenity.strip()]
+    if isinstance(amenities, list):
+        row["amenities"] = json.dumps(amenities)
+    if source_api and "source_api" not in row:
+        row["source_api"] = source_api
+    return row
+
+
+class Checkpoint:
+    """Progress of an import, saved atomically next to the catalog file."""
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.offset = 0
+        self.counts = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+
+    def load(self) -> bool:
+        """Load a saved checkpoint for the same file; returns whether there was one."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as checkpoint_file:
+            saved = json.load(checkpoint_file)
+        if saved.get("source") != self.source:
+            raise SystemExit(f"Checkpoint {self.path} belongs to {saved.get('source')}; use --restart")
+        self.offset = saved["offset"]
+        self.counts.update(saved["counts"])
+        return True
+
+    def save(self) -> None:
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as checkpoint_file:
+            json.dump({"source": self.source, "offset": self.offset, "counts": self.counts}, checkpoint_file)
+        os.replace(temporary, self.path)
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BatchWriter:
+    """Write validated rows into `campgrounds`, skipping (source_api, external_id) pairs already stored."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.use_copy = engine.dialect.name == "postgresql"
+        self._raw_connection = None
+
+    def _copy(self, rows: List[Dict]) -> int:
+        if self._raw_connection is None:
+            self._raw_connection = self.engine.raw_connection()
+            with self._raw_connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {STAGING_TABLE} AS "
+                    f"SELECT {', '.join(COLUMNS)} FROM campgrounds WITH NO DATA"
+                )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # Unquoted empty fields are NULL in COPY's CSV format
+            writer.writerow(["" if row[column] is None else row[column] for column in COLUMNS])
+        buffer.seek(0)
+        columns = ", ".join(COLUMNS)
+        with self._raw_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO campgrounds ({columns}) "
+                f"SELECT DISTINCT ON (source_api, external_id) {columns} FROM {STAGING_TABLE} "
+                f"ON CONFLICT (source_api, external_id) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        self._raw_connection.commit()
+        return inserted
+
+    def _executemany(self, rows: List[Dict]) -> int:
+        table = Campground.__table__
+        if self.engine.dialect.name == "sqlite":
+            statement = sqlite.insert(table).on_conflict_do_nothing()
+        else:
+            statement = table.insert()
+        with self.engine.begin() as connection:
+            return connection.execute(statement, rows).rowcount
+
+    def write(self, rows: List[Dict]) -> int:
+        """Insert a batch in one transaction; returns how many rows were new."""
+        return self._copy(rows) if self.use_copy else self._executemany(rows)
+
+    def close(self) -> None:
+        if self._raw_connection is not None:
+            self._raw_connection.close()
+
+
+def run_import(
+    path: str,
+    engine: Engine,
+    batch_size: int = 10000,
+    checkpoint_path: Optional[str] = None,
+    restart: bool = False,
+    source_api: Optional[str] = None,
+    log=sys.stderr,
+) -> Dict[str, int]:
+    """Import a catalog file; returns the read/inserted/duplicates/invalid counts."""
+    checkpoint = Checkpoint(checkpoint_path or path + ".checkpoint", path)
+    if restart:
+        checkpoint.remove()
+    elif checkpoint.load():
+        print(f"Resuming {path} at byte {checkpoint.offset} ({checkpoint.counts['read']} rows read)", file=log)
+
+    counts = checkpoint.counts
+    writer = BatchWriter(engine)
+    batch: Dict[Tuple[str, str], Dict] = {}
+    started = time.perf_counter()
+    read_at_start = counts["read"]
+
+    def flush(offset: int) -> None:
+        inserted = writer.write(list(batch.values())) if batch else 0
+        counts["inserted"] += inserted
+        counts["duplicates"] += len(batch) - inserted
+        batch.clear()
+        checkpoint.offset = offset
+        checkpoint.save()
+        rate = (counts["read"] - read_at_start) / max(time.perf_counter() - started, 1e-9)
+        print(
+            f"{counts['read']:>10} read  {counts['inserted']:>10} inserted  {counts['duplicates']:>8} duplicates  "
+            f"{counts['invalid']:>6} invalid  {rate:>8.0f} rows/s",
+            file=log
+        )
+
+    try:
+        offset = checkpoint.offset
+        pending = 0
+        for line_number, offset, record in read_rows(path, checkpoint.offset):
+            counts["read"] += 1
+            pending += 1
+            try:
+                row = json.loads(record) if isinstance(record, str) else record
+                campground = CampgroundCreate(**normalize_row(row, source_api))
+                if not campground.external_id:
+                    raise ValueError("external_id is required to deduplicate imported campgrounds")
+            except (ValidationError, ValueError, TypeError) as error:
+                counts["invalid"] += 1
+                if counts["invalid"] <= MAX_REPORTED_ERRORS:
+                    print(f"Skipping row at line {line_number}: {error}", file=log)
+                continue
+            key = (campground.source_api, campground.external_id)
+            if key in batch:
+                counts["duplicates"] += 1
+            else:
+                batch[key] = campground.model_dump()
+            if pending >= batch_size:
+                flush(offset)
+                pending = 0
+        if pending:
+            flush(offset)
+    finally:
+        writer.close()
+    checkpoint.remove()
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tools.import_campgrounds",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", help="Catalog file: .jsonl or .csv")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per transaction")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the top")
+    parser.add_argument("--source-api", help="source_api for rows that don't name one")
+    parser.add_argument("--database-url", help="Database to import into (default: DATABASE_URL)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url or settings.database_url)
+    started = time.perf_counter()
+    counts = run_import(
+        args.path, engine,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        source_api=args.source_api,
+    )
+    print(
+        f"Done in {time.perf_counter() - started:.1f} s: {counts['read']} read, {counts['inserted']} inserted, "
+        f"{counts['duplicates']} duplicates, {counts['invalid']} invalid",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
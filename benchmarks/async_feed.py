@@ -0,0 +1,118 @@
+"""Compare the friend feed served by a sync route and by the async route under concurrency.
+
+Seeds a throwaway SQLite database (or the database given with
+--database-url), then fires N concurrent feed requests at the app in-process,
+once at a sync copy of the route (threadpool + sync session) and once at the
+real async route (event loop + async session), and reports wall time,
+throughput and latency percentiles.
+
+    python -m benchmarks.async_feed --concurrency 500
+    python -m benchmarks.async_feed --database-url postgresql://localhost/campshare_bench
+"""
+import argparse
+import os
+import tempfile
+
+# The app reads DATABASE_URL at import time, so pick the database before importing it
+_early_parser = argparse.ArgumentParser(add_help=False)
+_early_parser.add_argument("--database-url")
+os.environ["DATABASE_URL"] = _early_parser.parse_known_args()[0].database_url or (
+    "sqlite:///{}?check_same_thread=false".format(os.path.join(tempfile.mkdtemp(), "async_feed.db"))
+)
+
+import asyncio  # noqa: E402
+import statistics  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from typing import List  # noqa: E402
+
+import httpx  # noqa: E402
+from fastapi import Depends  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core.auth import get_current_active_user  # noqa: E402
+from app.core.database import Base, SessionLocal, engine, get_db  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.crud.camping_trip import get_friend_camping_feed  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User, Friend, Campground, CampingTrip  # noqa: E402
+from app.schemas.camping_trip import CampingTrip as CampingTripSchema  # noqa: E402
+
+SYNC_PATH = "/benchmark/sync-feed"
+ASYNC_PATH = "/api/v1/camping-trips/feed"
+
+
+@app.get(SYNC_PATH, response_model=List[CampingTripSchema])
+def sync_feed(limit: int = 20, current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    """The feed route as it was before the async layer: a threadpool route on a sync session."""
+    return get_friend_camping_feed(db, current_user.id, limit=limit)
+
+
+def seed(users: int, friends: int, trips_per_user: int) -> None:
+    """Reset the database to `users` users with `friends` friends each and their trips."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.bulk_insert_mappings(User, [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+        for i in range(1, users + 1)
+    ])
+    db.bulk_insert_mappings(Friend, [
+        {"user_id": i, "friend_id": (i + offset - 1) % users + 1, "is_accepted": True}
+        for i in range(1, users + 1) for offset in range(1, friends // 2 + 1)
+    ])
+    db.bulk_insert_mappings(Campground, [{"id": 1, "name": "Bench Camp", "location": "Nowhere, CA"}])
+    epoch = datetime(2020, 1, 1)
+    db.bulk_insert_mappings(CampingTrip, [
+        {"title": "Trip", "start_date": epoch + timedelta(hours=i * 7 + n), "end_date": epoch + timedelta(days=2),
+         "user_id": i, "campground_id": 1}
+        for i in range(1, users + 1) for n in range(trips_per_user)
+    ])
+    db.commit()
+    db.close()
+
+
+async def run(path: str, users: int, concurrency: int, limit: int):
+    """Send `concurrency` simultaneous requests; return (wall seconds, per-request latencies in ms)."""
+    tokens = [create_access_token({"sub": f"user{i % users + 1}"}) for i in range(concurrency)]
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        async def one(token: str) -> float:
+            started = time.perf_counter()
+            response = await client.get(path, params={"limit": limit}, headers={"Authorization": f"Bearer {token}"})
+            response.raise_for_status()
+            return (time.perf_counter() - started) * 1000
+
+        await one(tokens[0])  # Warm up the friend graph and connections
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one(token) for token in tokens))
+        return time.perf_counter() - started, sorted(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Benchmark against this database instead of a temporary SQLite file")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--friends", type=int, default=50)
+    parser.add_argument("--trips-per-user", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.users} users, {args.friends} friends each, {args.trips_per_user} trips each...")
+    seed(args.users, args.friends, args.trips_per_user)
+
+    print(f"{args.concurrency} concurrent feed requests, best of {args.rounds} rounds")
+    print(f"{'mode':<6} {'wall (s)':>9} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for mode, path in (("sync", SYNC_PATH), ("async", ASYNC_PATH)):
+        wall, latencies = min(
+            (asyncio.run(run(path, args.users, args.concurrency, args.limit)) for _ in range(args.rounds)),
+            key=lambda sample: sample[0]
+        )
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{mode:<6} {wall:>9.2f} {args.concurrency / wall:>8.0f} "
+              f"{statistics.median(latencies):>9.1f} {p99:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
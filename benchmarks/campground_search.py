@@ -0,0 +1,69 @@
+"""Time top-10 ranked search over the in-process campground search index.
+
+Builds the index directly from synthetic campgrounds (no database), then
+times a mix of single-word, multi-word, state and prefix queries.
+
+    python -m benchmarks.campground_search --campgrounds 500000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.core.search_index import CampgroundSearchIndex
+
+PLACES = [
+    "Yosemite", "Tahoe", "Sequoia", "Shasta", "Olympic", "Rainier", "Glacier", "Teton", "Zion", "Bryce",
+    "Arches", "Moab", "Sedona", "Denali", "Acadia", "Smoky", "Ozark", "Everglades", "Badlands", "Cascade",
+]
+FEATURES = ["Lake", "River", "Valley", "Ridge", "Creek", "Canyon", "Meadow", "Peak", "Falls", "Springs", "Pines", "Cove"]
+KINDS = ["Campground", "Camp", "RV Park", "Recreation Area", "Group Site"]
+STATES = ["CA", "OR", "WA", "WY", "UT", "AZ", "CO", "MT", "ID", "NV", "NM", "ME", "TN", "AR", "FL", "SD", "AK"]
+DESCRIPTIONS = [
+    "Quiet sites under tall pines with lake access",
+    "Riverside camping close to hiking trails and fishing",
+    "Desert camping among red rock formations with dark skies",
+    "Alpine meadows with wildflowers and mountain views",
+    "Coastal bluffs with ocean views and tide pools",
+]
+QUERIES = ["yosemite", "lake", "campground", "CA", "pines lake", "tahoe river campground", "yose", "canyon ut", "sprin"]
+
+
+def build(count: int) -> CampgroundSearchIndex:
+    rng = random.Random(42)
+    index = CampgroundSearchIndex()
+    for campground_id in range(1, count + 1):
+        place = rng.choice(PLACES)
+        index.add(
+            campground_id,
+            f"{place} {rng.choice(FEATURES)} {rng.choice(KINDS)} {campground_id}",
+            f"{place} National Forest, {rng.choice(STATES)}",
+            rng.choice(DESCRIPTIONS),
+        )
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campgrounds", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build(args.campgrounds)
+    print(f"indexed {args.campgrounds} campgrounds in {time.perf_counter() - started:.1f} s")
+    print(f"{'query':<26} {'p50 ms':>8} {'p99 ms':>8}")
+    for query in QUERIES:
+        index.search(query, 10)
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            index.search(query, 10)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f"{query!r:<26} {statistics.median(samples):>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Generate a reproducible synthetic dataset for benchmarks and load testing.
+
+Fills the database with:
+
+- N users (user1 .. userN), all with the same password, hashed once at the
+  configured bcrypt cost;
+- a power-law friend graph in `friends` (preferential attachment: each new
+  user befriends --friends-per-user existing users, picked in proportion to
+  how many friends they already have), with --pending-ratio of the edges
+  left as pending requests;
+- campgrounds scattered around real national parks and forests, with names,
+  descriptions and amenities;
+- trips over --years years ending at the start of the current year, with a
+  long-tailed number of trips per user and popular campgrounds visited more.
+
+The same --seed always produces the same data. Works on SQLite and Postgres;
+existing tables are dropped and recreated.
+
+    python -m benchmarks.datagen --users 10000
+    python -m benchmarks.datagen --database-url postgresql://localhost/campshare_bench --users 100000
+"""
+import argparse
+import os
+import tempfile
+
+# The app reads DATABASE_URL at import time, so pick the database before importing it
+_early_parser = argparse.ArgumentParser(add_help=False)
+_early_parser.add_argument("--database-url")
+if __name__ == "__main__":
+    os.environ["DATABASE_URL"] = _early_parser.parse_known_args()[0].database_url or (
+        "sqlite:///{}?check_same_thread=false".format(os.path.join(tempfile.mkdtemp(), "campshare_bench.db"))
+    )
+
+import itertools  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from typing import Dict, List, Tuple  # noqa: E402
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app.core.security import get_password_hash  # noqa: E402
+from app.models import Campground, CampingTrip, Friend, User  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+# Rows per INSERT batch
+CHUNK_SIZE = 5000
+
+# (name, state, latitude, longitude) of the areas campgrounds are scattered around
+AREAS = [
+    ("Yosemite", "CA", 37.8651, -119.5383), ("Sequoia", "CA", 36.4864, -118.5658),
+    ("Tahoe", "CA", 39.0968, -120.0324), ("Joshua Tree", "CA", 33.8734, -115.9010),
+    ("Shasta", "CA", 41.4092, -122.1949), ("Redwood", "CA", 41.2132, -124.0046),
+    ("Olympic", "WA", 47.8021, -123.6044), ("Rainier", "WA", 46.8800, -121.7269),
+    ("North Cascades", "WA", 48.7718, -121.2985), ("Crater Lake", "OR", 42.8684, -122.1685),
+    ("Mount Hood", "OR", 45.3735, -121.6959), ("Glacier", "MT", 48.7596, -113.7870),
+    ("Yellowstone", "WY", 44.4280, -110.5885), ("Grand Teton", "WY", 43.7904, -110.6818),
+    ("Zion", "UT", 37.2982, -113.0263), ("Bryce Canyon", "UT", 37.5930, -112.1871),
+    ("Moab", "UT", 38.5733, -109.5498), ("Grand Canyon", "AZ", 36.1069, -112.1129),
+    ("Sedona", "AZ", 34.8697, -111.7610), ("Rocky Mountain", "CO", 40.3428, -105.6836),
+    ("San Juan", "CO", 37.8000, -107.5000), ("Sawtooth", "ID", 44.1000, -114.9000),
+    ("Great Basin", "NV", 38.9833, -114.3000), ("Gila", "NM", 33.2300, -108.2600),
+    ("Badlands", "SD", 43.8554, -102.3397), ("Ozark", "AR", 35.6800, -93.2400),
+    ("Great Smoky", "TN", 35.6118, -83.4895), ("Shenandoah", "VA", 38.2928, -78.6796),
+    ("Acadia", "ME", 44.3386, -68.2733), ("White Mountain", "NH", 44.1700, -71.4000),
+    ("Adirondack", "NY", 44.1100, -74.2500), ("Everglades", "FL", 25.2866, -80.8987),
+    ("Denali", "AK", 63.1148, -151.1926), ("Boundary Waters", "MN", 47.9500, -91.5000),
+]
+FEATURES = ["Lake", "River", "Valley", "Ridge", "Creek", "Canyon", "Meadow", "Peak", "Falls", "Springs", "Pines", "Cove"]
+KINDS = ["Campground", "Camp", "RV Park", "Recreation Area", "Group Site"]
+DESCRIPTIONS = [
+    "Quiet sites under tall pines with lake access",
+    "Riverside camping close to hiking trails and fishing",
+    "Desert camping among red rock formations with dark skies",
+    "Alpine meadows with wildflowers and mountain views",
+    "Coastal bluffs with ocean views and tide pools",
+    "Wooded loops with easy access to the visitor center",
+]
+AMENITIES = ["tent_sites", "rv_hookups", "water", "fire_pits", "picnic_tables", "restrooms", "showers", "boat_ramp"]
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn", "Drew", "Rowan"]
+LAST_NAMES = ["Rivera", "Chen", "Patel", "Okafor", "Schmidt", "Nguyen", "Garcia", "Kowalski", "Haddad", "Larsen"]
+WEATHER = ["Sunny", "Partly cloudy", "Rain", "Thunderstorms", "Windy", "Snow", "Foggy", "Clear and cold"]
+TRIP_TITLES = ["Weekend at {}", "{} family trip", "Fall colors at {}", "{} with friends", "Solo night at {}"]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the dataset size options (shared with benchmarks.harness)."""
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--friends-per-user", type=int, default=5, help="Edges added per user; the average degree is twice this")
+    parser.add_argument("--pending-ratio", type=float, default=0.1, help="Share of friend edges left as pending requests")
+    parser.add_argument("--campgrounds", type=int, default=5000)
+    parser.add_argument("--trips-per-user", type=float, default=8.0, help="Average; the distribution is long-tailed")
+    parser.add_argument("--years", type=int, default=5)
+
+
+def friend_edges(rng: random.Random, users: int, per_user: int) -> List[Tuple[int, int]]:
+    """Build a preferential-attachment (Barabasi-Albert) graph over user IDs 1..users.
+
+    Returns (requester, target) pairs; each unordered pair appears once.
+    """
+    edges: List[Tuple[int, int]] = []
+    # Every edge end, so a uniform pick from it is a pick proportional to degree
+    ends: List[int] = []
+    for user_id in range(1, users + 1):
+        targets = set()
+        wanted = min(per_user, user_id - 1)
+        while len(targets) < wanted:
+            targets.add(rng.choice(ends) if ends and rng.random() < 0.9 else rng.randint(1, user_id - 1))
+        for target in targets:
+            edges.append((user_id, target))
+            ends.extend((user_id, target))
+    return edges
+
+
+def generate(engine: Engine, args: argparse.Namespace, log=print) -> Dict[str, int]:
+    """Drop and recreate the tables and fill them; returns row counts per table."""
+    from app.core.database import Base
+    from app.core.friend_graph import friend_graph
+    from app.core.friend_suggestions import friend_suggestion_cache
+
+    rng = random.Random(args.seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    friend_graph.invalidate()
+    friend_suggestion_cache.clear()
+    counts = {}
+    started = time.perf_counter()
+
+    def insert(model, rows) -> None:
+        with engine.begin() as connection:
+            for start in range(0, len(rows), CHUNK_SIZE):
+                connection.execute(model.__table__.insert(), rows[start:start + CHUNK_SIZE])
+        counts[model.__tablename__] = counts.get(model.__tablename__, 0) + len(rows)
+
+    hashed_password = get_password_hash(PASSWORD)
+    insert(User, [
+        {
+            "id": user_id,
+            "email": f"user{user_id}@example.com",
+            "username": f"user{user_id}",
+            "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "hashed_password": hashed_password,
+            "is_active": True,
+        }
+        for user_id in range(1, args.users + 1)
+    ])
+    log(f"  users: {args.users}")
+
+    edges = friend_edges(rng, args.users, args.friends_per_user)
+    insert(Friend, [
+        {"user_id": user_id, "friend_id": friend_id, "is_accepted": rng.random() >= args.pending_ratio}
+        for user_id, friend_id in edges
+    ])
+    log(f"  friend edges: {len(edges)}")
+
+    campgrounds = []
+    for campground_id in range(1, args.campgrounds + 1):
+        area, state, latitude, longitude = rng.choice(AREAS)
+        amenities = rng.sample(AMENITIES, rng.randint(2, 5))
+        campgrounds.append({
+            "id": campground_id,
+            "name": f"{area} {rng.choice(FEATURES)} {rng.choice(KINDS)}",
+            "location": f"{area} National Forest, {state}",
+            "description": rng.choice(DESCRIPTIONS),
+            "latitude": round(latitude + rng.gauss(0, 0.25), 6),
+            "longitude": round(longitude + rng.gauss(0, 0.25), 6),
+            "amenities": json.dumps(amenities),
+            "max_capacity": rng.choice([4, 6, 8, 12, 20, 50]),
+            "has_water": "water" in amenities,
+            "has_showers": "showers" in amenities,
+            "has_electricity": "rv_hookups" in amenities,
+            "rv_friendly": "rv_hookups" in amenities,
+            "tent_friendly": "tent_sites" in amenities,
+            "pet_friendly": rng.random() < 0.6,
+            "external_id": f"bench-{campground_id}",
+            "source_api": "benchmark",
+        })
+    insert(Campground, campgrounds)
+    log(f"  campgrounds: {args.campgrounds}")
+
+    # Popular campgrounds get most visits (Zipf-like weights)
+    cumulative_weights = list(itertools.accumulate(1 / rank for rank in range(1, args.campgrounds + 1)))
+    end = datetime(datetime.utcnow().year, 1, 1)
+    span_days = 365 * args.years
+    trips = []
+    for user_id in range(1, args.users + 1):
+        # Long-tailed trips per user with the requested mean
+        for _ in range(int(rng.paretovariate(2.0) * args.trips_per_user / 2)):
+            campground = rng.choices(campgrounds, cum_weights=cumulative_weights)[0]
+            start_date = end - timedelta(days=rng.randint(1, span_days), hours=rng.randint(8, 18))
+            area = campground["name"].split(" ")[0]
+            trips.append({
+                "title": rng.choice(TRIP_TITLES).format(area),
+                "description": rng.choice(DESCRIPTIONS),
+                "start_date": start_date,
+                "end_date": start_date + timedelta(days=rng.randint(1, 6)),
+                "trip_notes": "Bring bug spray" if rng.random() < 0.3 else None,
+                "weather_conditions": rng.choice(WEATHER),
+                "group_size": rng.randint(1, 8),
+                "user_id": user_id,
+                "campground_id": campground["id"],
+            })
+        if len(trips) >= CHUNK_SIZE * 10:
+            insert(CampingTrip, trips)
+            trips = []
+    insert(CampingTrip, trips)
+    log(f"  trips: {counts['camping_trips']}")
+
+    if engine.dialect.name == "postgresql":
+        # IDs were given explicitly, so move the sequences past them
+        with engine.begin() as connection:
+            for table in ("users", "campgrounds"):
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                ))
+
+    from app.core.config import settings
+    if settings.feed_timeline_enabled:
+        from app.core.database import SessionLocal
+        from app.crud.feed import rebuild_timeline
+        db = SessionLocal()
+        for user_id in range(1, args.users + 1):
+            rebuild_timeline(db, user_id)
+        db.close()
+        log("  timelines rebuilt")
+
+    log(f"Generated in {time.perf_counter() - started:.1f} s")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to fill (default: a new temporary SQLite file)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from app.core.database import engine
+    print(f"Generating into {engine.url.render_as_string(hide_password=True)} (seed {args.seed})")
+    generate(engine, args)
+
+
+if __name__ == "__main__":
+    main()
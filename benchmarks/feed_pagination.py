@@ -0,0 +1,112 @@
+"""Compare offset and keyset (cursor) pagination of the friend camping feed.
+
+Seeds a throwaway SQLite database with one user, a set of friends and a large
+number of friend trips, then times fetching page 1, 100 and 1000 of the feed
+both ways. Pages past the end of the feed are skipped.
+
+    python -m benchmarks.feed_pagination --trips 300000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.pagination import decode_cursor, next_cursor
+from app.crud.camping_trip import get_friend_camping_feed
+from app.models import User, Friend, Campground, CampingTrip
+
+PAGES = (1, 100, 1000)
+
+
+def seed(db, friends: int, trips: int) -> None:
+    """Insert one reader (id 1), `friends` accepted friends and `trips` friend trips."""
+    rng = random.Random(42)
+    db.bulk_insert_mappings(User, [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+        for i in range(1, friends + 2)
+    ])
+    db.bulk_insert_mappings(Friend, [
+        {"user_id": 1, "friend_id": i, "is_accepted": True} for i in range(2, friends + 2)
+    ])
+    db.bulk_insert_mappings(Campground, [{"id": 1, "name": "Bench Camp", "location": "Nowhere, CA"}])
+    epoch = datetime(2015, 1, 1)
+    batch = []
+    for _ in range(trips):
+        start = epoch + timedelta(minutes=rng.randrange(0, 10 * 365 * 24 * 60))
+        batch.append({
+            "title": "Trip",
+            "start_date": start,
+            "end_date": start + timedelta(days=2),
+            "user_id": rng.randrange(2, friends + 2),
+            "campground_id": 1,
+        })
+        if len(batch) == 10000:
+            db.bulk_insert_mappings(CampingTrip, batch)
+            batch = []
+    if batch:
+        db.bulk_insert_mappings(CampingTrip, batch)
+    db.commit()
+
+
+def time_call(fn, repeat: int) -> float:
+    """Median wall time of `fn()` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=300000)
+    parser.add_argument("--friends", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "feed_pagination.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.friends, args.trips)
+
+    # Walk the feed once by cursor to learn the cursor that starts each measured page, stopping
+    # where the feed route would send no X-Next-Cursor header
+    cursors = {1: None}
+    cursor = None
+    for page in range(1, max(PAGES)):
+        trips = get_friend_camping_feed(db, 1, limit=args.page_size, cursor=cursor)
+        encoded = next_cursor(trips, args.page_size)
+        db.expunge_all()
+        if encoded is None:
+            break
+        cursor = decode_cursor(encoded)
+        if page + 1 in PAGES:
+            cursors[page + 1] = cursor
+
+    print(f"{args.trips} friend trips, {args.friends} friends, page size {args.page_size}")
+    print(f"{'page':>6} {'offset ms':>10} {'cursor ms':>10}")
+    for page in sorted(cursors):
+        skip = (page - 1) * args.page_size
+        offset_ms = time_call(
+            lambda: (get_friend_camping_feed(db, 1, skip=skip, limit=args.page_size), db.expunge_all()),
+            args.repeat,
+        )
+        cursor_ms = time_call(
+            lambda: (get_friend_camping_feed(db, 1, limit=args.page_size, cursor=cursors[page]), db.expunge_all()),
+            args.repeat,
+        )
+        print(f"{page:>6} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
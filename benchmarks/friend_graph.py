@@ -0,0 +1,128 @@
+"""Measure the in-memory friend graph: memory at 1M edges and /feed latency.
+
+The memory figure comes from building the adjacency arrays directly from
+synthetic edges. The latency comparison seeds a throwaway SQLite database and
+times the friend feed using the old `get_friends` query against the graph.
+
+    python -m benchmarks.friend_graph --edges 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.friend_graph import FriendGraph, friend_graph
+from app.crud.camping_trip import get_friend_camping_feed
+from app.crud.friend import get_friends
+from app.models import User, Friend, Campground, CampingTrip
+
+
+def random_edges(users: int, edges: int, seed: int = 42):
+    rng = random.Random(seed)
+    seen = set()
+    while len(seen) < edges:
+        a, b = rng.randrange(1, users + 1), rng.randrange(1, users + 1)
+        if a != b:
+            seen.add((min(a, b), max(a, b)))
+    return list(seen)
+
+
+def measure_memory(users: int, edges: int) -> None:
+    pairs = random_edges(users, edges)
+    gc.collect()
+    tracemalloc.start()
+    adjacency = FriendGraph.build_adjacency(pairs)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    entries = sum(len(friends) for friends in adjacency.values())
+    print(f"graph: {users} users, {edges} edges ({entries} adjacency entries)")
+    print(f"  resident {current / 2 ** 20:.1f} MiB, peak while building {peak / 2 ** 20:.1f} MiB")
+
+
+def seed(db, friends: int, trips: int) -> None:
+    rng = random.Random(7)
+    db.bulk_insert_mappings(User, [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+        for i in range(1, friends + 2)
+    ])
+    db.bulk_insert_mappings(Friend, [
+        {"user_id": 1, "friend_id": i, "is_accepted": True} for i in range(2, friends + 2)
+    ])
+    db.bulk_insert_mappings(Campground, [{"id": 1, "name": "Bench Camp", "location": "Nowhere, CA"}])
+    epoch = datetime(2015, 1, 1)
+    db.bulk_insert_mappings(CampingTrip, [
+        {
+            "title": "Trip",
+            "start_date": epoch + timedelta(hours=i),
+            "end_date": epoch + timedelta(hours=i + 48),
+            "user_id": rng.randrange(2, friends + 2),
+            "campground_id": 1,
+        }
+        for i in range(trips)
+    ])
+    db.commit()
+
+
+def feed_with_query(db, user_id: int, limit: int):
+    """The feed as it was computed before the friend graph: ORM rows rebuilt into IDs."""
+    friend_ids = []
+    for friend in get_friends(db, user_id):
+        friend_ids.append(friend.friend_id if friend.user_id == user_id else friend.user_id)
+    return db.query(CampingTrip).filter(CampingTrip.user_id.in_(friend_ids)).order_by(
+        CampingTrip.start_date.desc(), CampingTrip.id.desc()
+    ).limit(limit).all()
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--edges", type=int, default=1000000)
+    parser.add_argument("--friends", type=int, default=1000, help="Friends of the feed reader")
+    parser.add_argument("--trips", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    measure_memory(args.users, args.edges)
+
+    path = os.path.join(tempfile.mkdtemp(), "friend_graph.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.friends, args.trips)
+
+    def before():
+        feed_with_query(db, 1, 20)
+        db.expunge_all()
+
+    def after():
+        get_friend_camping_feed(db, 1, limit=20)
+        db.expunge_all()
+
+    friend_graph.invalidate()
+    after()  # Load the graph outside the timed runs
+    print(f"/feed, reader with {args.friends} friends, {args.trips} trips, page size 20")
+    print(f"  get_friends query: {median_ms(before, args.repeat):.2f} ms")
+    print(f"  friend graph:      {median_ms(after, args.repeat):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Measure /friends/suggestions for a user with many friends, cold and cached.
+
+Seeds a throwaway SQLite database where the reader has --friends friends,
+each of whom has about --friends-of-friend friends among --users users, and
+everyone has a few trips at --campgrounds campgrounds. Then times
+`get_friend_suggestions` with an empty cache (two-hop expansion plus the
+shared campground query) and from the cache, and the cost of adjusting the
+cache for an accepted friendship.
+
+    python -m benchmarks.friend_suggestions --friends 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.friend_graph import friend_graph
+from app.core.friend_suggestions import friend_suggestion_cache
+from app.crud.friend import get_friend_suggestions
+from app.models import User, Friend, Campground, CampingTrip
+
+
+def seed(engine, users: int, friends: int, friends_of_friend: int, campgrounds: int, trips_per_user: int) -> None:
+    rng = random.Random(11)
+    pairs = {(1, friend_id) for friend_id in range(2, friends + 2)}
+    for friend_id in range(2, friends + 2):
+        for _ in range(friends_of_friend):
+            other_id = rng.randint(2, users)
+            if other_id != friend_id:
+                pairs.add((min(friend_id, other_id), max(friend_id, other_id)))
+    epoch = datetime(2015, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "full_name": f"User {i}", "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        connection.execute(Friend.__table__.insert(), [
+            {"user_id": low, "friend_id": high, "user_low_id": low, "user_high_id": high, "is_accepted": True}
+            for low, high in pairs
+        ])
+        connection.execute(Campground.__table__.insert(), [
+            {"id": i, "name": f"Camp {i}", "location": "Nowhere, CA"} for i in range(1, campgrounds + 1)
+        ])
+        connection.execute(CampingTrip.__table__.insert(), [
+            {
+                "title": "Trip",
+                "start_date": epoch + timedelta(days=rng.randrange(3000)),
+                "end_date": epoch + timedelta(days=3001),
+                "user_id": user_id,
+                "campground_id": rng.randint(1, campgrounds),
+            }
+            for user_id in range(1, users + 1) for _ in range(trips_per_user)
+        ])
+
+
+def percentiles(fn: Callable[[], None], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return [statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--friends", type=int, default=1000, help="Friends of the reader")
+    parser.add_argument("--friends-of-friend", type=int, default=150, help="Friends each of the reader's friends adds")
+    parser.add_argument("--campgrounds", type=int, default=2000)
+    parser.add_argument("--trips-per-user", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "friend_suggestions.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.users, args.friends, args.friends_of_friend, args.campgrounds, args.trips_per_user)
+    db = sessionmaker(bind=engine)()
+    friend_graph.invalidate()
+    friend_graph.friend_ids(db, 1)  # Load the graph outside the timed runs
+
+    def cold():
+        friend_suggestion_cache.clear()
+        get_friend_suggestions(db, 1, limit=10)
+
+    def cached():
+        get_friend_suggestions(db, 1, limit=10)
+
+    print(f"reader with {args.friends} friends, {friend_graph.degree(db, 2)} friends for the first of them, "
+          f"{args.users} users")
+    median, p99 = percentiles(cold, max(args.repeat // 10, 5))
+    print(f"  cold (expand + score): median {median:.2f} ms, p99 {p99:.2f} ms")
+    median, p99 = percentiles(cached, args.repeat)
+    print(f"  cached:                median {median:.2f} ms, p99 {p99:.2f} ms")
+
+    # Cache every friend's suggestions, then time adjusting them for a friendship between two friends of the reader
+    for friend_id in range(2, args.friends + 2):
+        get_friend_suggestions(db, friend_id, limit=10)
+    started = time.perf_counter()
+    friend_graph.add_friendship(2, 3)
+    friend_suggestion_cache.add_friendship(db, 2, 3)
+    print(f"  adjust {friend_suggestion_cache.stats()['entries']} cached users for a new friendship: "
+          f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Load-test the hot endpoints in-process and report throughput and latency percentiles.
+
+Drives the ASGI app through httpx's ASGITransport (no server, no network)
+against a dataset from benchmarks.datagen, which is generated first when the
+database has no users (or always, with --regenerate). For each scenario the
+same seeded request sequence is sent by --concurrency concurrent clients:
+
+- login:              POST /api/v1/auth/login
+- feed:               GET  /api/v1/camping-trips/feed
+- map:                GET  /api/v1/camping-trips/map, a viewport around a park
+- campground_search:  GET  /api/v1/campgrounds/search
+- friend_search:      GET  /api/v1/friends/search
+- friend_suggestions: GET  /api/v1/friends/suggestions
+
+The first --warmup requests of each scenario are not measured. Results can be
+written as JSON (--json) and two such files compared (--compare), so a run on
+each commit shows what a change did. Logins hash at --bcrypt-rounds, which
+must match the cost the dataset was generated with, or every login rehashes.
+
+    python -m benchmarks.harness --users 5000 --json before.json
+    python -m benchmarks.harness --database-url postgresql://localhost/campshare_bench --json after.json
+    python -m benchmarks.harness --compare before.json after.json
+"""
+import argparse
+import os
+import tempfile
+
+# The app reads DATABASE_URL at import time, so pick the database before importing it
+_early_parser = argparse.ArgumentParser(add_help=False)
+_early_parser.add_argument("--database-url")
+os.environ["DATABASE_URL"] = _early_parser.parse_known_args()[0].database_url or (
+    "sqlite:///{}?check_same_thread=false".format(os.path.join(tempfile.mkdtemp(), "harness.db"))
+)
+
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+from typing import Dict, List, Optional, Tuple  # noqa: E402
+
+import httpx  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Campground, CampingTrip, Friend, User  # noqa: E402
+from benchmarks import datagen  # noqa: E402
+
+SCENARIOS = ("login", "feed", "map", "campground_search", "friend_search", "friend_suggestions")
+SEARCH_TERMS = ["lake", "river camp", "yosemite", "canyon", "pines", "creek", "rv park", "glacier", "springs", "ridge"]
+
+# (method, path, request options) of one request
+Request = Tuple[str, str, Dict]
+
+
+def build_requests(scenario: str, count: int, users: int, seed: int) -> List[Request]:
+    """The seeded request sequence of a scenario."""
+    rng = random.Random(f"{seed}-{scenario}")
+    tokens: Dict[int, str] = {}
+
+    def auth(user_id: int) -> Dict:
+        if user_id not in tokens:
+            tokens[user_id] = security.create_access_token({"sub": f"user{user_id}"})
+        return {"Authorization": f"Bearer {tokens[user_id]}"}
+
+    requests = []
+    for _ in range(count):
+        user_id = rng.randint(1, users)
+        if scenario == "login":
+            form = {"username": f"user{user_id}", "password": datagen.PASSWORD}
+            requests.append(("POST", "/api/v1/auth/login", {"data": form}))
+        elif scenario == "feed":
+            requests.append(("GET", "/api/v1/camping-trips/feed", {"params": {"limit": 20}, "headers": auth(user_id)}))
+        elif scenario == "map":
+            _, _, latitude, longitude = rng.choice(datagen.AREAS)
+            viewport = {
+                "min_lat": latitude - 1, "min_lng": longitude - 1.5,
+                "max_lat": latitude + 1, "max_lng": longitude + 1.5,
+                "zoom": rng.choice([6, 9, 12]),
+            }
+            requests.append(("GET", "/api/v1/camping-trips/map", {"params": viewport, "headers": auth(user_id)}))
+        elif scenario == "campground_search":
+            requests.append(("GET", "/api/v1/campgrounds/search", {"params": {"q": rng.choice(SEARCH_TERMS)}}))
+        elif scenario == "friend_search":
+            # Username prefixes of varying selectivity: "user1" matches thousands, "user1234" a handful
+            prefix = f"user{rng.randint(1, users)}"[:rng.randint(5, 8)]
+            requests.append(("GET", "/api/v1/friends/search", {"params": {"q": prefix}, "headers": auth(user_id)}))
+        elif scenario == "friend_suggestions":
+            requests.append(("GET", "/api/v1/friends/suggestions", {"headers": auth(user_id)}))
+    return requests
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def run_scenario(client: httpx.AsyncClient, requests: List[Request], concurrency: int, warmup: int) -> Dict:
+    """Send the requests from `concurrency` clients; return the scenario's summary."""
+    for method, path, options in requests[:warmup]:
+        await client.request(method, path, **options)
+
+    measured = requests[warmup:]
+    latencies: List[float] = []
+    errors = 0
+    position = 0
+
+    async def worker() -> None:
+        nonlocal errors, position
+        while position < len(measured):
+            method, path, options = measured[position]
+            position += 1
+            sent = time.perf_counter()
+            response = await client.request(method, path, **options)
+            latencies.append((time.perf_counter() - sent) * 1000)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout
+        return commit + ("-dirty" if dirty.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_counts() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return {
+            model.__tablename__: db.query(func.count(model.id)).scalar()
+            for model in (User, Friend, Campground, CampingTrip)
+        }
+    finally:
+        db.close()
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    print(f"{'scenario':<18} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for scenario, result in results.items():
+        print(f"{scenario:<18} {result['requests']:>8} {result['errors']:>6} {result['throughput']:>8.1f} "
+              f"{result['p50_ms']:>6.1f}ms {result['p95_ms']:>6.1f}ms {result['p99_ms']:>6.1f}ms {result['max_ms']:>6.1f}ms")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print the change of each scenario's throughput and percentiles between two JSON results."""
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    for label, run in (("before", before), ("after", after)):
+        meta = run["meta"]
+        print(f"{label:<6} {meta['git_commit']}  {meta['dialect']}  {meta['dataset']}  concurrency {meta['concurrency']}")
+    print(f"{'scenario':<18} {'req/s':>18} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    for scenario, new in after["results"].items():
+        old = before["results"].get(scenario)
+        if old is None:
+            continue
+        cells = []
+        for key in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:>6.1f}>{new[key]:<6.1f}{change:>+4.0f}%")
+        print(f"{scenario:<18} " + " ".join(f"{cell:>18}" for cell in cells))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to run against (default: a new temporary SQLite file)")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate the dataset even if the database has one")
+    datagen.add_arguments(parser)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="Measured requests of the login scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, default=settings.bcrypt_rounds)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two --json results and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    # Concurrent requests queue for connections here; don't log each slow checkout
+    logging.getLogger("app.core.pool_stats").setLevel(logging.ERROR)
+    settings.bcrypt_rounds = args.bcrypt_rounds
+    security.pwd_context.update(bcrypt__rounds=args.bcrypt_rounds)
+
+    # A no-op on a migrated database; creates the tables of a new SQLite file
+    Base.metadata.create_all(bind=engine)
+    if args.regenerate or not dataset_counts()["users"]:
+        print(f"Generating dataset (seed {args.seed}, {args.users} users)")
+        datagen.generate(engine, args)
+    dataset = dataset_counts()
+    users = dataset["users"]
+
+    scenarios = [scenario for scenario in args.scenarios.split(",") if scenario]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    async def run_all() -> Dict[str, Dict]:
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for scenario in scenarios:
+                count = args.login_requests if scenario == "login" else args.requests
+                requests = build_requests(scenario, args.warmup + count, users, args.seed)
+                results[scenario] = await run_scenario(client, requests, args.concurrency, args.warmup)
+        return results
+
+    print(f"{engine.dialect.name}, {dataset}, concurrency {args.concurrency}")
+    results = asyncio.run(run_all())
+    print_results(results)
+
+    if args.json_path:
+        meta = {
+            "git_commit": git_commit(),
+            "run_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "dataset": dataset,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "bcrypt_rounds": args.bcrypt_rounds,
+        }
+        with open(args.json_path, "w") as results_file:
+            json.dump({"meta": meta, "results": results}, results_file, indent=2, sort_keys=True)
+            results_file.write("\n")
+        print(f"Wrote {args.json_path}")
+    return 1 if any(result["errors"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
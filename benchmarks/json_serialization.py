@@ -0,0 +1,104 @@
+"""Measure CPU time to encode trip listings: FastAPI's default path vs FastJSONResponse.
+
+For each size, builds N trip ORM objects (as /feed and /my-trips return) and
+N map entry dicts (as /map returns), then encodes them both ways:
+
+- default: what FastAPI does with a returned list, i.e. validate it against
+  the route's response_model, convert it to JSON-compatible Python objects
+  and encode it with the stdlib json module (JSONResponse);
+- fast: FastJSONResponse, with `dump_list(CAMPING_TRIP_LIST, ...)` for the
+  ORM objects and `to_json` straight from the dicts.
+
+No database is involved. Reports the best-of-N process CPU time per response.
+
+    python -m benchmarks.json_serialization --sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.api.camping_trips import router
+from app.core.fast_json import CAMPING_TRIP_LIST, FastJSONResponse, dump_list
+from app.models import CampingTrip
+
+
+def route_field(path: str):
+    return next(route for route in router.routes if isinstance(route, APIRoute) and route.path == path).response_field
+
+
+def make_trips(count: int):
+    epoch = datetime(2020, 1, 1)
+    return [
+        CampingTrip(
+            id=n, title=f"Trip {n}", description="A long weekend by the lake", trip_notes="Bring bug spray",
+            weather_conditions="Sunny", group_size=4, start_date=epoch + timedelta(hours=n),
+            end_date=epoch + timedelta(hours=n + 48), user_id=n % 100, campground_id=n % 500,
+            created_at=epoch, updated_at=None, version=1
+        )
+        for n in range(count)
+    ]
+
+
+def make_map_entries(count: int):
+    epoch = datetime(2020, 1, 1)
+    return [
+        {
+            "id": n, "title": f"Trip {n}", "description": "A long weekend by the lake",
+            "start_date": epoch + timedelta(hours=n), "end_date": epoch + timedelta(hours=n + 48),
+            "trip_notes": "Bring bug spray", "weather_conditions": "Sunny", "group_size": 4,
+            "created_at": epoch, "updated_at": None, "is_own_trip": n % 2 == 0,
+            "user": {"id": n % 100, "username": f"user{n % 100}", "full_name": f"User {n % 100}"},
+            "campground": {
+                "id": n % 500, "name": "Bench Camp", "location": "Nowhere, CA", "description": "Quiet sites",
+                "latitude": 37.5, "longitude": -119.5, "amenities": '["water", "fire_pits"]'
+            }
+        }
+        for n in range(count)
+    ]
+
+
+def default_path(field, rows) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=rows, is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def cpu_seconds(function, *args, repeat: int):
+    """Best process CPU time of `repeat` calls, and the last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        result = function(*args)
+        best = min(best, time.process_time() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    feed_field = route_field("/feed")
+    map_field = route_field("/map")
+    cases = (
+        ("feed", make_trips, feed_field, lambda rows: FastJSONResponse(dump_list(CAMPING_TRIP_LIST, rows)).body),
+        ("map", make_map_entries, map_field, lambda rows: FastJSONResponse(rows).body),
+    )
+    print(f"{'listing':<8} {'trips':>7} {'default (ms)':>13} {'fast (ms)':>10} {'speedup':>8}")
+    for name, make_rows, field, fast_path in cases:
+        for size in args.sizes:
+            rows = make_rows(size)
+            repeat = max(1, args.repeat if size < 100000 else args.repeat // 2)
+            default_time, default_body = cpu_seconds(default_path, field, rows, repeat=repeat)
+            fast_time, fast_body = cpu_seconds(fast_path, rows, repeat=repeat)
+            assert len(fast_body) <= len(default_body)
+            print(f"{name:<8} {size:>7} {default_time * 1000:>13.1f} {fast_time * 1000:>10.1f} "
+                  f"{default_time / fast_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Measure login throughput and unrelated-endpoint latency during a login flood.
+
+Seeds a throwaway SQLite database with users, then for a fixed duration runs
+N clients that log in back to back while a probe requests /health and
+/api/v1/campgrounds/{id} in a loop. It runs twice: once against a copy of the
+old login route, which runs bcrypt inline on the request threadpool, and once
+against the real login route, which hashes on the dedicated pool and sheds
+load with 503 + Retry-After. Clients honour Retry-After.
+
+    python -m benchmarks.login_flood --clients 200 --seconds 5 --rounds 10
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///{}?check_same_thread=false".format(
+    os.path.join(tempfile.mkdtemp(), "login_flood.db")
+)
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import logging  # noqa: E402
+import statistics  # noqa: E402
+import time  # noqa: E402
+
+import httpx  # noqa: E402
+from fastapi import Depends, HTTPException  # noqa: E402
+from fastapi.security import OAuth2PasswordRequestForm  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, SessionLocal, engine, get_db  # noqa: E402
+from app.crud.user import get_user_by_username  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Campground, User  # noqa: E402
+
+INLINE_PATH = "/benchmark/inline-login"
+POOL_PATH = "/api/v1/auth/login"
+PASSWORD = "benchmark-password"
+
+
+@app.post(INLINE_PATH)
+def inline_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """The login route as it was before the hashing pool: bcrypt on the request threadpool."""
+    user = get_user_by_username(db, form_data.username)
+    if not user or not security.verify_password(form_data.password, user.hashed_password):
+        raise HTTPException(status_code=401, detail="Incorrect username or password")
+    return {"access_token": security.create_access_token({"sub": user.username}), "token_type": "bearer"}
+
+
+def seed(users: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    hashed_password = security.get_password_hash(PASSWORD)
+    db.bulk_insert_mappings(User, [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": hashed_password}
+        for i in range(1, users + 1)
+    ])
+    db.bulk_insert_mappings(Campground, [{"id": 1, "name": "Bench Camp", "location": "Nowhere, CA"}])
+    db.commit()
+    db.close()
+
+
+def percentile(samples, fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def flood(path: str, clients: int, users: int, seconds: float):
+    """Return (successful logins, 503 responses, probe latencies in ms, wall seconds).
+
+    Requests in flight at the deadline still complete, so the wall time can
+    exceed `seconds`.
+    """
+    started = time.perf_counter()
+    deadline = started + seconds
+    logins = shed = 0
+    probe_latencies = []
+
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark", timeout=None) as client:
+        async def login_client(number: int):
+            nonlocal logins, shed
+            form = {"username": f"user{number % users + 1}", "password": PASSWORD}
+            while time.perf_counter() < deadline:
+                response = await client.post(path, data=form)
+                if response.status_code == 503:
+                    shed += 1
+                    await asyncio.sleep(float(response.headers["Retry-After"]))
+                    continue
+                response.raise_for_status()
+                logins += 1
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                for probe_path in ("/health", "/api/v1/campgrounds/1"):
+                    sent = time.perf_counter()
+                    (await client.get(probe_path)).raise_for_status()
+                    probe_latencies.append((time.perf_counter() - sent) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(probe(), *(login_client(number) for number in range(clients)))
+    return logins, shed, probe_latencies, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost of the seeded hashes")
+    args = parser.parse_args()
+    # CPU-bound hashing makes every checkout slow here; don't log each one
+    logging.getLogger("app.core.pool_stats").setLevel(logging.ERROR)
+
+    settings.bcrypt_rounds = args.rounds
+    security.pwd_context.update(bcrypt__rounds=args.rounds)
+    seed(args.users)
+
+    print(f"{args.clients} login clients for {args.seconds:.0f} s, bcrypt cost {args.rounds}, "
+          f"{settings.password_hash_workers} hashing threads, {settings.password_hash_max_pending} max pending")
+    print(f"{'mode':<7} {'wall':>6} {'logins/s':>9} {'503s':>6} {'probes':>7} "
+          f"{'probe p50':>10} {'probe p99':>10} {'probe max':>10}")
+    for mode, path in (("inline", INLINE_PATH), ("pool", POOL_PATH)):
+        logins, shed, latencies, wall = asyncio.run(flood(path, args.clients, args.users, args.seconds))
+        print(f"{mode:<7} {wall:>5.1f}s {logins / wall:>9.1f} {shed:>6} {len(latencies):>7} "
+              f"{statistics.median(latencies):>8.1f}ms {percentile(latencies, 0.99):>8.1f}ms {max(latencies):>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare the indexed mock campground catalog against the old linear scan.
+
+Generates catalogs of 10 to 100k entries, then times `search_campgrounds`
+for name, state and prefix queries both ways. The linear scan is the
+implementation the catalog replaced: rebuild the list, then substring match.
+
+    python -m benchmarks.mock_catalog
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.core.api_service import CampgroundCatalog
+
+SIZES = (10, 100, 1000, 10000, 100000)
+QUERIES = ("yosemite", "CA", "lake campground", "tah")
+PLACES = ["Yosemite", "Tahoe", "Sequoia", "Shasta", "Olympic", "Rainier", "Glacier", "Teton", "Zion", "Arches"]
+FEATURES = ["Lake", "River", "Valley", "Ridge", "Creek", "Canyon", "Meadow", "Peak"]
+STATES = ["CA", "OR", "WA", "WY", "UT", "AZ", "CO", "MT"]
+
+
+def generate(count: int) -> list:
+    rng = random.Random(count)
+    rows = []
+    for number in range(count):
+        place, state = rng.choice(PLACES), rng.choice(STATES)
+        rows.append({
+            "name": f"{place} {rng.choice(FEATURES)} Campground",
+            "location": f"{place} National Forest, {state}",
+            "state": state,
+            "description": "Tent and RV sites with water and fire pits",
+            "latitude": rng.uniform(32, 48),
+            "longitude": rng.uniform(-124, -104),
+            "amenities": ["tent_sites", "water", "fire_pits"],
+            "external_id": f"bench_{number}",
+            "source_api": "mock_data",
+        })
+    return rows
+
+
+def linear_scan(rows: list, query: str, limit: int) -> list:
+    campgrounds = [dict(row, amenities=json.dumps(row["amenities"])) for row in rows]
+    query_lower = query.lower()
+    if len(query) == 2:
+        filtered = [cg for cg in campgrounds if cg["state"].lower() == query_lower]
+    else:
+        filtered = [cg for cg in campgrounds
+                    if query_lower in cg["name"].lower()
+                    or query_lower in cg["location"].lower()
+                    or query_lower in cg["description"].lower()]
+    return filtered[:limit]
+
+
+def median_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(f"{'entries':>8} {'load ms':>8} {'query':<18} {'scan us':>10} {'catalog us':>11}")
+    for size in SIZES:
+        rows = generate(size)
+        path = os.path.join(directory, f"catalog_{size}.json")
+        with open(path, "w") as catalog_file:
+            json.dump(rows, catalog_file)
+        started = time.perf_counter()
+        catalog = CampgroundCatalog.from_file(path)
+        load_ms = (time.perf_counter() - started) * 1000
+        for query in QUERIES:
+            repeat = max(3, args.repeat if size <= 10000 else args.repeat // 4)
+            scan = median_us(lambda: linear_scan(rows, query, 10), repeat)
+            indexed = median_us(lambda: catalog.search(query, 10), args.repeat)
+            print(f"{size:>8} {load_ms:>8.1f} {query!r:<18} {scan:>10.1f} {indexed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compare a JSON list with an NDJSON stream for large trip listings.
+
+Seeds a throwaway SQLite database (or the database given with
+--database-url) with one user owning N trips, then requests /my-trips,
+/feed and /map as a JSON list and as NDJSON (Accept: application/x-ndjson).
+Requests are sent straight to the ASGI app so the time to the first body
+chunk can be seen, and for each one it reports time to first byte, total
+time, bytes and the peak Python memory allocated while serving it
+(tracemalloc, which slows both modes down alike).
+
+    python -m benchmarks.ndjson_stream --trips 100000
+"""
+import argparse
+import os
+import tempfile
+
+# The app reads DATABASE_URL at import time, so pick the database before importing it
+_early_parser = argparse.ArgumentParser(add_help=False)
+_early_parser.add_argument("--database-url")
+os.environ["DATABASE_URL"] = _early_parser.parse_known_args()[0].database_url or (
+    "sqlite:///{}?check_same_thread=false".format(os.path.join(tempfile.mkdtemp(), "ndjson_stream.db"))
+)
+
+import asyncio  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from urllib.parse import urlencode  # noqa: E402
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User, Friend, Campground, CampingTrip  # noqa: E402
+
+FRIEND_ID = 2
+
+
+def seed(trips: int) -> None:
+    """Reset the database to two friends, each with `trips` trips."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.bulk_insert_mappings(User, [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x", "full_name": f"User {i}"}
+        for i in (1, FRIEND_ID)
+    ])
+    db.bulk_insert_mappings(Friend, [{"user_id": 1, "friend_id": FRIEND_ID, "is_accepted": True}])
+    db.bulk_insert_mappings(Campground, [
+        {"id": 1, "name": "Bench Camp", "location": "Nowhere, CA", "latitude": 37.5, "longitude": -119.5,
+         "description": "Quiet sites under tall pines with lake access", "amenities": '["water", "fire_pits"]'}
+    ])
+    epoch = datetime(2000, 1, 1)
+    for user_id in (1, FRIEND_ID):
+        db.bulk_insert_mappings(CampingTrip, [
+            {"title": f"Trip {n}", "description": "A long weekend by the lake", "trip_notes": "Bring bug spray",
+             "start_date": epoch + timedelta(hours=n), "end_date": epoch + timedelta(hours=n + 48),
+             "user_id": user_id, "campground_id": 1}
+            for n in range(trips)
+        ])
+    db.commit()
+    db.close()
+
+
+async def request(path: str, query: dict, headers: dict):
+    """Send one GET to the app; return (seconds to first body byte, total seconds, body bytes, peak bytes)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": urlencode(query).encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("benchmark", 1), "server": ("benchmark", 80),
+    }
+    first_byte = None
+    size = 0
+    status = None
+    requested = asyncio.Event()
+
+    async def receive():
+        # The request body once, then nothing: streaming responses wait here for a disconnect
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal first_byte, size, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            size += len(message["body"])
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    finished = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert status == 200, f"{path} returned {status}"
+    return first_byte - started, finished - started, size, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Benchmark against this database instead of a temporary SQLite file")
+    parser.add_argument("--trips", type=int, default=100000, help="Trips per user")
+    args = parser.parse_args()
+
+    print(f"Seeding 2 friends with {args.trips} trips each...")
+    seed(args.trips)
+    token = create_access_token({"sub": "user1"})
+    routes = (
+        ("my-trips", "/api/v1/camping-trips/my-trips", {"limit": args.trips}),
+        ("feed", "/api/v1/camping-trips/feed", {"limit": args.trips}),
+        ("map", "/api/v1/camping-trips/map", {}),
+    )
+    print(f"{'route':<9} {'format':<7} {'first byte':>11} {'total':>9} {'MB sent':>8} {'peak MB':>8}")
+    for name, path, query in routes:
+        for mode, accept in (("json", "application/json"), ("ndjson", "application/x-ndjson")):
+            headers = {"Authorization": f"Bearer {token}", "Accept": accept}
+            first_byte, total, size, peak = asyncio.run(request(path, query, headers))
+            print(f"{name:<9} {mode:<7} {first_byte * 1000:>9.0f}ms {total:>8.2f}s "
+                  f"{size / 1e6:>8.1f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
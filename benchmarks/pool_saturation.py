@@ -0,0 +1,120 @@
+"""Saturate an instrumented connection pool and check the reported pool stats.
+
+Runs N threads against a queue pool of `pool_size + max_overflow`
+connections, each holding its connection for a fixed time, so the excess
+threads queue for a connection. The threads time their own checkouts, and
+the script compares those timings with what `PoolStats` reports: checkouts,
+peak checked out, overflow events, timeouts, slow checkouts, and average and
+max wait. A second round uses a pool timeout shorter than the hold time, to
+exercise timeouts. Exits non-zero if any reported number disagrees.
+
+    python -m benchmarks.pool_saturation --threads 40 --hold-ms 100
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+from app.core.pool_stats import PoolStats, instrumented_pool_class
+
+# Reported wait times may differ from the threads' own timings by this much
+WAIT_TOLERANCE_MS = 5.0
+
+
+def saturate(url: str, threads: int, pool_size: int, max_overflow: int, hold_ms: float, timeout: float):
+    """Run one round; return (stats snapshot, waits of successful checkouts in ms, number of timeouts)."""
+    stats = PoolStats("benchmark")
+    engine = create_engine(
+        url,
+        poolclass=instrumented_pool_class(QueuePool, stats),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=timeout,
+    )
+    waits = []
+    timeouts = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        start.wait()
+        started = time.perf_counter()
+        try:
+            connection = engine.connect()
+        except exc.TimeoutError:
+            with lock:
+                timeouts.append(1)
+            return
+        wait_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            waits.append(wait_ms)
+        try:
+            connection.execute(text("SELECT 1"))
+            time.sleep(hold_ms / 1000)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    snapshot = stats.snapshot(engine.pool)
+    engine.dispose()
+    return snapshot, waits, len(timeouts)
+
+
+def check(name: str, reported, expected, tolerance: float = 0.0) -> bool:
+    ok = abs(reported - expected) <= tolerance
+    print(f"  {'ok  ' if ok else 'FAIL'} {name:<17} reported {reported:>9.2f}  observed {expected:>9.2f}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=5)
+    parser.add_argument("--hold-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    # Every queued checkout is slow here; count them instead of logging each one
+    logging.getLogger("app.core.pool_stats").setLevel(logging.ERROR)
+
+    url = "sqlite:///{}?check_same_thread=false".format(os.path.join(tempfile.mkdtemp(), "pool.db"))
+    capacity = args.pool_size + args.max_overflow
+    ok = True
+    rounds = (
+        ("queueing", 30.0),
+        ("timeouts", args.hold_ms / 2000),  # Half the hold time, so only the first wave gets a connection
+    )
+    for name, timeout in rounds:
+        started = time.perf_counter()
+        snapshot, waits, timeouts = saturate(
+            url, args.threads, args.pool_size, args.max_overflow, args.hold_ms, timeout
+        )
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {args.threads} threads, pool {args.pool_size}+{args.max_overflow}, "
+              f"hold {args.hold_ms:.0f} ms, timeout {timeout * 1000:.0f} ms ({elapsed:.2f} s)")
+        ok &= check("checkouts", snapshot["checkouts"], len(waits))
+        ok &= check("timeouts", snapshot["timeouts"], timeouts)
+        ok &= check("peak_checked_out", snapshot["peak_checked_out"], min(capacity, args.threads))
+        ok &= check("checked_out", snapshot["checked_out"], 0)
+        ok &= check("overflow_events", snapshot["overflow_events"], min(args.max_overflow, max(0, args.threads - args.pool_size)))
+        if waits:
+            ok &= check("average_wait_ms", snapshot["average_wait_ms"], sum(waits) / len(waits), WAIT_TOLERANCE_MS)
+            ok &= check("max_wait_ms", snapshot["max_wait_ms"], max(waits), WAIT_TOLERANCE_MS)
+            # Waits within the tolerance of the threshold may land on either side of it
+            slow = sum(wait >= settings.db_pool_slow_checkout_ms for wait in waits)
+            ok &= check("slow_checkouts", snapshot["slow_checkouts"], slow, 1)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Check that a misbehaving provider can't push /campgrounds/search latency past the provider budget.
+
+Points the search route at a stub provider app, served in-process through
+httpx.ASGITransport, and runs rounds of concurrent searches with unique
+queries (so the search cache never answers). The stub is healthy, slow,
+flaky (half its answers are 503s) or hanging, with a fresh provider client
+per round; a last round waits out the open circuit of the hanging round and
+checks that one trial search closes it again. Each round reports search
+latency percentiles, how many searches fell back to database-only results,
+and the client's retry and circuit breaker counters. Exits non-zero if a
+round's end-to-end p99 exceeds the provider budget plus ALLOWANCE_MS, which
+covers the database work and in-process transport around the provider call.
+
+    python -m benchmarks.provider_budget --searches 400 --concurrency 20
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///{}?check_same_thread=false".format(
+    os.path.join(tempfile.mkdtemp(), "provider_budget.db")
+)
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import random  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from urllib.parse import parse_qs  # noqa: E402
+
+import httpx  # noqa: E402
+
+from app.api import campgrounds as campground_routes  # noqa: E402
+from app.core.api_service import ProviderCampgroundService  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+STUB_URL = "http://provider.stub/campgrounds/search"
+ALLOWANCE_MS = 150
+
+
+class StubProvider:
+    """ASGI app standing in for the provider; `mode` can be switched between rounds.
+
+    It answers every query with the same campgrounds, so after the first
+    search nothing new is inserted and SQLite write locking stays out of the
+    timings.
+    """
+
+    def __init__(self):
+        self.mode = "healthy"
+        self.requests = 0
+
+    async def __call__(self, scope, receive, send):
+        self.requests += 1
+        params = parse_qs(scope["query_string"].decode())
+        limit = int(params["limit"][0])
+        status = 200
+        if self.mode == "slow":
+            await asyncio.sleep(random.uniform(0.3, 1.5))
+        elif self.mode == "hanging":
+            await asyncio.sleep(60)
+        elif self.mode == "flaky" and random.random() < 0.5:
+            status = 503
+        else:
+            await asyncio.sleep(random.uniform(0.005, 0.03))
+        body = [] if status != 200 else [
+            {
+                "id": f"stub-{number}",
+                "name": f"Stub Campground {number}",
+                "address": "Stub National Forest, CA",
+                "lat": 37.0,
+                "lng": -119.0,
+                "amenities": ["water", "fire_pits"],
+            }
+            for number in range(limit)
+        ]
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+def percentile(samples, fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def run_round(client: httpx.AsyncClient, round_number: int, searches: int, concurrency: int):
+    """Return the search latencies in ms."""
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def search(number: int):
+        async with slots:
+            sent = time.perf_counter()
+            response = await client.get("/api/v1/campgrounds/search", params={"q": f"r{round_number}q{number}", "limit": 5})
+            latencies.append((time.perf_counter() - sent) * 1000)
+            response.raise_for_status()
+
+    await asyncio.gather(*(search(number) for number in range(searches)))
+    return latencies
+
+
+async def run(args) -> bool:
+    stub = StubProvider()
+    budget_ms = settings.provider_budget_seconds * 1000
+    print(f"budget {budget_ms:.0f} ms, attempt timeout {settings.provider_timeout_seconds * 1000:.0f} ms, "
+          f"{settings.provider_max_retries} retries, {settings.provider_max_concurrency} provider slots, "
+          f"{args.searches} searches x {args.concurrency} concurrent per round")
+    print(f"{'provider':<9} {'p50':>8} {'p99':>8} {'max':>8} {'degraded':>9} {'stub reqs':>10} "
+          f"{'retries':>8} {'rejected':>9} {'breaker':>10}")
+    ok = True
+    service = None
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark", timeout=None) as client:
+        for round_number, mode in enumerate(("healthy", "slow", "flaky", "hanging", "recovery")):
+            if mode == "recovery":
+                # Keep the hanging round's client, wait for its circuit to half-open and send one trial search
+                stub.mode = "healthy"
+                await asyncio.sleep(settings.provider_breaker_reset_seconds)
+                await client.get("/api/v1/campgrounds/search", params={"q": "trial", "limit": 5})
+            else:
+                if service is not None:
+                    await service.aclose()
+                stub.mode = mode
+                service = ProviderCampgroundService(
+                    search_url=STUB_URL, api_key="benchmark", transport=httpx.ASGITransport(app=stub)
+                )
+                campground_routes.campground_service = service
+            stub.requests = 0
+            retries, rejected, failures = service.retries, service.rejected, service.failures
+            latencies = await run_round(client, round_number, args.searches, args.concurrency)
+            degraded = service.failures - failures + service.rejected - rejected
+            p99 = percentile(latencies, 0.99)
+            print(f"{mode:<9} {statistics.median(latencies):>6.0f}ms {p99:>6.0f}ms "
+                  f"{max(latencies):>6.0f}ms {degraded:>9} {stub.requests:>10} {service.retries - retries:>8} "
+                  f"{service.rejected - rejected:>9} {service.breaker.state:>10}")
+            ok &= p99 <= budget_ms + ALLOWANCE_MS
+        await service.aclose()
+    print(f"{'ok' if ok else 'FAIL'}: every round's p99 within the {budget_ms:.0f} ms budget + {ALLOWANCE_MS} ms")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    # Keep the reset short so the recovery round doesn't wait long
+    settings.provider_breaker_reset_seconds = 1.0
+    logging.getLogger("app.core.pool_stats").setLevel(logging.ERROR)
+    Base.metadata.create_all(bind=engine)
+    return 0 if asyncio.run(run(args)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
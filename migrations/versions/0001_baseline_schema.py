@@ -0,0 +1,100 @@
+"""Baseline schema: users, friends, campgrounds and camping_trips as first deployed
+
+Databases created by the app's old create_all() call at startup are at this
+revision once stamped; see the README.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 05:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "campgrounds",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("amenities", sa.Text(), nullable=True),
+        sa.Column("max_capacity", sa.Integer(), nullable=True),
+        sa.Column("has_electricity", sa.Boolean(), nullable=True),
+        sa.Column("has_water", sa.Boolean(), nullable=True),
+        sa.Column("has_showers", sa.Boolean(), nullable=True),
+        sa.Column("has_wifi", sa.Boolean(), nullable=True),
+        sa.Column("pet_friendly", sa.Boolean(), nullable=True),
+        sa.Column("rv_friendly", sa.Boolean(), nullable=True),
+        sa.Column("tent_friendly", sa.Boolean(), nullable=True),
+        sa.Column("external_id", sa.String(), nullable=True),
+        sa.Column("source_api", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_campgrounds_id", "campgrounds", ["id"])
+
+    op.create_table(
+        "friends",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("friend_id", sa.Integer(), nullable=False),
+        sa.Column("is_accepted", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["friend_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_friends_id", "friends", ["id"])
+
+    op.create_table(
+        "camping_trips",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("end_date", sa.DateTime(), nullable=False),
+        sa.Column("trip_notes", sa.Text(), nullable=True),
+        sa.Column("weather_conditions", sa.String(), nullable=True),
+        sa.Column("group_size", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("campground_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["campground_id"], ["campgrounds.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_camping_trips_id", "camping_trips", ["id"])
+
+
+def downgrade():
+    op.drop_table("camping_trips")
+    op.drop_table("friends")
+    op.drop_table("campgrounds")
+    op.drop_table("users")
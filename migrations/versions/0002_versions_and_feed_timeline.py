@@ -0,0 +1,43 @@
+"""Row versions for campgrounds and trips, and the feed_entries timeline table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 05:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("campgrounds", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+    op.add_column("camping_trips", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+
+    op.create_table(
+        "feed_entries",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("trip_id", sa.Integer(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["author_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["trip_id"], ["camping_trips.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "trip_id"),
+    )
+    op.create_index("ix_feed_entries_trip_id", "feed_entries", ["trip_id"])
+    op.create_index("ix_feed_entries_user_id_start_date_trip_id", "feed_entries", ["user_id", "start_date", "trip_id"])
+    op.create_index("ix_feed_entries_user_id_author_id", "feed_entries", ["user_id", "author_id"])
+
+
+def downgrade():
+    op.drop_table("feed_entries")
+    with op.batch_alter_table("camping_trips") as batch_op:
+        batch_op.drop_column("version")
+    with op.batch_alter_table("campgrounds") as batch_op:
+        batch_op.drop_column("version")
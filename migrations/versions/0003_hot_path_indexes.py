@@ -0,0 +1,85 @@
+"""Indexes for the hot queries, and one campground per provider record
+
+- friends(user_id, is_accepted), friends(friend_id, is_accepted): friend
+  lists, pending requests and the friend graph load
+- camping_trips(user_id, start_date, id): newest-first keyset pages of
+  /my-trips and /feed
+- camping_trips(campground_id): trips of a campground
+- campgrounds(latitude, longitude): map viewport lookups
+- unique campgrounds(source_api, external_id): conflict target of the search
+  write-through and the bulk importer. Duplicates already stored are merged
+  into the oldest row first, with their trips moved over.
+- Postgres only: the GIN full-text index campground search queries
+
+On Postgres the indexes are built CONCURRENTLY, so writes aren't blocked
+while they build. If a build fails it leaves an INVALID index behind; drop
+it and rerun the upgrade.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 05:00:00
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_friends_user_id_is_accepted", "friends", ["user_id", "is_accepted"], False),
+    ("ix_friends_friend_id_is_accepted", "friends", ["friend_id", "is_accepted"], False),
+    ("ix_camping_trips_user_id_start_date_id", "camping_trips", ["user_id", "start_date", "id"], False),
+    ("ix_camping_trips_campground_id", "camping_trips", ["campground_id"], False),
+    ("ix_campgrounds_latitude_longitude", "campgrounds", ["latitude", "longitude"], False),
+    ("uq_campgrounds_source_api_external_id", "campgrounds", ["source_api", "external_id"], True),
+]
+
+# Must stay identical to app.models.campground.CAMPGROUND_SEARCH_VECTOR for queries to use the index
+CAMPGROUND_SEARCH_VECTOR = (
+    "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(location, '') "
+    "|| ' ' || coalesce(description, ''))"
+)
+
+# Campgrounds with the same provider record as an older row
+DUPLICATE_CAMPGROUNDS = """
+    SELECT duplicate.id FROM campgrounds AS duplicate
+    JOIN campgrounds AS original
+      ON original.source_api = duplicate.source_api
+     AND original.external_id = duplicate.external_id
+     AND original.id < duplicate.id
+"""
+
+
+def upgrade():
+    op.execute(f"""
+        UPDATE camping_trips SET campground_id = (
+            SELECT MIN(original.id) FROM campgrounds AS duplicate
+            JOIN campgrounds AS original
+              ON original.source_api = duplicate.source_api
+             AND original.external_id = duplicate.external_id
+            WHERE duplicate.id = camping_trips.campground_id
+        )
+        WHERE campground_id IN ({DUPLICATE_CAMPGROUNDS})
+    """)
+    op.execute(f"DELETE FROM campgrounds WHERE id IN ({DUPLICATE_CAMPGROUNDS})")
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+        if op.get_bind().dialect.name == "postgresql":
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_campgrounds_search "
+                f"ON campgrounds USING gin ({CAMPGROUND_SEARCH_VECTOR})"
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_campgrounds_search")
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,81 @@
+"""Store each friendship once, under its canonical (user_low_id, user_high_id) pair
+
+Existing rows get the pair filled in from user_id and friend_id. Where two
+users have several rows (a request each way, or a repeated request), the
+accepted one, or else the oldest, is kept and the rest deleted. Rows of a
+user with themselves are deleted too. The unique pair index then makes
+every lookup of two users one index seek and rejects duplicate requests.
+
+ix_friends_user_id_is_accepted is dropped: friend lists now read the pair
+indexes, and pending requests are looked up by recipient.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 06:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Rows whose pair has a row that wins over them: accepted first, then oldest
+SUPERSEDED_FRIENDS = """
+    SELECT superseded.id FROM friends AS superseded
+    JOIN friends AS kept
+      ON kept.user_low_id = superseded.user_low_id
+     AND kept.user_high_id = superseded.user_high_id
+     AND kept.id <> superseded.id
+    WHERE CASE WHEN kept.is_accepted THEN 1 ELSE 0 END > CASE WHEN superseded.is_accepted THEN 1 ELSE 0 END
+       OR (CASE WHEN kept.is_accepted THEN 1 ELSE 0 END = CASE WHEN superseded.is_accepted THEN 1 ELSE 0 END
+           AND kept.id < superseded.id)
+"""
+
+
+def upgrade():
+    with op.batch_alter_table("friends") as batch_op:
+        batch_op.add_column(sa.Column("user_low_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("user_high_id", sa.Integer(), nullable=True))
+
+    op.execute("DELETE FROM friends WHERE user_id = friend_id")
+    op.execute("""
+        UPDATE friends SET
+            user_low_id = CASE WHEN user_id < friend_id THEN user_id ELSE friend_id END,
+            user_high_id = CASE WHEN user_id < friend_id THEN friend_id ELSE user_id END
+    """)
+    op.execute(f"DELETE FROM friends WHERE id IN (SELECT id FROM ({SUPERSEDED_FRIENDS}) AS superseded_ids)")
+
+    with op.batch_alter_table("friends") as batch_op:
+        batch_op.alter_column("user_low_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column("user_high_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key("fk_friends_user_low_id_users", "users", ["user_low_id"], ["id"])
+        batch_op.create_foreign_key("fk_friends_user_high_id_users", "users", ["user_high_id"], ["id"])
+        batch_op.create_check_constraint("ck_friends_user_low_id_lt_user_high_id", "user_low_id < user_high_id")
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_friends_user_low_id_user_high_id", "friends", ["user_low_id", "user_high_id"],
+            unique=True, postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_friends_user_high_id_user_low_id", "friends", ["user_high_id", "user_low_id"],
+            postgresql_concurrently=True
+        )
+        op.drop_index("ix_friends_user_id_is_accepted", table_name="friends")
+
+
+def downgrade():
+    op.create_index("ix_friends_user_id_is_accepted", "friends", ["user_id", "is_accepted"])
+    op.drop_index("ix_friends_user_high_id_user_low_id", table_name="friends")
+    op.drop_index("uq_friends_user_low_id_user_high_id", table_name="friends")
+    with op.batch_alter_table("friends") as batch_op:
+        batch_op.drop_constraint("ck_friends_user_low_id_lt_user_high_id", type_="check")
+        batch_op.drop_constraint("fk_friends_user_high_id_users", type_="foreignkey")
+        batch_op.drop_constraint("fk_friends_user_low_id_users", type_="foreignkey")
+        batch_op.drop_column("user_high_id")
+        batch_op.drop_column("user_low_id")
@@ -0,0 +1,56 @@
+"""Indexes for user search by username or full name
+
+- users(lower(username)), users(lower(full_name)): case-insensitive prefix
+  search, read as an index range in name order
+- Postgres only: pg_trgm GIN indexes on the same expressions, which serve
+  the LIKE patterns the search uses there, including a word inside a full
+  name. Creating the pg_trgm extension needs a role allowed to create it.
+
+On Postgres the indexes are built CONCURRENTLY, so sign-ups aren't blocked
+while they build. If a build fails it leaves an INVALID index behind; drop
+it and rerun the upgrade.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 07:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# (name, column)
+INDEXES = [
+    ("ix_users_lower_username", "username"),
+    ("ix_users_lower_full_name", "full_name"),
+]
+
+
+def upgrade():
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    if is_postgresql:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, column in INDEXES:
+            op.create_index(name, "users", [sa.text(f"lower({column})")], postgresql_concurrently=True)
+        if is_postgresql:
+            for _, column in INDEXES:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_{column}_trgm "
+                    f"ON users USING gin (lower({column}) gin_trgm_ops)"
+                )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        for _, column in reversed(INDEXES):
+            op.execute(f"DROP INDEX IF EXISTS ix_users_{column}_trgm")
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="users")
@@ -0,0 +1,32 @@
+"""friendship_changes: accepted and ended friendships, polled by every worker's friend graph
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 08:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "friendship_changes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_low_id", sa.Integer(), nullable=False),
+        sa.Column("user_high_id", sa.Integer(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_friendship_changes_changed_at", "friendship_changes", ["changed_at"])
+
+
+def downgrade():
+    op.drop_index("ix_friendship_changes_changed_at", table_name="friendship_changes")
+    op.drop_table("friendship_changes")
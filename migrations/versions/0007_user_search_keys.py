@@ -0,0 +1,104 @@
+"""Stored search keys for user search
+
+users.username_search and users.full_name_search hold the names folded in
+Python (app.models.user.search_key), so search compares the same strings on
+every database; SQLite's lower() only folds ASCII. They replace 0005's
+lower(username) and lower(full_name) indexes, and on Postgres the trigram
+indexes move to the new columns too.
+
+Existing users are backfilled in batches of BACKFILL_BATCH_SIZE rows.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+COLUMNS = ["username", "full_name"]
+
+users = sa.table(
+    "users",
+    sa.column("id", sa.Integer),
+    sa.column("username", sa.String),
+    sa.column("full_name", sa.String),
+    sa.column("username_search", sa.String),
+    sa.column("full_name_search", sa.String),
+)
+
+
+def search_key(text):
+    # A copy of app.models.user.search_key as of this revision
+    return " ".join(text.casefold().split()) if text is not None else None
+
+
+def backfill(connection):
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(users.c.id, users.c.username, users.c.full_name)
+            .where(users.c.id > last_id).order_by(users.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            users.update().where(users.c.id == sa.bindparam("user_id")).values(
+                username_search=sa.bindparam("username_key"), full_name_search=sa.bindparam("full_name_key")
+            ),
+            [
+                {"user_id": user_id, "username_key": search_key(username), "full_name_key": search_key(full_name)}
+                for user_id, username, full_name in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    op.add_column("users", sa.Column("username_search", sa.String(), nullable=True))
+    op.add_column("users", sa.Column("full_name_search", sa.String(), nullable=True))
+    backfill(op.get_bind())
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index("ix_users_username_search", "users", ["username_search"], postgresql_concurrently=True)
+        op.create_index("ix_users_full_name_search", "users", ["full_name_search"], postgresql_concurrently=True)
+        if is_postgresql:
+            for column in COLUMNS:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_{column}_search_trgm "
+                    f"ON users USING gin ({column}_search gin_trgm_ops)"
+                )
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_users_{column}_trgm")
+        op.drop_index("ix_users_lower_full_name", table_name="users", postgresql_concurrently=True)
+        op.drop_index("ix_users_lower_username", table_name="users", postgresql_concurrently=True)
+
+
+def downgrade():
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    if is_postgresql:
+        for column in COLUMNS:
+            op.execute(f"DROP INDEX IF EXISTS ix_users_{column}_search_trgm")
+    op.drop_index("ix_users_full_name_search", table_name="users")
+    op.drop_index("ix_users_username_search", table_name="users")
+    # Before the lower() indexes exist: on SQLite this rebuilds the table, which would lose them
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("full_name_search")
+        batch_op.drop_column("username_search")
+
+    op.create_index("ix_users_lower_username", "users", [sa.text("lower(username)")])
+    op.create_index("ix_users_lower_full_name", "users", [sa.text("lower(full_name)")])
+    if is_postgresql:
+        for column in COLUMNS:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_users_{column}_trgm "
+                f"ON users USING gin (lower({column}) gin_trgm_ops)"
+            )
@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+# The app reads its settings at import time, so point it at a throwaway database first
+os.environ["DATABASE_URL"] = "sqlite:///{}?check_same_thread=false".format(
+    os.path.join(tempfile.mkdtemp(), "tests.db")
+)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# A friend graph poll would add a statement to whichever request runs it; tests that need it turn it on
+os.environ["FRIEND_GRAPH_POLL_SECONDS"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.core.friend_graph import friend_graph  # noqa: E402
+from app.core.friend_suggestions import friend_suggestion_cache  # noqa: E402
+from app.core.search_cache import search_result_cache  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+def reset_database() -> None:
+    """Recreate the tables empty and empty the in-memory caches built from them."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    friend_graph.invalidate()
+    friend_suggestion_cache.clear()
+    search_result_cache.clear()
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables."""
+    reset_database()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+def add_users(db, count: int) -> None:
+    """Add users 1..count, named user1..userN."""
+    db.bulk_insert_mappings(User, [
+        {"id": i, "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+        for i in range(1, count + 1)
+    ])
+    db.commit()
+
+
+def auth_headers(username: str) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": username})}
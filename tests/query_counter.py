@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from typing import List
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """Count the SQL statements executed on an engine while the block runs.
+
+        with QueryCounter(engine) as counter:
+            client.get("/api/v1/friends/my-friends", headers=headers)
+        print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine: Engine):
+        # An AsyncEngine executes through its sync_engine
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, max_count: int):
+    """Fail with AssertionError if the block executes more than `max_count` statements."""
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > max_count:
+        listing = "\n".join(f"  {statement}" for statement in counter.statements)
+        raise AssertionError(f"Expected at most {max_count} queries, got {counter.count}:\n{listing}")
@@ -0,0 +1,57 @@
+from sqlalchemy import event
+
+import app.api.campgrounds as campgrounds_api
+from app.core.database import engine
+from app.core.search_cache import search_result_cache
+from app.crud.campground import store_campgrounds
+from app.models import Campground
+from app.schemas.campground import CampgroundCreate
+
+
+def camp(external_id: str, name: str = None) -> CampgroundCreate:
+    return CampgroundCreate(name=name or f"Camp {external_id}", location="Somewhere, CA", external_id=external_id)
+
+
+def external_ids(campgrounds):
+    return [campground.external_id for campground in campgrounds]
+
+
+def test_store_campgrounds_returns_stored_and_new_rows_once(db):
+    stored, inserted = store_campgrounds(db, [camp("a"), camp("b"), camp("a")])
+    assert (external_ids(stored), inserted) == (["a", "b"], 2)
+    stored, inserted = store_campgrounds(db, [camp("c"), camp("b"), camp("d")])
+    assert (external_ids(stored), inserted) == (["c", "b", "d"], 2)
+    stored, inserted = store_campgrounds(db, [camp("c")])
+    assert (external_ids(stored), inserted) == (["c"], 0)
+    assert db.query(Campground).count() == 4
+
+
+def test_store_campgrounds_uses_the_session_connection(db):
+    db.query(Campground).count()  # The session holds a connection from here on
+    checkouts = []
+    listener = lambda *args: checkouts.append(args)  # noqa: E731
+    event.listen(engine, "checkout", listener)
+    try:
+        store_campgrounds(db, [camp("a")])
+    finally:
+        event.remove(engine, "checkout", listener)
+    assert checkouts == []
+
+
+def test_search_merges_every_provider_result_the_same_way_each_time(client, db, monkeypatch):
+    db.add(Campground(name="Bravo Lake", location="Somewhere, CA"))
+    db.commit()
+    store_campgrounds(db, [camp("x", "Alpha Meadow")])
+
+    async def provider_search(query, limit):
+        # Matches the provider makes that the database search doesn't, one of them already stored
+        return [camp("x", "Alpha Meadow").model_dump(), camp("z", "Charlie Flat").model_dump()]
+
+    monkeypatch.setattr(campgrounds_api.campground_service, "search_campgrounds", provider_search)
+    names = []
+    for _ in range(2):
+        search_result_cache.clear()
+        response = client.get("/api/v1/campgrounds/search", params={"q": "bravo", "limit": 5})
+        assert response.status_code == 200, response.text
+        names.append([campground["name"] for campground in response.json()])
+    assert names[0] == names[1] == ["Bravo Lake", "Alpha Meadow", "Charlie Flat"]
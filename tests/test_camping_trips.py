@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+
+import app.api.camping_trips as camping_trips_api
+from app.core.fast_json import CAMPING_TRIP_LIST, dump_list
+from app.core.database import SessionLocal
+from app.crud.camping_trip import get_camping_trip, update_camping_trip
+from app.models import Campground, CampingTrip
+from app.schemas.camping_trip import CampingTripUpdate
+from tests.conftest import add_users, auth_headers
+
+
+@pytest.fixture
+def trip(db):
+    add_users(db, 1)
+    db.add(Campground(id=1, name="Camp", location="Somewhere, CA"))
+    start = datetime(2024, 6, 1)
+    db.add(CampingTrip(id=1, title="Trip", start_date=start, end_date=start + timedelta(days=2), user_id=1, campground_id=1))
+    db.commit()
+
+
+def change_elsewhere(trip_id: int) -> None:
+    """Update the trip from another session, as a concurrent request would."""
+    other = SessionLocal()
+    try:
+        get_camping_trip(other, trip_id).title = "Changed elsewhere"
+        other.commit()
+    finally:
+        other.close()
+
+
+def test_update_of_a_stale_trip_rolls_back(db, trip):
+    camping_trip = get_camping_trip(db, 1)
+    change_elsewhere(1)
+    with pytest.raises(StaleDataError):
+        update_camping_trip(db, 1, CampingTripUpdate(title="Mine"))
+    # The session is usable again and sees the other request's change
+    assert camping_trip.title == "Changed elsewhere"
+
+
+@pytest.mark.parametrize("method", ["put", "delete"])
+def test_concurrent_change_is_a_conflict(client, trip, monkeypatch, method):
+    def get_then_change_elsewhere(db, trip_id):
+        camping_trip = get_camping_trip(db, trip_id)
+        change_elsewhere(trip_id)
+        return camping_trip
+
+    monkeypatch.setattr(camping_trips_api, "get_camping_trip", get_then_change_elsewhere)
+    kwargs = {"json": {"title": "Mine"}} if method == "put" else {}
+    response = client.request(method.upper(), "/api/v1/camping-trips/1", headers=auth_headers("user1"), **kwargs)
+    assert response.status_code == 409
+
+
+def test_trip_list_reads_expired_columns(db, trip):
+    camping_trip = get_camping_trip(db, 1)
+    camping_trip.title = "Renamed"
+    db.flush()
+    # updated_at is set by the database, so the flush expired it while the other columns stay loaded
+    assert "updated_at" not in camping_trip.__dict__
+    [encoded] = json.loads(dump_list(CAMPING_TRIP_LIST, [camping_trip]))
+    assert encoded["title"] == "Renamed"
+    assert encoded["updated_at"] is not None
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.friend_graph import FriendGraph
+from app.crud import camping_trip, feed
+from app.crud.camping_trip import create_camping_trip
+from app.crud.friend import accept_friend_request, create_friend_request, reject_friend_request, remove_friend
+from app.models import Campground, CampingTrip, FeedEntry
+from app.schemas.camping_trip import CampingTripCreate
+from tests.conftest import add_users
+
+
+@pytest.fixture
+def friends_with_trips(db, monkeypatch):
+    """Users 1 and 2, friends with a trip each, with timelines on."""
+    monkeypatch.setattr(settings, "feed_timeline_enabled", True)
+    add_users(db, 2)
+    db.add(Campground(id=1, name="Camp", location="Somewhere, CA"))
+    start = datetime(2024, 6, 1)
+    for user_id in (1, 2):
+        db.add(CampingTrip(title="Trip", start_date=start, end_date=start + timedelta(days=2), user_id=user_id, campground_id=1))
+    db.commit()
+    request = create_friend_request(db, 1, 2)
+    accept_friend_request(db, request.id, 2)
+    return request
+
+
+def timeline_authors(db, user_id: int):
+    return [author_id for author_id, in db.query(FeedEntry.author_id).filter(FeedEntry.user_id == user_id)]
+
+
+def test_accepting_a_request_backfills_both_timelines(db, friends_with_trips):
+    assert timeline_authors(db, 1) == [2]
+    assert timeline_authors(db, 2) == [1]
+
+
+def test_removing_a_friend_prunes_both_timelines(db, friends_with_trips):
+    assert remove_friend(db, 2, 1)
+    assert timeline_authors(db, 1) == []
+    assert timeline_authors(db, 2) == []
+
+
+def test_rejecting_an_accepted_request_prunes_both_timelines(db, friends_with_trips):
+    assert reject_friend_request(db, friends_with_trips.id, 2)
+    assert timeline_authors(db, 1) == []
+    assert timeline_authors(db, 2) == []
+
+
+def test_trips_reach_friends_a_stale_friend_graph_has_not_seen(db, monkeypatch):
+    monkeypatch.setattr(settings, "feed_timeline_enabled", True)
+    add_users(db, 2)
+    db.add(Campground(id=1, name="Camp", location="Somewhere, CA"))
+    db.commit()
+    # Another worker's graph, loaded before the friendship and never polled since
+    stale_graph = FriendGraph()
+    assert list(stale_graph.friend_ids(db, 1)) == []
+    monkeypatch.setattr(feed, "friend_graph", stale_graph)
+    monkeypatch.setattr(camping_trip, "friend_graph", stale_graph)
+    request = create_friend_request(db, 1, 2)
+    accept_friend_request(db, request.id, 2)
+
+    start = datetime(2024, 6, 1)
+    create_camping_trip(db, CampingTripCreate(
+        title="Trip", start_date=start, end_date=start + timedelta(days=2), campground_id=1
+    ), user_id=1)
+    assert timeline_authors(db, 2) == [1]
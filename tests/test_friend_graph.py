@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.friend_graph import FriendGraph, friend_graph
+from app.crud.camping_trip import get_friend_camping_feed_async
+from app.crud.friend import accept_friend_request, create_friend_request, remove_friend
+from app.models import Friend
+from tests.conftest import add_users
+
+
+def add_friends(db, user_id: int, friend_ids) -> None:
+    db.bulk_insert_mappings(Friend, [
+        {"user_id": user_id, "friend_id": friend_id, "is_accepted": True} for friend_id in friend_ids
+    ])
+    db.commit()
+
+
+def test_concurrent_cold_loads_on_async_sessions_do_not_deadlock(db):
+    # The load yields to the event loop mid-query; a lock held across it would block the loop's thread
+    add_users(db, 3000)
+    add_friends(db, 1, range(2, 3001))
+    friend_graph.invalidate()
+
+    async def feed():
+        async with AsyncSessionLocal() as session:
+            return await get_friend_camping_feed_async(session, 1, limit=5)
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(*(feed() for _ in range(19))), timeout=20)
+
+    asyncio.run(main())
+    assert friend_graph.degree(db, 1) == 2999
+
+
+def test_changes_during_a_load_are_kept(db, monkeypatch):
+    add_users(db, 3)
+    add_friends(db, 1, [2])
+    graph = FriendGraph()
+    build_adjacency = FriendGraph.build_adjacency
+
+    def slow_build(rows):
+        adjacency = build_adjacency(rows)
+        time.sleep(0.3)
+        return adjacency
+
+    monkeypatch.setattr(graph, "build_adjacency", slow_build)
+    loader = threading.Thread(target=graph.friend_ids, args=(SessionLocal(), 1))
+    loader.start()
+    time.sleep(0.1)
+    graph.add_friendship(1, 3)
+    graph.remove_friendship(1, 2)
+    loader.join()
+
+    assert list(graph.friend_ids(db, 1)) == [3]
+    assert list(graph.friend_ids(db, 2)) == []
+
+
+def test_other_workers_pick_up_friendship_changes(db, monkeypatch):
+    monkeypatch.setattr(settings, "friend_graph_poll_seconds", 0.05)
+    add_users(db, 2)
+    other_worker = FriendGraph()
+    other_db = SessionLocal()
+    assert list(other_worker.friend_ids(other_db, 1)) == []
+
+    request = create_friend_request(db, 1, 2)
+    accept_friend_request(db, request.id, 2)
+    time.sleep(0.1)
+    other_db.rollback()
+    assert list(other_worker.friend_ids(other_db, 1)) == [2]
+
+    remove_friend(db, 2, 1)
+    time.sleep(0.1)
+    other_db.rollback()
+    assert list(other_worker.friend_ids(other_db, 1)) == []
+    other_db.close()
+
+
+def test_a_worker_that_stopped_polling_reloads(db, monkeypatch):
+    monkeypatch.setattr(settings, "friend_graph_poll_seconds", 0.05)
+    monkeypatch.setattr(settings, "friend_graph_poll_overlap_seconds", 0)
+    monkeypatch.setattr(settings, "friend_graph_change_retention_seconds", 0.2)
+    add_users(db, 2)
+    graph = FriendGraph()
+    graph.friend_ids(db, 1)
+    add_friends(db, 1, [2])  # Not logged, so only a reload finds it
+    time.sleep(0.3)
+    assert list(graph.friend_ids(db, 1)) == [2]
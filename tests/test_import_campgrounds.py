@@ -0,0 +1,100 @@
+import io
+import json
+import os
+
+import pytest
+
+from app.core.database import engine
+from app.models import Campground
+from app.tools import import_campgrounds
+from app.tools.import_campgrounds import run_import
+
+
+def campground_line(external_id: str, **fields) -> str:
+    return json.dumps({"name": f"Camp {external_id}", "location": "Somewhere, CA", "external_id": external_id, **fields})
+
+
+def stored_external_ids(db):
+    return sorted(external_id for external_id, in db.query(Campground.external_id))
+
+
+def test_rows_that_are_not_objects_are_counted_invalid(db, tmp_path):
+    catalog = tmp_path / "catalog.jsonl"
+    catalog.write_text("\n".join([
+        '{"name": "Camp a", "location": "Somewhere, CA", "external_id": "a"}',
+        "null",
+        "[1, 2]",
+        '"camp"',
+        "42",
+        "{not json",
+        '{"name": "Camp b", "location": "Somewhere, CA", "external_id": "b"}',
+    ]) + "\n")
+    counts = run_import(str(catalog), engine, batch_size=2, log=io.StringIO())
+    assert counts == {"read": 7, "inserted": 2, "duplicates": 0, "invalid": 5}
+    assert stored_external_ids(db) == ["a", "b"]
+
+
+def test_a_rerun_resumes_after_the_last_committed_batch(db, tmp_path, monkeypatch):
+    catalog = tmp_path / "catalog.jsonl"
+    lines = [campground_line(external_id) + "\n" for external_id in "abcde"]
+    catalog.write_text("".join(lines))
+    write = import_campgrounds.BatchWriter.write
+    calls = []
+
+    def write_then_die(self, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("killed")
+        return write(self, rows)
+
+    monkeypatch.setattr(import_campgrounds.BatchWriter, "write", write_then_die)
+    with pytest.raises(RuntimeError):
+        run_import(str(catalog), engine, batch_size=2, log=io.StringIO())
+    checkpoint = json.loads((tmp_path / "catalog.jsonl.checkpoint").read_text())
+    assert checkpoint["offset"] == len(lines[0] + lines[1])
+    assert stored_external_ids(db) == ["a", "b"]
+
+    log = io.StringIO()
+    counts = run_import(str(catalog), engine, batch_size=2, log=log)
+    # Only the three rows after the checkpoint are read again
+    assert "Resuming" in log.getvalue()
+    assert counts == {"read": 5, "inserted": 5, "duplicates": 0, "invalid": 0}
+    assert stored_external_ids(db) == ["a", "b", "c", "d", "e"]
+    assert not os.path.exists(tmp_path / "catalog.jsonl.checkpoint")
+
+
+def test_rows_already_stored_or_repeated_are_skipped(db, tmp_path):
+    db.add(Campground(name="Camp a", location="Somewhere, CA", external_id="a", source_api="ridb"))
+    db.commit()
+    catalog = tmp_path / "catalog.jsonl"
+    catalog.write_text("\n".join([
+        campground_line("a"),                      # Stored before the import
+        campground_line("b"),
+        campground_line("b"),                      # Repeated within a batch
+        campground_line("c"),
+        campground_line("b"),                      # Repeated in a later batch
+        campground_line("a", source_api="other"),  # Same id from another source
+    ]) + "\n")
+    counts = run_import(str(catalog), engine, batch_size=3, source_api="ridb", log=io.StringIO())
+    assert counts == {"read": 6, "inserted": 3, "duplicates": 3, "invalid": 0}
+    assert sorted(db.query(Campground.source_api, Campground.external_id)) == [
+        ("other", "a"), ("ridb", "a"), ("ridb", "b"), ("ridb", "c")
+    ]
+
+
+def test_csv_catalog(db, tmp_path):
+    catalog = tmp_path / "catalog.csv"
+    catalog.write_text(
+        "\ufeffexternal_id,name,location,description,amenities,latitude,max_capacity\n"
+        'a,Camp a,"Somewhere, CA","Two lines\nof description",water; fire_pits,37.5,40\n'
+        "b,Camp b,Elsewhere,,,,\n"
+        ",Camp without id,Elsewhere,,,,\n",
+        encoding="utf-8"
+    )
+    counts = run_import(str(catalog), engine, batch_size=10, source_api="ridb", log=io.StringIO())
+    assert counts == {"read": 3, "inserted": 2, "duplicates": 0, "invalid": 1}
+    a, b = db.query(Campground).order_by(Campground.external_id)
+    assert (a.name, a.location, a.description) == ("Camp a", "Somewhere, CA", "Two lines\nof description")
+    assert json.loads(a.amenities) == ["water", "fire_pits"]
+    assert (a.latitude, a.max_capacity, a.source_api) == (37.5, 40, "ridb")
+    assert (b.description, b.amenities, b.latitude) == (None, None, None)
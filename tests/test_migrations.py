@@ -0,0 +1,79 @@
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+from app.core.config import settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch):
+    """Run Alembic against a new SQLite file; returns (upgrade, downgrade, engine)."""
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    monkeypatch.setattr(settings, "database_url", url)
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    return (
+        lambda revision: command.upgrade(config, revision),
+        lambda revision: command.downgrade(config, revision),
+        create_engine(url),
+    )
+
+
+def test_upgrade_to_head_and_back(migrate):
+    upgrade, downgrade, engine = migrate
+    upgrade("head")
+    downgrade("base")
+    upgrade("head")
+
+
+def test_canonical_pairs_keep_one_row_per_pair(migrate):
+    upgrade, _, engine = migrate
+    upgrade("0003")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO users (id, email, username, hashed_password) VALUES "
+            "(1, 'a@x', 'a', 'x'), (2, 'b@x', 'b', 'x'), (3, 'c@x', 'c', 'x')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO friends (id, user_id, friend_id, is_accepted) VALUES "
+            "(1, 1, 2, 0),"  # Pending request, superseded by the accepted one the other way
+            "(2, 2, 1, 1),"
+            "(3, 1, 3, 0),"  # Repeated pending request: the oldest is kept
+            "(4, 1, 3, 0),"
+            "(5, 3, 3, 1)"   # A user with themselves
+        )
+
+    upgrade("0004")
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT id, user_low_id, user_high_id, is_accepted FROM friends ORDER BY id"
+        ).fetchall()
+    assert [tuple(row) for row in rows] == [(2, 1, 2, 1), (3, 1, 3, 0)]
+
+    with pytest.raises(Exception, match="UNIQUE"):
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO friends (user_id, friend_id, user_low_id, user_high_id, is_accepted) VALUES (3, 1, 1, 3, 0)"
+            )
+
+
+def test_user_search_keys_are_backfilled(migrate):
+    upgrade, _, engine = migrate
+    upgrade("0006")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO users (id, email, username, hashed_password, full_name) VALUES "
+            "(1, 'a@x', 'Ärne', 'x', '  Zoë   Åberg '), (2, 'b@x', 'bob', 'x', NULL)"
+        )
+    upgrade("head")
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT id, username_search, full_name_search FROM users ORDER BY id"
+        ).all()
+    assert rows == [(1, "ärne", "zoë åberg"), (2, "bob", None)]
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.core.pool_stats import PoolStats, instrumented_pool_class
+
+
+def test_overflow_connections_are_counted(tmp_path):
+    stats = PoolStats("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}?check_same_thread=false",
+        poolclass=instrumented_pool_class(QueuePool, stats), pool_size=2, max_overflow=2,
+    )
+    all_checked_out = threading.Barrier(4)
+
+    def hold_connection():
+        with engine.connect():
+            all_checked_out.wait(timeout=5)
+
+    for _ in range(2):
+        threads = [threading.Thread(target=hold_connection) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["checkouts"] == 8
+    assert snapshot["peak_checked_out"] == 4
+    assert snapshot["checked_out"] == 0
+    # Each round opens 2 connections beyond pool_size and closes them on checkin
+    assert snapshot["overflow_events"] == 4
+    assert stats.open_connections == 2
+    engine.dispose()
+    assert stats.open_connections == 0
+
+
+def test_failed_reconnect_is_not_counted_as_checked_in():
+    stats = PoolStats("test")
+    database_down = False
+
+    def connect():
+        if database_down:
+            raise sqlite3.OperationalError("database is down")
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    engine = create_engine(
+        "sqlite://", creator=connect, pool_pre_ping=True,
+        poolclass=instrumented_pool_class(QueuePool, stats), pool_size=2, max_overflow=0,
+    )
+    with engine.connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+    dbapi_connection.close()
+    # The pre-ping finds the connection closed and the reconnect fails; the pool checks the record back in
+    database_down = True
+    with pytest.raises(exc.OperationalError):
+        engine.connect()
+    assert stats.snapshot(engine.pool)["checked_out"] == 0
+
+    database_down = False
+    with engine.connect():
+        assert stats.snapshot(engine.pool)["checked_out"] == 1
+        detached = engine.raw_connection()
+        detached.detach()
+        assert stats.snapshot(engine.pool)["checked_out"] == 1
+    detached.close()
+    assert stats.snapshot(engine.pool)["checked_out"] == 0
+    engine.dispose()
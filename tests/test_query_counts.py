@@ -0,0 +1,76 @@
+"""The friend list, pending request and map endpoints run a fixed number of statements however many friends a user has."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.database import async_engine, engine
+from app.models import Campground, CampingTrip, Friend
+from tests.conftest import add_users, auth_headers, reset_database
+from tests.query_counter import QueryCounter, assert_max_queries
+
+# Maximum statements per request, including the current-user lookup
+BUDGETS = {
+    "/api/v1/friends/my-friends": 2,
+    "/api/v1/friends/pending-requests": 2,
+    "/api/v1/camping-trips/map": 2,
+}
+# Endpoints served by async routes, whose statements run on the async engine
+ASYNC_PATHS = {"/api/v1/camping-trips/map"}
+MAP_VIEWPORT = {"min_lat": 36, "min_lng": -121, "max_lat": 38, "max_lng": -119, "zoom": 12}
+
+
+def seed(db, friends: int) -> None:
+    """User 1 with `friends` friends, as many pending requests, and a trip per friend."""
+    total = 2 * friends + 1
+    add_users(db, total)
+    db.bulk_insert_mappings(Friend, [
+        {"user_id": 1, "friend_id": i, "is_accepted": True} for i in range(2, friends + 2)
+    ] + [
+        {"user_id": i, "friend_id": 1, "is_accepted": False} for i in range(friends + 2, total + 1)
+    ])
+    db.bulk_insert_mappings(Campground, [
+        {"id": i, "name": f"Camp {i}", "location": "Somewhere, CA", "latitude": 37.0, "longitude": -120.0}
+        for i in range(1, friends + 1)
+    ])
+    start = datetime(2024, 6, 1)
+    db.bulk_insert_mappings(CampingTrip, [
+        {"title": "Trip", "start_date": start, "end_date": start + timedelta(days=2), "user_id": i, "campground_id": i - 1}
+        for i in range(2, friends + 2)
+    ])
+    db.commit()
+
+
+def count_statements(client, path: str) -> int:
+    headers = auth_headers("user1")
+    params = MAP_VIEWPORT if path in ASYNC_PATHS else None
+    client.get(path, headers=headers, params=params)  # Load the friend graph outside the count
+    with assert_max_queries(async_engine if path in ASYNC_PATHS else engine, BUDGETS[path]) as counter:
+        response = client.get(path, headers=headers, params=params)
+    assert response.status_code == 200, response.text
+    return counter.count
+
+
+@pytest.mark.parametrize("path", sorted(BUDGETS))
+@pytest.mark.parametrize("friends", [5, 50])
+def test_statement_budget(client, db, path, friends):
+    seed(db, friends)
+    count_statements(client, path)
+
+
+@pytest.mark.parametrize("path", sorted(BUDGETS))
+def test_statement_count_does_not_grow_with_friends(client, db, path):
+    counts = []
+    for friends in (5, 50, 500):
+        reset_database()
+        seed(db, friends)
+        counts.append(count_statements(client, path))
+    assert counts[0] == counts[1]
+
+
+def test_assert_max_queries_lists_statements_over_budget(db):
+    with pytest.raises(AssertionError, match="Expected at most 0 queries, got 1"):
+        with assert_max_queries(engine, 0):
+            db.execute("SELECT 1")
+    with QueryCounter(engine) as counter:
+        db.execute("SELECT 1")
+    assert counter.statements == ["SELECT 1"]
@@ -0,0 +1,38 @@
+import random
+
+from app.core.search_cache import SearchResultCache
+
+RESULTS = [{"id": 1}]
+
+
+def test_invalidation_drops_exactly_the_queries_that_could_match():
+    cache = SearchResultCache()
+    queries = ["lake", "Lake  Tahoe", "tah", "pine lake", "pine", "desert", "", "lake desert"]
+    for query in queries:
+        cache.put(query, 10, RESULTS)
+    cache.invalidate_campground("Lake Tahoe Camp", "South Lake Tahoe, CA", "Tall pines")
+    assert [query for query in queries if cache.get(query, 10) is not None] == ["desert", "lake desert"]
+    assert cache.stats()["invalidations"] == 6
+
+
+def test_invalidation_matches_checking_every_entry():
+    rng = random.Random(5)
+    vocabulary = ["lake", "lakeside", "pine", "pines", "river", "red", "redwood", "camp", "ca", "or"]
+    cache = SearchResultCache()
+    queries = {" ".join(rng.sample(vocabulary, rng.randint(1, 3)))[:rng.randint(1, 20)] for _ in range(300)}
+    for query in queries:
+        cache.put(query, 10, RESULTS)
+    words = set(rng.sample(vocabulary, 3))
+    cache.invalidate_campground(" ".join(words), None, None)
+    for query in queries:
+        could_match = all(any(word.startswith(token) for word in words) for token in query.split())
+        assert (cache.get(query, 10) is None) == could_match, query
+
+
+def test_evicted_and_replaced_entries_leave_the_index():
+    cache = SearchResultCache()
+    cache.put("lake", 10, RESULTS)
+    cache.put("lake", 10, [])
+    cache.invalidate_campground("Lake", None, None)
+    assert cache.get("lake", 10) is None
+    assert cache._keys_by_token == {}
@@ -0,0 +1,47 @@
+import pytest
+
+from app.crud.friend import search_users_with_relationship_status
+from app.crud.user import update_user
+from app.models import User
+from app.schemas.user import UserUpdate
+
+
+@pytest.fixture
+def users(db):
+    db.add_all([
+        User(id=1, email="me@x", username="me", hashed_password="x"),
+        User(id=2, email="a@x", username="Ärne", hashed_password="x", full_name="Strand Arne"),
+        User(id=3, email="b@x", username="zoe", hashed_password="x", full_name="Zoë  Åberg"),
+        User(id=4, email="c@x", username="STRANDLOPER", hashed_password="x", full_name="Piet Loper"),
+    ])
+    db.commit()
+
+
+def usernames(db, query):
+    return [match["username"] for match in search_users_with_relationship_status(db, 1, query)]
+
+
+def test_non_ascii_names_match_regardless_of_case(db, users):
+    assert usernames(db, "ÄR") == ["Ärne"]
+    assert usernames(db, "ZOË") == ["zoe"]
+    assert usernames(db, "ZOË  Å") == ["zoe"]
+
+
+def test_username_matches_rank_before_full_name_matches(db, users):
+    assert usernames(db, "strand") == ["STRANDLOPER", "Ärne"]
+    assert usernames(db, "rand") == []
+
+
+def test_full_names_match_from_the_start_off_postgres(db, users):
+    # Postgres also matches a word inside the name, e.g. "loper"
+    assert usernames(db, "piet l") == ["STRANDLOPER"]
+    assert usernames(db, "loper") == []
+
+
+def test_bulk_inserted_and_updated_users_are_searchable(db, users):
+    db.bulk_insert_mappings(User, [{"id": 5, "email": "d@x", "username": "Émile", "hashed_password": "x"}])
+    db.commit()
+    assert usernames(db, "émi") == ["Émile"]
+    update_user(db, 2, UserUpdate(full_name="Ödegaard Arne"))
+    assert usernames(db, "öde") == ["Ärne"]
+    assert usernames(db, "strand") == ["STRANDLOPER"]